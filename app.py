@@ -1,8 +1,220 @@
+import argparse
+import asyncio
+import getpass
+import os
+import sys
+import time
+from urllib.parse import urlsplit
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ui_comps'))
 
+from imap_client import ImapError, ImapPool
+from mail_import import BulkImporter
+from mail_index import MailIndex, MessageFlags, MessageRecord
+from mail_search import SearchIndex
+from mail_sync import FolderSync
+from mail_threads import MailThreads, ThreadRow
+from menus import Option, PageUtils, ValuePagedMenu
+from prompts import Prompt
+from terminal import HeadlessMode
+from text_editor import TextViewer
 
 
+def message_option(record: MessageRecord) -> Option:
+    '''
+        A message list row: unread marker, date, sender and subject.
+    '''
+    marker = ' ' if record.has_flag(MessageFlags.SEEN) else '*'
+    date = time.strftime('%Y-%m-%d %H:%M', time.localtime(record.date))
+    return Option(f'{marker} {date}  {record.sender[:24]:24}  {record.subject}', record)
 
 
+def thread_option(row: ThreadRow) -> Option:
+    '''
+        A threaded list row, replies are indented under what they reply to and
+        collapsed threads show how many messages they hold.
+    '''
+    record, thread = row.record, row.thread
+    marker = ' ' if record.has_flag(MessageFlags.SEEN) else '*'
+    date = time.strftime('%Y-%m-%d %H:%M', time.localtime(record.date))
+    fold = f'[{thread.size}] ' if thread.size > 1 and not thread.expanded else ''
+    return Option(f'{marker} {date}  {record.sender[:24]:24}  {"  " * row.depth}{fold}{record.subject}', row)
 
 
+def show_message(index: MailIndex, mailbox: str, record: MessageRecord) -> None:
+    show_body(record, index.read_message(record, mailbox))
+
+
+def show_body(record: MessageRecord, raw: bytes) -> None:
+    body = raw.decode('utf-8', errors='replace')
+    if HeadlessMode.active():
+        sys.stdout.write(body)
+        return
+    header = f'From: {record.sender}\nSubject: {record.subject}'
+    viewer = TextViewer(body, header=header, options=['Back'])
+    try:
+        viewer.run()
+    finally:
+        viewer.close()
+
+
+def main(argv: list[str] = None) -> None:
+    parser = argparse.ArgumentParser(description='Lists and reads the mail in a Maildir or mbox.')
+    parser.add_argument('mailbox', nargs='?', help='a Maildir directory or an mbox file')
+    parser.add_argument('--imap', metavar='URL', help='read a folder from an IMAP server instead, imaps://host[:port] '
+        'or imap://host[:port], the password is read from CONSOLEOUTLOOK_PASSWORD or asked for')
+    parser.add_argument('--user', default=getpass.getuser(), help='IMAP user name')
+    parser.add_argument('--folder', default='INBOX', help='IMAP folder to list (default INBOX)')
+    parser.add_argument('--poll', type=float, default=60.0,
+        help='seconds between syncs of the IMAP folder while the list is open (default 60)')
+    parser.add_argument('--sort', choices=('date', 'sender'), default='date')
+    parser.add_argument('--index',
+        help='where to keep the message index (default: next to the mailbox, under ~/.consoleoutlook for IMAP)')
+    parser.add_argument('--reindex', action='store_true', help='rebuild the message index from scratch')
+    parser.add_argument('--workers', type=int,
+        help='processes parsing headers when the index is built from scratch (default: one per CPU)')
+    parser.add_argument('--search', metavar='QUERY',
+        help='list only matching messages, most recently indexed first: words, "phrases", -excluded, OR. '
+        'A query starting with -excluded has to be passed as --search=-word')
+    parser.add_argument('--threads', action='store_true',
+        help='group the list by conversation, space expands or collapses a thread')
+    parser.add_argument('--choice', help='message to open, a 1-based number or a list row (skips the menu)')
+    args = parser.parse_args(argv)
+    if args.imap and args.threads:
+        parser.error('--threads needs a local mailbox, IMAP indexes have no Message-IDs')
+    if args.imap:
+        imap_mailbox(args.imap, args.user, args.folder, args.choice, args.index, args.poll)
+        return
+    if args.mailbox is None:
+        parser.error('give a mailbox or --imap')
+
+    index = open_mailbox(args.mailbox, args.index, args.reindex, args.workers)
+    name = os.path.basename(os.path.abspath(args.mailbox))
+    try:
+        if args.search:
+            search_mailbox(index, args.mailbox, args.search, args.choice)
+            return
+        if args.threads:
+            thread_mailbox(index, args.mailbox, name, args.choice)
+            return
+        view = index.by_sender(message_option) if args.sort == 'sender' else index.by_date(message_option)
+        menu = ValuePagedMenu(view, f'{name} ({len(view)} messages)', page_size=15)
+        if len(view):
+            show_message(index, args.mailbox, menu.run(args.choice))
+    finally:
+        index.close()
+
+
+def open_mailbox(mailbox: str, index_path: str = None, reindex: bool = False, workers: int = None) -> MailIndex:
+    '''
+        Opens the index of mailbox, bringing it up to date. A missing index (or
+        reindex) is built by a BulkImporter over worker processes with a
+        progress bar, an existing one is updated incrementally.
+    '''
+    path = index_path or MailIndex.default_path(mailbox)
+    if not reindex and os.path.exists(path):
+        return MailIndex.for_mailbox(mailbox, path)
+    unit = 'files' if os.path.isdir(mailbox) else 'bytes'
+    importer = BulkImporter(workers, progress=lambda done, total: Prompt.progress(done, total, 'Importing', unit))
+    return importer.import_mailbox(mailbox, path)
+
+
+def search_mailbox(index: MailIndex, mailbox: str, query: str, choice: str = None) -> None:
+    '''
+        Lists the messages matching query. Results are pulled from the search
+        index as the menu pages through them, so only the first page is looked
+        up before the menu shows.
+    '''
+    search = SearchIndex.for_index(index, mailbox)
+    try:
+        results = search.search(query, index)
+        first = next(results, None)
+        if first is None:
+            Prompt.info(f'No messages match {query}')
+            return
+
+        def rows():
+            yield message_option(index.record(first))
+            for number in results:
+                yield message_option(index.record(number))
+
+        menu = ValuePagedMenu(rows(), f'Search: {query}', page_size=15)
+        show_message(index, mailbox, menu.run(choice))
+    except ValueError as error:
+        Prompt.error(str(error))
+    finally:
+        search.close()
+
+
+def thread_mailbox(index: MailIndex, mailbox: str, name: str, choice: str = None) -> None:
+    '''
+        Lists the mailbox by conversation, newest first, with every thread
+        collapsed to its first message. Toggling a thread only changes its own
+        rows, the menu re-reads the page it is on.
+    '''
+    threads = MailThreads.for_index(index, mailbox)
+    try:
+        view = threads.view(index, thread_option)
+        if not len(view):
+            Prompt.info(f'{name} is empty')
+            return
+
+        menu = ValuePagedMenu(view, f'{name} ({len(threads.forest.order)} threads)', page_size=15)
+
+        def toggle(option: Option) -> None:
+            view.toggle(option.value)
+            # collapsing from a reply would leave the highlight on some other thread
+            PageUtils.show_index(menu, threads.forest.first_row(option.value.thread))
+            menu.refresh_options()
+
+        menu.bind_key('space', toggle)
+        show_message(index, mailbox, menu.run(choice).record)
+    finally:
+        threads.close()
+
+
+def imap_mailbox(url: str, user: str, folder: str, choice: str = None, index_path: str = None,
+    poll: float = 60.0) -> None:
+    '''
+        Lists an IMAP folder from its local index. Only what changed on the
+        server since the last run is fetched, and the folder keeps syncing every
+        poll seconds while the menu is open, updating the list in place.
+    '''
+    parts = urlsplit(url if '://' in url else f'imaps://{url}')
+    tls = parts.scheme != 'imap'
+    password = os.environ.get('CONSOLEOUTLOOK_PASSWORD') or getpass.getpass(f'Password for {user}: ')
+    pool = ImapPool(parts.hostname, parts.port or (993 if tls else 143), user, password, tls)
+    try:
+        asyncio.run(imap_session(pool, folder, choice, index_path, poll))
+    except (ImapError, OSError) as error:
+        Prompt.error(f'{parts.hostname}: {error}')
+
+
+async def imap_session(pool: ImapPool, folder: str, choice: str, index_path: str, poll: float) -> None:
+    sync = FolderSync.open(pool, folder, index_path)
+    try:
+        stats = await sync.sync()
+        if stats['full'] and stats['added']:
+            Prompt.info(f'Fetched {stats["added"]} messages from {folder}')
+        view = sync.index.by_date(message_option)
+        if not len(view):
+            Prompt.info(f'{folder} is empty')
+            return
+
+        menu = ValuePagedMenu(view, f'{folder} ({len(view)} messages)', page_size=15)
+        watcher = asyncio.create_task(sync.watch(poll, lambda _: menu.refresh_options()))
+        try:
+            record = await menu.arun(choice)
+        finally:
+            watcher.cancel()
+
+        async with pool.folder(folder) as connection:
+            raw = await connection.fetch_message(record.offset)
+        show_body(record, raw)
+    finally:
+        sync.close()
+        await pool.close()
+
+
+if __name__ == "__main__":
+    main()
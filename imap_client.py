@@ -0,0 +1,623 @@
+import asyncio
+import contextlib
+import itertools
+import os
+import re
+import ssl
+import sys
+import threading
+from collections import deque
+from typing import AsyncIterator, Callable, NamedTuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ui_comps'))
+
+from mail_index import HeaderParser, MessageFlags, MessageRecord
+from sources import OptionSource
+
+
+class ImapError(Exception):
+    '''
+        A NO / BAD reply, an unexpected response or a lost connection.
+    '''
+
+
+class FolderStatus(NamedTuple):
+    name: str
+    exists: int
+    uidvalidity: int
+    uidnext: int
+    highest_modseq: int
+
+
+class ImapParser:
+    '''
+        Reads the parenthesized data of IMAP responses (RFC 3501 section 4).
+
+        Atoms, numbers and flags come back as bytes, quoted strings and literals
+        as bytes, NIL as None and parenthesized lists as lists. A literal shows
+        up in the response text as {size} and its data is taken from literals
+        in order.
+    '''
+    TOKEN: re.Pattern = re.compile(
+        rb'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|\{(\d+)\}|([^\s()"{\[\]]+(?:\[[^\]]*\](?:<\d+(?:\.\d+)?>)?)?))'
+    )
+    ESCAPE: re.Pattern = re.compile(rb'\\(.)')
+
+    @staticmethod
+    def parse(text: bytes, literals: list[bytes] = (), start: int = 0) -> list:
+        literals = iter(literals)
+        stack = [[]]
+        pos, end = start, len(text)
+        token = ImapParser.TOKEN
+        while pos < end:
+            match = token.match(text, pos)
+            if match is None or match.end() == pos:
+                if text[pos:].strip():
+                    raise ImapError(f'Unreadable response data: {text[pos:pos + 40]!r}')
+                break
+            pos = match.end()
+            opening, closing, quoted, literal, atom = match.groups()
+            if opening:
+                stack.append([])
+            elif closing:
+                if len(stack) == 1:
+                    raise ImapError('Unbalanced parentheses in response')
+                done = stack.pop()
+                stack[-1].append(done)
+            elif quoted is not None:
+                stack[-1].append(ImapParser.ESCAPE.sub(rb'\1', quoted))
+            elif literal is not None:
+                stack[-1].append(next(literals, b''))
+            elif atom is not None:
+                stack[-1].append(None if atom == b'NIL' else atom)
+        if len(stack) != 1:
+            raise ImapError('Unbalanced parentheses in response')
+        return stack[0]
+
+    @staticmethod
+    def pairs(items: list) -> dict[bytes, object]:
+        '''
+            The name / value list of a FETCH response as a dict, names upper-cased.
+        '''
+        return {items[idx].upper(): items[idx + 1] for idx in range(0, len(items) - 1, 2)}
+
+    @staticmethod
+    def quote(text: str) -> str:
+        return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+    @staticmethod
+    def uid_set(uids: list[int]) -> str:
+        '''
+            A sequence set for uids, runs of consecutive ids collapsed: 1:4,7,9:12
+        '''
+        parts = []
+        for _, run in itertools.groupby(enumerate(sorted(uids)), lambda pair: pair[1] - pair[0]):
+            run = [uid for _, uid in run]
+            parts.append(str(run[0]) if len(run) == 1 else f'{run[0]}:{run[-1]}')
+        return ','.join(parts)
+
+
+class _Command:
+    __slots__ = ('tag', 'future', 'untagged', 'on_untagged')
+
+    def __init__(self, tag: str, future: asyncio.Future, on_untagged: Callable = None) -> None:
+        self.tag: str = tag
+        self.future: asyncio.Future = future
+        self.untagged: list[tuple[bytes, list[bytes]]] = []
+        self.on_untagged: Callable[[bytes, list[bytes]], None] = on_untagged
+
+
+class ImapConnection:
+    # longest response line accepted, literals are read separately
+    LINE_LIMIT: int = 1 << 20
+    LITERAL: re.Pattern = re.compile(rb'\{(\d+)\}\r?\n$')
+    CODE: re.Pattern = re.compile(rb'\[([A-Z-]+)(?: ([^\]]*))?\]')
+    # the header fields fetched for message lists
+    HEADER_FIELDS: str = 'DATE FROM SUBJECT MESSAGE-ID IN-REPLY-TO REFERENCES'
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        '''
+            One IMAP session. Use ImapConnection.open() to connect.
+
+            Commands can be pipelined: send() writes a command and returns a
+            future for its completion right away, so several commands can be in
+            flight at once. A single reader task matches every tagged reply to
+            its command and hands untagged data to the oldest command still
+            pending, which is the one the server is working on since servers
+            execute a connection's commands in order.
+        '''
+        self._reader: asyncio.StreamReader = reader
+        self._writer: asyncio.StreamWriter = writer
+        self._tags = itertools.count(1)
+        self._pending: deque[_Command] = deque()
+        self._closed: bool = False
+        self.capabilities: set[str] = set()
+        self.selected: FolderStatus = None
+        self._reader_task: asyncio.Task = asyncio.get_running_loop().create_task(self._read_loop())
+
+    @staticmethod
+    async def open(host: str, port: int, tls: ssl.SSLContext | bool = False,
+        timeout: float = 30.0) -> 'ImapConnection':
+        if tls is True:
+            tls = ssl.create_default_context()
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=tls or None, limit=ImapConnection.LINE_LIMIT), timeout
+        )
+        greeting = await asyncio.wait_for(reader.readline(), timeout)
+        if not greeting.startswith((b'* OK', b'* PREAUTH')):
+            writer.close()
+            raise ImapError(f'Unexpected greeting: {greeting.strip()!r}')
+        return ImapConnection(reader, writer)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    async def _read_response(self) -> tuple[bytes, list[bytes]]:
+        '''
+            One response, its literals read into a separate list and left in
+            the text as {size}.
+        '''
+        text, literals = bytearray(), []
+        line = await self._readline()
+        while True:
+            if not line:
+                raise ConnectionError('The server closed the connection')
+            match = ImapConnection.LITERAL.search(line)
+            if match is None:
+                text += line.rstrip(b'\r\n')
+                return bytes(text), literals
+            text += line[:match.end(1) + 1]
+            literals.append(await self._reader.readexactly(int(match.group(1))))
+            line = await self._readline()
+
+    async def _readline(self) -> bytes:
+        '''
+            One line however long it is. Lines past LINE_LIMIT, a UID SEARCH of
+            a large folder say, are taken from the reader in pieces.
+        '''
+        pieces = []
+        while True:
+            try:
+                pieces.append(await self._reader.readuntil(b'\n'))
+                break
+            except asyncio.LimitOverrunError as error:
+                pieces.append(await self._reader.readexactly(error.consumed))
+            except asyncio.IncompleteReadError as error:
+                pieces.append(error.partial)
+                break
+        return b''.join(pieces)
+
+    async def _read_loop(self) -> None:
+        try:
+            while True:
+                text, literals = await self._read_response()
+                if text.startswith(b'* '):
+                    command = self._pending[0] if self._pending else None
+                    if command is None:
+                        continue
+                    if command.on_untagged is not None:
+                        command.on_untagged(text, literals)
+                    else:
+                        command.untagged.append((text, literals))
+                    continue
+                if text.startswith(b'+'):
+                    continue
+
+                tag, _, rest = text.partition(b' ')
+                if not self._pending or self._pending[0].tag.encode() != tag:
+                    raise ImapError(f'Reply for an unknown command: {text[:60]!r}')
+                command = self._pending.popleft()
+                status, _, detail = rest.partition(b' ')
+                if command.future.done():
+                    continue
+                if status == b'OK':
+                    command.future.set_result((command.untagged, detail))
+                else:
+                    command.future.set_exception(ImapError(detail.decode('utf-8', errors='replace') or status.decode()))
+        except asyncio.CancelledError:
+            self._fail(ImapError('Connection closed'))
+        except Exception as error:
+            # a reply that can't be read, or an on_untagged callback that failed on
+            # it, leaves the session out of step: every pending command fails
+            self._fail(error if isinstance(error, ImapError) else ImapError(str(error) or 'Connection lost'))
+
+    def _fail(self, error: ImapError) -> None:
+        self._closed = True
+        while self._pending:
+            command = self._pending.popleft()
+            if not command.future.done():
+                command.future.set_exception(error)
+
+    async def send(self, command: str, on_untagged: Callable[[bytes, list[bytes]], None] = None) -> asyncio.Future:
+        '''
+            Writes command and returns a future resolving to (untagged responses,
+            status text) once the server has completed it. on_untagged receives
+            (text, literals) for each untagged response instead of collecting them.
+        '''
+        if self._closed:
+            raise ImapError('Connection closed')
+        tag = f'A{next(self._tags):05}'
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(_Command(tag, future, on_untagged))
+        self._writer.write(f'{tag} {command}\r\n'.encode('utf-8'))
+        await self._writer.drain()
+        return future
+
+    async def command(self, command: str, on_untagged: Callable[[bytes, list[bytes]], None] = None) \
+            -> tuple[list[tuple[bytes, list[bytes]]], bytes]:
+        return await (await self.send(command, on_untagged))
+
+    async def login(self, user: str, password: str) -> None:
+        untagged, detail = await self.command(f'LOGIN {ImapParser.quote(user)} {ImapParser.quote(password)}')
+        match = ImapConnection.CODE.search(detail)
+        if match and match.group(1) == b'CAPABILITY':
+            self.capabilities = set(match.group(2).decode().upper().split())
+        else:
+            await self.capability()
+
+    async def capability(self) -> set[str]:
+        untagged, _ = await self.command('CAPABILITY')
+        for text, _ in untagged:
+            if text.startswith(b'* CAPABILITY '):
+                self.capabilities = set(text[13:].decode().upper().split())
+        return self.capabilities
+
+    async def list_folders(self) -> list[str]:
+        untagged, _ = await self.command('LIST "" "*"')
+        folders = []
+        for text, literals in untagged:
+            if text.startswith(b'* LIST '):
+                name = ImapParser.parse(text, literals, 7)[-1]
+                folders.append(name.decode('utf-8', errors='replace'))
+        return folders
+
+    async def select(self, folder: str, readonly: bool = True) -> FolderStatus:
+        '''
+            Opens folder, read-only (EXAMINE) unless asked otherwise. Servers
+            with CONDSTORE are asked to report HIGHESTMODSEQ.
+        '''
+        verb = 'EXAMINE' if readonly else 'SELECT'
+        condstore = ' (CONDSTORE)' if 'CONDSTORE' in self.capabilities else ''
+        untagged, _ = await self.command(f'{verb} {ImapParser.quote(folder)}{condstore}')
+        values = {'EXISTS': 0, 'UIDVALIDITY': 0, 'UIDNEXT': 0, 'HIGHESTMODSEQ': 0}
+        for text, _ in untagged:
+            match = ImapConnection.CODE.search(text)
+            if match and match.group(1).decode() in values:
+                values[match.group(1).decode()] = int(match.group(2).split()[0])
+            elif text.endswith(b' EXISTS'):
+                values['EXISTS'] = int(text.split()[1])
+        self.selected = FolderStatus(folder, values['EXISTS'], values['UIDVALIDITY'], values['UIDNEXT'],
+            values['HIGHESTMODSEQ'])
+        return self.selected
+
+    async def uid_search(self, criteria: str = 'ALL') -> list[int]:
+        untagged, _ = await self.command(f'UID SEARCH {criteria}')
+        uids = []
+        for text, _ in untagged:
+            if text.startswith(b'* SEARCH'):
+                uids.extend(int(uid) for uid in text[8:].split() if uid.isdigit())
+        return sorted(uids)
+
+    def record(self, fetched: dict[bytes, object]) -> MessageRecord:
+        '''
+            A MessageRecord for a fetched message of the selected folder. offset
+            holds the UID and path the folder.
+        '''
+        header = b''
+        for name, value in fetched.items():
+            if name.startswith(b'BODY['):
+                header = value or b''
+                break
+        date, sender, subject, _ = HeaderParser.parse(header, 0)
+        flags = MessageFlags.from_imap(flag.decode() for flag in fetched.get(b'FLAGS') or ())
+        uid = int(fetched[b'UID'])
+        return MessageRecord(uid, date, sender, subject, flags, self.selected.name if self.selected else '', uid,
+            int(fetched.get(b'RFC822.SIZE') or 0))
+
+    async def fetch_headers(self, uids: list[int], batch: int = 256, window: int = 4) \
+            -> AsyncIterator[list[MessageRecord]]:
+        '''
+            Fetches the list headers of uids in the selected folder, batch
+            messages per UID FETCH with up to window commands in flight. Yields
+            one list of records per batch, batches in the order of uids and the
+            records of a batch in that order too.
+        '''
+        items = f'(UID FLAGS RFC822.SIZE BODY.PEEK[HEADER.FIELDS ({ImapConnection.HEADER_FIELDS})])'
+        in_flight: deque[tuple[asyncio.Future, list[int], dict[int, MessageRecord]]] = deque()
+
+        async def start(chunk: list[int]) -> None:
+            received: dict[int, MessageRecord] = {}
+
+            def collect(text: bytes, literals: list[bytes]) -> None:
+                if b' FETCH ' not in text[:24]:
+                    return
+                fetched = ImapParser.pairs(ImapParser.parse(text, literals, text.index(b' FETCH ') + 7)[0])
+                if b'UID' in fetched:
+                    record = self.record(fetched)
+                    received[record.offset] = record
+
+            future = await self.send(f'UID FETCH {ImapParser.uid_set(chunk)} {items}', collect)
+            in_flight.append((future, chunk, received))
+
+        async def finish() -> list[MessageRecord]:
+            future, chunk, received = in_flight.popleft()
+            await future
+            # a message expunged since the search is simply missing from its batch
+            return [received[uid] for uid in chunk if uid in received]
+
+        for idx in range(0, len(uids), batch):
+            await start(uids[idx:idx + batch])
+            if len(in_flight) >= window:
+                yield await finish()
+        while in_flight:
+            yield await finish()
+
+    async def fetch_flags(self, uid_set: str, changed_since: int = None) -> dict[int, int]:
+        '''
+            Current flags by UID for the messages in uid_set. With changed_since
+            (CONDSTORE) only messages whose flags changed after that MODSEQ are
+            returned.
+        '''
+        flags: dict[int, int] = {}
+
+        def collect(text: bytes, literals: list[bytes]) -> None:
+            if b' FETCH ' not in text[:24]:
+                return
+            fetched = ImapParser.pairs(ImapParser.parse(text, literals, text.index(b' FETCH ') + 7)[0])
+            if b'UID' in fetched:
+                flags[int(fetched[b'UID'])] = MessageFlags.from_imap(flag.decode() for flag in fetched.get(b'FLAGS') or ())
+
+        modifier = f' (CHANGEDSINCE {changed_since})' if changed_since is not None else ''
+        await self.command(f'UID FETCH {uid_set} (UID FLAGS){modifier}', collect)
+        return flags
+
+    async def fetch_message(self, uid: int) -> bytes:
+        untagged, _ = await self.command(f'UID FETCH {uid} (UID BODY.PEEK[])')
+        for text, literals in untagged:
+            if b' FETCH ' in text[:24]:
+                fetched = ImapParser.pairs(ImapParser.parse(text, literals, text.index(b' FETCH ') + 7)[0])
+                if int(fetched.get(b'UID') or 0) == uid:
+                    return fetched.get(b'BODY[]') or b''
+        raise ImapError(f'No message with UID {uid}')
+
+    async def close(self) -> None:
+        if not self._closed:
+            with contextlib.suppress(ImapError, ConnectionError, asyncio.TimeoutError):
+                await asyncio.wait_for(self.command('LOGOUT'), 5)
+        self._closed = True
+        self._reader_task.cancel()
+        self._writer.close()
+        with contextlib.suppress(ConnectionError, ssl.SSLError):
+            await self._writer.wait_closed()
+
+
+class ImapPool:
+    def __init__(self, host: str, port: int, user: str, password: str, tls: ssl.SSLContext | bool = False,
+        max_connections: int = 4) -> None:
+        '''
+            Logged-in connections to one server, shared across folders.
+
+            At most max_connections are open or in use at once, which is also
+            the limit on concurrent work against the server. folder() hands out
+            an idle connection, preferring one that already has the folder
+            selected, and takes it back when the block exits. Connections that
+            failed are dropped instead of reused.
+        '''
+        self.host: str = host
+        self.port: int = port
+        self.user: str = user
+        self.password: str = password
+        self.tls: ssl.SSLContext | bool = tls
+        self.max_connections: int = max_connections
+        self._limit: asyncio.Semaphore = None
+        self._idle: list[ImapConnection] = []
+
+    async def _connect(self) -> ImapConnection:
+        connection = await ImapConnection.open(self.host, self.port, self.tls)
+        try:
+            await connection.login(self.user, self.password)
+        except ImapError:
+            await connection.close()
+            raise
+        return connection
+
+    @contextlib.asynccontextmanager
+    async def folder(self, name: str, readonly: bool = True) -> AsyncIterator[ImapConnection]:
+        if self._limit is None:
+            self._limit = asyncio.Semaphore(self.max_connections)
+        async with self._limit:
+            # connections the server dropped while idle are let go here
+            self._idle = idle = [connection for connection in self._idle if not connection.closed]
+            connection = next((c for c in idle if c.selected and c.selected.name == name), None) \
+                or (idle[0] if idle else None)
+            if connection is not None:
+                self._idle.remove(connection)
+            else:
+                connection = await self._connect()
+
+            try:
+                if connection.selected is None or connection.selected.name != name:
+                    await connection.select(name, readonly)
+                yield connection
+            except BaseException:
+                await connection.close()
+                raise
+            if not connection.closed:
+                self._idle.append(connection)
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        await asyncio.gather(*(connection.close() for connection in idle), return_exceptions=True)
+
+
+async def fetch_folder(pool: ImapPool, folder: str, batch: int = 256, window: int = 4) \
+        -> AsyncIterator[list[MessageRecord]]:
+    '''
+        Every message of folder, newest (highest UID) first, a batch at a time.
+    '''
+    async with pool.folder(folder) as connection:
+        uids = await connection.uid_search('ALL')
+        uids.reverse()
+        async for records in connection.fetch_headers(uids, batch, window):
+            yield records
+
+
+class EventLoopThread:
+    def __init__(self) -> None:
+        '''
+            An asyncio loop on a daemon thread, for running the IMAP layer
+            under the synchronous menus.
+        '''
+        self.loop: asyncio.AbstractEventLoop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+
+    def submit(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def run(self, coroutine, timeout: float = None):
+        return self.submit(coroutine).result(timeout)
+
+    def stop(self) -> None:
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+
+class ImapSource(OptionSource):
+    def __init__(self, pool: ImapPool, folder: str, runner: EventLoopThread,
+        row_factory: Callable[[MessageRecord], object] = None, batch: int = 256, window: int = 4) -> None:
+        '''
+            The messages of an IMAP folder as an option source for the paged
+            menus, newest first.
+
+            Headers are fetched in the background on runner's loop as soon as
+            the source is made, fetch() only waits until the rows it asks for
+            have arrived. The first page is shown after the first batch lands,
+            not after the whole folder.
+        '''
+        self.folder: str = folder
+        self.row_factory = row_factory
+        self._rows: list = []
+        self._total: int = None
+        self._done: bool = False
+        self._error: BaseException = None
+        self._ready = threading.Condition()
+        self._task = runner.submit(self._fill(pool, batch, window))
+
+    async def _fill(self, pool: ImapPool, batch: int, window: int) -> None:
+        try:
+            async with pool.folder(self.folder) as connection:
+                uids = await connection.uid_search('ALL')
+                uids.reverse()
+                with self._ready:
+                    self._total = len(uids)
+                    self._ready.notify_all()
+                async for records in connection.fetch_headers(uids, batch, window):
+                    rows = records if self.row_factory is None else [self.row_factory(r) for r in records]
+                    with self._ready:
+                        self._rows.extend(rows)
+                        self._ready.notify_all()
+        except Exception as error:
+            self._error = error
+        finally:
+            with self._ready:
+                self._done = True
+                self._ready.notify_all()
+
+    @property
+    def length(self) -> int:
+        with self._ready:
+            self._ready.wait_for(lambda: self._total is not None or self._done)
+            if self._total is None and self._error is not None:
+                raise ImapError(f'Opening {self.folder} failed: {self._error}')
+            return len(self._rows) if self._done else self._total
+
+    @property
+    def loaded(self) -> int:
+        return len(self._rows)
+
+    def wait(self, timeout: float = None) -> bool:
+        '''
+            Waits for every header to arrive, returns False on timeout.
+        '''
+        with self._ready:
+            return self._ready.wait_for(lambda: self._done, timeout)
+
+    def fetch(self, start: int, stop: int) -> list:
+        with self._ready:
+            self._ready.wait_for(lambda: self._done or len(self._rows) >= stop)
+            if self._error is not None and len(self._rows) < stop:
+                raise ImapError(f'Fetching {self.folder} failed: {self._error}')
+            return self._rows[start:stop]
+
+    def cancel(self) -> None:
+        self._task.cancel()
+
+
+def imap_benchmark(messages: int = 20_000, latency: float = 0.02, folders: int = 4) -> None:
+    '''
+        Fetches synthetic folders from a local ImapStandin that delays every
+        command by latency seconds, like a network round trip. Prints the
+        header throughput for a few pipelining windows, the time until the first
+        page of an ImapSource is ready and a multi-folder fetch through pools of
+        different sizes.
+    '''
+    import time
+    from imap_standin import ImapStandin
+
+    async def drain(pool: ImapPool, folder: str, batch: int, window: int) -> int:
+        count = 0
+        async for records in fetch_folder(pool, folder, batch, window):
+            count += len(records)
+        return count
+
+    async def bench() -> ImapStandin:
+        standin = ImapStandin(latency=latency)
+        for number in range(folders):
+            standin.add_folder(f'Folder{number}').populate(messages if number == 0 else messages // folders, seed=number)
+        host, port = await standin.start()
+        try:
+            for batch, window in ((256, 1), (256, 4), (256, 16), (1024, 4)):
+                pool = ImapPool(host, port, standin.user, standin.password, max_connections=1)
+                start = time.perf_counter()
+                count = await drain(pool, 'Folder0', batch, window)
+                elapsed = time.perf_counter() - start
+                await pool.close()
+                print(f'fetch batch {batch:5} window {window:3}: {count / elapsed:10.0f} msg/s ({count} in {elapsed:.2f} s)')
+
+            for size in (1, folders):
+                pool = ImapPool(host, port, standin.user, standin.password, max_connections=size)
+                start = time.perf_counter()
+                counts = await asyncio.gather(*(drain(pool, f'Folder{n}', 256, 4) for n in range(1, folders)))
+                elapsed = time.perf_counter() - start
+                await pool.close()
+                print(f'{folders - 1} folders, pool of {size}: {sum(counts) / elapsed:10.0f} msg/s '
+                    f'({sum(counts)} in {elapsed:.2f} s)')
+        finally:
+            await standin.stop()
+        return standin
+
+    standin = asyncio.run(bench())
+
+    # ImapSource blocks on its own loop thread, so it is timed from plain synchronous code
+    runner = EventLoopThread()
+    host, port = runner.run(standin.start())
+    try:
+        pool = ImapPool(host, port, standin.user, standin.password)
+        start = time.perf_counter()
+        source = ImapSource(pool, 'Folder0', runner, batch=64)
+        source.fetch(0, 15)
+        first_page = time.perf_counter() - start
+        source.wait()
+        print(f'ImapSource first page: {first_page * 1e3:.1f} ms, all {source.length} rows: '
+            f'{(time.perf_counter() - start) * 1e3:.0f} ms')
+        runner.run(pool.close())
+    finally:
+        runner.run(standin.stop())
+        runner.stop()
+
+
+if __name__ == '__main__':
+    imap_benchmark()
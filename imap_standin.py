@@ -0,0 +1,315 @@
+import asyncio
+import contextlib
+import email.utils
+import random
+import re
+from bisect import bisect_left, bisect_right
+
+from imap_client import ImapParser
+
+
+class StandinMessage:
+    __slots__ = ('uid', 'flags', 'raw', 'modseq', '_headers')
+
+    def __init__(self, uid: int, raw: bytes, flags: set[str], modseq: int) -> None:
+        self.uid: int = uid
+        self.raw: bytes = raw
+        self.flags: set[str] = flags
+        self.modseq: int = modseq
+        self._headers: list[tuple[bytes, bytes]] = None
+
+    def header_fields(self, names: set[bytes]) -> bytes:
+        '''
+            The named header fields of the message, unfolded lines kept as sent,
+            followed by the blank line that ends a header block.
+        '''
+        if self._headers is None:
+            end = self.raw.find(b'\r\n\r\n')
+            self._headers = []
+            for line in self.raw[:end if end != -1 else len(self.raw)].split(b'\r\n'):
+                if line[:1] in (b' ', b'\t') and self._headers:
+                    name, value = self._headers[-1]
+                    self._headers[-1] = (name, value + b'\r\n' + line)
+                elif b':' in line:
+                    self._headers.append((line.split(b':', 1)[0].strip().upper(), line))
+        return b''.join(line + b'\r\n' for name, line in self._headers if name in names) + b'\r\n'
+
+
+class StandinFolder:
+    def __init__(self, name: str, uidvalidity: int) -> None:
+        '''
+            A folder of the stand-in server, messages in ascending UID order.
+        '''
+        self.name: str = name
+        self.uidvalidity: int = uidvalidity
+        self.uidnext: int = 1
+        self.highest_modseq: int = 1
+        self.messages: list[StandinMessage] = []
+
+    def add(self, raw: bytes, flags: set[str] = None) -> int:
+        self.highest_modseq += 1
+        message = StandinMessage(self.uidnext, raw, set(flags or ()), self.highest_modseq)
+        self.messages.append(message)
+        self.uidnext += 1
+        return message.uid
+
+    def set_flags(self, uid: int, flags: set[str]) -> None:
+        message = self.messages[self.position(uid)]
+        self.highest_modseq += 1
+        message.flags, message.modseq = set(flags), self.highest_modseq
+
+    def expunge(self, uids: set[int]) -> None:
+        self.messages = [message for message in self.messages if message.uid not in uids]
+        self.highest_modseq += 1
+
+    def populate(self, count: int, seed: int = 0) -> 'StandinFolder':
+        '''
+            Adds count synthetic messages, a fifth of them replies in a thread
+            and about a third marked seen.
+        '''
+        rng = random.Random(seed)
+        senders = [f'Person {n} <person{n}@example.com>' for n in range(200)]
+        topics = ['Quarterly report', 'Lunch plans', 'Build failure', 'Invoice', 'Offsite agenda', 'Release notes']
+        start = 1_600_000_000
+        ids: list[str] = []
+        for number in range(count):
+            message_id = f'<{self.name}.{self.uidnext}.{seed}@standin.example>'
+            lines = [
+                f'Date: {email.utils.formatdate(start + number * 600)}',
+                f'From: {rng.choice(senders)}',
+                f'To: user@example.com',
+                f'Message-ID: {message_id}',
+            ]
+            if ids and rng.random() < 0.2:
+                parent = rng.choice(ids[-50:])
+                lines += [f'Subject: Re: {rng.choice(topics)} {number % 97}', f'In-Reply-To: {parent}',
+                    f'References: {parent}']
+            else:
+                lines.append(f'Subject: {rng.choice(topics)} {number % 97}')
+            body = f'Message {number} in {self.name}.\r\n' + 'Lorem ipsum dolor sit amet. ' * rng.randint(1, 20)
+            raw = ('\r\n'.join(lines) + '\r\n\r\n' + body + '\r\n').encode('utf-8')
+            ids.append(message_id)
+            self.add(raw, {'\\Seen'} if rng.random() < 0.35 else set())
+        return self
+
+    def position(self, uid: int) -> int:
+        '''
+            The 0-based position of uid, -1 when there's no such message.
+        '''
+        low = bisect_left(self.messages, uid, key=lambda message: message.uid)
+        return low if low < len(self.messages) and self.messages[low].uid == uid else -1
+
+    def uid_range(self, uid_set: bytes) -> list[tuple[int, StandinMessage]]:
+        '''
+            (sequence number, message) for every message in a UID set.
+        '''
+        highest = self.messages[-1].uid if self.messages else 0
+        spans = []
+        for part in uid_set.split(b','):
+            first, _, last = part.partition(b':')
+            first = highest if first == b'*' else int(first)
+            last = first if not last else highest if last == b'*' else int(last)
+            first, last = min(first, last), max(first, last)
+            spans.append((bisect_left(self.messages, first, key=lambda message: message.uid),
+                bisect_right(self.messages, last, key=lambda message: message.uid)))
+
+        if len(spans) == 1:
+            start, stop = spans[0]
+            return list(zip(range(start + 1, stop + 1), self.messages[start:stop]))
+        positions = sorted({position for start, stop in spans for position in range(start, stop)})
+        return [(position + 1, self.messages[position]) for position in positions]
+
+
+class ImapStandin:
+    CAPABILITIES: str = 'IMAP4rev1 LITERAL+ CONDSTORE'
+    CHANGED_SINCE: re.Pattern = re.compile(rb'\s*\(CHANGEDSINCE (\d+)\)\s*$', re.IGNORECASE)
+    HEADER_FIELDS: re.Pattern = re.compile(rb'BODY(?:\.PEEK)?\[HEADER\.FIELDS \(([^)]*)\)\]', re.IGNORECASE)
+    FULL_BODY: re.Pattern = re.compile(rb'BODY(?:\.PEEK)?\[\]|RFC822(?=[\s)]|$)', re.IGNORECASE)
+
+    def __init__(self, user: str = 'user', password: str = 'secret', latency: float = 0.0) -> None:
+        '''
+            A small in-process IMAP server for tests and benchmarks.
+
+            It speaks the part of IMAP4rev1 the client uses: LOGIN, CAPABILITY,
+            LIST, SELECT / EXAMINE, UID SEARCH, UID FETCH, NOOP and LOGOUT, plus
+            CONDSTORE (HIGHESTMODSEQ and CHANGEDSINCE). Folders are filled and
+            changed through add_folder() and StandinFolder.
+
+            latency delays every command by that many seconds from when it
+            arrives, like a network round trip. Commands sent back to back share
+            the delay, as they would on a real link, so pipelining shows up in
+            the timings.
+        '''
+        self.user: str = user
+        self.password: str = password
+        self.latency: float = latency
+        self.folders: dict[str, StandinFolder] = {}
+        self.connections: int = 0
+        self.commands: int = 0
+        self._server: asyncio.AbstractServer = None
+
+    def add_folder(self, name: str, uidvalidity: int = None) -> StandinFolder:
+        folder = StandinFolder(name, uidvalidity or len(self.folders) + 1)
+        self.folders[name] = folder
+        return folder
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> tuple[str, int]:
+        '''
+            Starts listening, returns (host, port). Port 0 picks a free port.
+        '''
+        self._server = await asyncio.start_server(self._serve, host, port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        loop = asyncio.get_running_loop()
+        arrived: asyncio.Queue = asyncio.Queue()
+
+        async def receive() -> None:
+            while line := await reader.readline():
+                arrived.put_nowait((loop.time(), line))
+            arrived.put_nowait((loop.time(), b''))
+
+        receiver = loop.create_task(receive())
+        session = {'authenticated': False, 'folder': None}
+        writer.write(b'* OK IMAP4rev1 stand-in ready\r\n')
+        try:
+            while True:
+                at, line = await arrived.get()
+                if not line:
+                    break
+                delay = at + self.latency - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                self.commands += 1
+                reply, done = self._handle(line.rstrip(b'\r\n'), session)
+                writer.write(reply)
+                if arrived.empty():
+                    await writer.drain()
+                if done:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            receiver.cancel()
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    def _handle(self, line: bytes, session: dict) -> tuple[bytes, bool]:
+        '''
+            Runs one command, returns the reply and whether the session ends.
+        '''
+        tag, _, rest = line.partition(b' ')
+        verb, _, args = rest.partition(b' ')
+        verb = verb.upper()
+        if verb == b'UID':
+            sub, _, args = args.partition(b' ')
+            verb = b'UID ' + sub.upper()
+        out = bytearray()
+
+        def done(status: bytes = b'OK', text: bytes = b'completed') -> tuple[bytes, bool]:
+            out.extend(tag + b' ' + status + b' ' + text + b'\r\n')
+            return bytes(out), False
+
+        if verb == b'CAPABILITY':
+            out += f'* CAPABILITY {self.CAPABILITIES}\r\n'.encode()
+            return done()
+        if verb == b'NOOP':
+            return done()
+        if verb == b'LOGOUT':
+            out += b'* BYE logging out\r\n' + tag + b' OK LOGOUT completed\r\n'
+            return bytes(out), True
+        if verb == b'LOGIN':
+            user, password = (value.decode() for value in ImapParser.parse(args)[:2])
+            if (user, password) != (self.user, self.password):
+                return done(b'NO', b'[AUTHENTICATIONFAILED] invalid credentials')
+            session['authenticated'] = True
+            return done(text=f'[CAPABILITY {self.CAPABILITIES}] logged in'.encode())
+        if not session['authenticated']:
+            return done(b'NO', b'log in first')
+
+        if verb == b'LIST':
+            for name in self.folders:
+                out += f'* LIST () "/" {ImapParser.quote(name)}\r\n'.encode()
+            return done()
+        if verb in (b'SELECT', b'EXAMINE'):
+            parsed = ImapParser.parse(args)
+            folder = self.folders.get(parsed[0].decode() if parsed else '')
+            if folder is None:
+                session['folder'] = None
+                return done(b'NO', b'no such folder')
+            session['folder'] = folder
+            return done(*self._select(folder, parsed[1:], out))
+
+        folder: StandinFolder = session['folder']
+        if folder is None:
+            return done(b'BAD', b'no folder selected')
+        if verb == b'UID SEARCH':
+            return done(*self._search(folder, args, out))
+        if verb == b'UID FETCH':
+            return done(*self._fetch(folder, args, out))
+        return done(b'BAD', b'unknown command')
+
+    def _select(self, folder: StandinFolder, options: list, out: bytearray) -> tuple[bytes, bytes]:
+        out += (f'* {len(folder.messages)} EXISTS\r\n* 0 RECENT\r\n'
+            f'* FLAGS (\\Seen \\Answered \\Flagged \\Deleted \\Draft)\r\n'
+            f'* OK [UIDVALIDITY {folder.uidvalidity}] UIDs valid\r\n'
+            f'* OK [UIDNEXT {folder.uidnext}] predicted next UID\r\n'
+            f'* OK [HIGHESTMODSEQ {folder.highest_modseq}] modseqs valid\r\n').encode()
+        return b'OK', b'[READ-WRITE] completed'
+
+    def _search(self, folder: StandinFolder, args: bytes, out: bytearray) -> tuple[bytes, bytes]:
+        criteria = args.split()
+        if criteria[:1] == [b'UID'] and len(criteria) > 1:
+            messages = [message for _, message in folder.uid_range(criteria[1])]
+        elif criteria[:1] == [b'ALL']:
+            messages = folder.messages
+        else:
+            return b'BAD', b'only ALL and UID searches are supported'
+        out += b'* SEARCH' + b''.join(b' %d' % message.uid for message in messages) + b'\r\n'
+        return b'OK', b'completed'
+
+    def _fetch_items(self, message: StandinMessage, items: bytes, out: bytearray, modseq: bool) -> None:
+        parts = [b'UID %d' % message.uid]
+        upper = items.upper()
+        if b'FLAGS' in upper:
+            parts.append(b'FLAGS (' + ' '.join(sorted(message.flags)).encode() + b')')
+        if modseq or b'MODSEQ' in upper:
+            parts.append(b'MODSEQ (%d)' % message.modseq)
+        if b'RFC822.SIZE' in upper:
+            parts.append(b'RFC822.SIZE %d' % len(message.raw))
+        literal = None
+        fields = ImapStandin.HEADER_FIELDS.search(items)
+        if fields:
+            literal = message.header_fields(set(fields.group(1).upper().split()))
+            parts.append(b'BODY[HEADER.FIELDS (' + fields.group(1).upper() + b')] {%d}' % len(literal))
+        elif ImapStandin.FULL_BODY.search(items):
+            literal = message.raw
+            parts.append(b'BODY[] {%d}' % len(literal))
+        out += b' '.join(parts[:-1] if literal is not None else parts)
+        if literal is not None:
+            if len(parts) > 1:
+                out += b' '
+            out += parts[-1] + b'\r\n' + literal
+        out += b')\r\n'
+
+    def _fetch(self, folder: StandinFolder, args: bytes, out: bytearray) -> tuple[bytes, bytes]:
+        uid_set, _, items = args.partition(b' ')
+        changed_since = ImapStandin.CHANGED_SINCE.search(items)
+        since = None
+        if changed_since:
+            since = int(changed_since.group(1))
+            items = items[:changed_since.start()]
+        for sequence, message in folder.uid_range(uid_set):
+            if since is not None and message.modseq <= since:
+                continue
+            out += b'* %d FETCH (' % sequence
+            self._fetch_items(message, items, out, since is not None)
+        return b'OK', b'UID FETCH completed'
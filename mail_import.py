@@ -0,0 +1,191 @@
+import mmap
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ui_comps'))
+
+from mail_index import IndexFormat, IndexWriter, MailIndex
+
+
+def parse_mbox_range(path: str, start: int, end: int, fallback_date: int) -> list[tuple]:
+    '''
+        Worker task: the header records of the mbox messages in [start, end),
+        as MailIndex.scan_mbox() tuples.
+    '''
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        return list(MailIndex.scan_mbox(buffer, start, end, fallback_date))
+
+
+def parse_maildir_files(root: str, entries: list[tuple[str, int, int, int, int]]) -> list[tuple]:
+    '''
+        Worker task: (date, sender, subject) of each (name, mtime_ns, size,
+        mtime, flags) message file entry.
+    '''
+    return [MailIndex.read_headers(os.path.join(root, name), mtime)[:3] for name, _, _, mtime, _ in entries]
+
+
+class BulkImporter:
+    # mbox bytes per worker task
+    CHUNK_BYTES: int = 8 << 20
+    # Maildir files per worker task
+    FILES_PER_TASK: int = 1000
+
+    def __init__(self, workers: int = None, chunk_bytes: int = None, files_per_task: int = None,
+        progress: Callable[[int, int], None] = None) -> None:
+        '''
+            Builds the index of a whole mailbox with header parsing spread over
+            worker processes, for first imports where parsing is the bottleneck.
+
+            An mbox is cut into chunks of about chunk_bytes, each ending at a
+            'From ' line so no message is split, and a Maildir's file list into
+            shards of files_per_task. Workers parse their part and return compact
+            header tuples, which are merged into one index in mailbox order, so
+            the result is the same as MailIndex.update() would build and later
+            updates carry on from it.
+
+            o	workers (int, optional): worker processes, defaults to the CPU
+                count. With 1 everything runs in this process.
+
+            o	progress (Callable, optional): called with (done, total) as parts
+                finish, bytes for an mbox and files for a Maildir
+        '''
+        self.workers: int = workers or os.cpu_count() or 1
+        self.chunk_bytes: int = chunk_bytes or BulkImporter.CHUNK_BYTES
+        self.files_per_task: int = files_per_task or BulkImporter.FILES_PER_TASK
+        self.progress = progress
+        # seconds spent in the last import parsing (workers) and merging (this process)
+        self.timings: dict[str, float] = {}
+
+    def mbox_chunks(self, path: str) -> list[tuple[int, int]]:
+        '''
+            (start, end) byte ranges covering the mbox, split at message starts.
+        '''
+        size = os.path.getsize(path)
+        if not size:
+            return []
+        chunks, start = [], 0
+        with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            while start < size:
+                following = buffer.find(b'\nFrom ', start + self.chunk_bytes) if start + self.chunk_bytes < size else -1
+                end = size if following == -1 else following + 1
+                chunks.append((start, end))
+                start = end
+        return chunks
+
+    def _run(self, task: Callable, arguments: list[tuple], weights: list[int]) -> list:
+        '''
+            Runs task over arguments, in worker processes when there are more
+            than one, and returns the results in order.
+        '''
+        total, done = sum(weights), 0
+        started = time.perf_counter()
+        if self.progress is not None:
+            self.progress(0, total)
+        if self.workers == 1 or len(arguments) <= 1:
+            results = []
+            for args, weight in zip(arguments, weights):
+                results.append(task(*args))
+                done += weight
+                if self.progress is not None:
+                    self.progress(done, total)
+            self.timings['parse'] = time.perf_counter() - started
+            return results
+
+        results = []
+        with ProcessPoolExecutor(min(self.workers, len(arguments))) as executor:
+            for result, weight in zip(executor.map(task, *zip(*arguments)), weights):
+                results.append(result)
+                done += weight
+                if self.progress is not None:
+                    self.progress(done, total)
+        self.timings['parse'] = time.perf_counter() - started
+        return results
+
+    def import_mbox(self, path: str, index_path: str = None) -> MailIndex:
+        stat = os.stat(path)
+        chunks = self.mbox_chunks(path)
+        results = self._run(parse_mbox_range, [(path, start, end, int(stat.st_mtime)) for start, end in chunks],
+            [end - start for start, end in chunks])
+
+        started = time.perf_counter()
+        writer = IndexWriter()
+        file_id = writer.add_file(os.path.basename(path), stat.st_mtime_ns, stat.st_size)
+        for records in results:
+            for date, offset, length, sender, subject, flags in records:
+                writer.add(date, offset, length, file_id, sender, subject, flags)
+        return self._replace(writer, IndexFormat.MBOX, index_path or MailIndex.default_path(path), started)
+
+    def import_maildir(self, root: str, index_path: str = None) -> MailIndex:
+        entries = [
+            (name, stat.st_mtime_ns, stat.st_size, int(stat.st_mtime), flags)
+            for name, stat, flags in MailIndex.scan_maildir(root).values()
+        ]
+        shards = [entries[idx:idx + self.files_per_task] for idx in range(0, len(entries), self.files_per_task)]
+        results = self._run(parse_maildir_files, [(root, shard) for shard in shards], [len(shard) for shard in shards])
+
+        started = time.perf_counter()
+        writer = IndexWriter()
+        for shard, headers in zip(shards, results):
+            for (name, mtime_ns, size, _, flags), (date, sender, subject) in zip(shard, headers):
+                writer.add(date, 0, size, writer.add_file(name, mtime_ns, size), sender, subject, flags)
+        return self._replace(writer, IndexFormat.MAILDIR, index_path or MailIndex.default_path(root), started)
+
+    def import_mailbox(self, mailbox: str, index_path: str = None) -> MailIndex:
+        '''
+            Indexes a Maildir directory or an mbox file from scratch, replacing
+            any index it had, and returns the opened index.
+        '''
+        if os.path.isdir(mailbox):
+            return self.import_maildir(mailbox, index_path)
+        return self.import_mbox(mailbox, index_path)
+
+    def _replace(self, writer: IndexWriter, kind: int, index_path: str, started: float) -> MailIndex:
+        index = MailIndex(index_path)
+        index.replace(writer, kind)
+        self.timings['merge'] = time.perf_counter() - started
+        return index
+
+
+def import_benchmark(messages: int = 200_000, workers: tuple[int] = None) -> None:
+    '''
+        Writes a synthetic mbox and times a full import with different worker
+        counts, against a single-process MailIndex build.
+    '''
+    import random
+    import tempfile
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'bench.mbox')
+    rng = random.Random(5)
+    senders = [f'=?utf-8?q?Person_{n}?= <person{n}@example.com>' for n in range(500)]
+    with open(path, 'w', encoding='utf-8') as file:
+        for number in range(messages):
+            file.write(f'From person@example.com Mon Jan  1 00:00:00 2024\n'
+                f'Date: Mon, {1 + number % 28:02} Jan 2024 {number % 24:02}:{number % 60:02}:00 +0000\n'
+                f'From: {rng.choice(senders)}\nSubject: Status update {number}\n'
+                f'Message-ID: <{number}@example.com>\nStatus: {"RO" if number % 3 else "O"}\n\n'
+                f'{"Body text. " * rng.randint(5, 60)}\n\n')
+    size = os.path.getsize(path)
+    print(f'{messages} messages, {size / 1e6:.0f} MB, {os.cpu_count()} CPUs')
+
+    start = time.perf_counter()
+    MailIndex.for_mailbox(path, os.path.join(directory, 'single.idx')).close()
+    baseline = time.perf_counter() - start
+    print(f'MailIndex.update     : {baseline:7.2f} s  {messages / baseline:10.0f} msg/s')
+
+    counts = workers or tuple(sorted({1, 2, 4, os.cpu_count() or 1}))
+    for count in counts:
+        importer = BulkImporter(count, chunk_bytes=max(1 << 20, size // (count * 4)))
+        start = time.perf_counter()
+        importer.import_mbox(path, os.path.join(directory, f'bulk{count}.idx')).close()
+        elapsed = time.perf_counter() - start
+        merge = importer.timings['merge']
+        print(f'BulkImporter x{count:<3}   : {elapsed:7.2f} s  {messages / elapsed:10.0f} msg/s  '
+            f'speedup {baseline / elapsed:4.2f}x  (merge {merge:.2f} s, {merge / elapsed:.0%} serial)')
+
+
+if __name__ == '__main__':
+    import_benchmark()
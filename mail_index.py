@@ -0,0 +1,726 @@
+import email.header
+import email.utils
+import heapq
+import mmap
+import os
+import struct
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from email.errors import HeaderParseError
+from email.parser import BytesHeaderParser
+from typing import Callable, Iterator
+
+
+class MessageFlags:
+    '''
+        Message state bits, as stored in the index.
+    '''
+    SEEN: int = 1
+    REPLIED: int = 2
+    FLAGGED: int = 4
+    DRAFT: int = 8
+    TRASHED: int = 16
+    PASSED: int = 32
+    # the message is gone from the mailbox, its record stays so record numbers don't shift
+    REMOVED: int = 1 << 15
+
+    # Maildir info letters (':2,FRS'), the mbox Status / X-Status letters and the IMAP system flags
+    MAILDIR: dict[str, int] = {'S': SEEN, 'R': REPLIED, 'F': FLAGGED, 'D': DRAFT, 'T': TRASHED, 'P': PASSED}
+    MBOX: dict[str, int] = {'R': SEEN, 'A': REPLIED, 'F': FLAGGED, 'D': TRASHED}
+    IMAP: dict[str, int] = {'\\seen': SEEN, '\\answered': REPLIED, '\\flagged': FLAGGED, '\\draft': DRAFT,
+        '\\deleted': TRASHED}
+
+    @staticmethod
+    def from_maildir(name: str) -> int:
+        _, _, info = name.partition(':2,')
+        flags = 0
+        for letter in info:
+            flags |= MessageFlags.MAILDIR.get(letter, 0)
+        return flags
+
+    @staticmethod
+    def from_mbox(status: str, x_status: str) -> int:
+        flags = 0
+        for letter in f'{status or ""}{x_status or ""}':
+            flags |= MessageFlags.MBOX.get(letter, 0)
+        return flags
+
+    @staticmethod
+    def from_imap(names) -> int:
+        flags = 0
+        for name in names:
+            flags |= MessageFlags.IMAP.get(name.lower(), 0)
+        return flags
+
+
+class MessageRecord:
+    __slots__ = ('index', 'date', 'sender', 'subject', 'flags', 'path', 'offset', 'length')
+
+    def __init__(self, index: int, date: int, sender: str, subject: str, flags: int, path: str, offset: int,
+        length: int) -> None:
+        '''
+            The header fields of one indexed message. Records are built on demand
+            from the mapped index, only for the rows being shown.
+
+            o	date (int): seconds since the epoch
+
+            o	path (str): the message file (Maildir) or the mbox file
+
+            o	offset / length (int): where the message sits in path
+        '''
+        self.index: int = index
+        self.date: int = date
+        self.sender: str = sender
+        self.subject: str = subject
+        self.flags: int = flags
+        self.path: str = path
+        self.offset: int = offset
+        self.length: int = length
+
+    def has_flag(self, flag: int) -> bool:
+        return bool(self.flags & flag)
+
+    def __repr__(self) -> str:
+        return f'MessageRecord({self.index}, {self.date}, {self.sender!r}, {self.subject!r})'
+
+
+class HeaderParser:
+    # Subjects and senders are cut to this many characters before they are stored
+    MAX_TEXT: int = 512
+
+    _parser: BytesHeaderParser = BytesHeaderParser()
+
+    @staticmethod
+    def decode(value) -> str:
+        '''
+            Decodes RFC 2047 encoded words and folds the value onto one line.
+        '''
+        if value is None:
+            return ''
+        try:
+            text = str(email.header.make_header(email.header.decode_header(str(value))))
+        except (HeaderParseError, UnicodeError, LookupError, ValueError):
+            text = str(value)
+        return ' '.join(text.split())[:HeaderParser.MAX_TEXT]
+
+    @staticmethod
+    def parse(raw: bytes, fallback_date: int) -> tuple[int, str, str, int]:
+        '''
+            Returns (date, sender, subject, mbox flags) from the raw header block.
+            Messages without a readable Date header get fallback_date.
+        '''
+        headers = HeaderParser._parser.parsebytes(raw)
+        try:
+            date = int(email.utils.parsedate_to_datetime(headers['Date']).timestamp())
+        except (TypeError, ValueError, IndexError, OverflowError):
+            date = fallback_date
+
+        name, address = email.utils.parseaddr(HeaderParser.decode(headers['From']))
+        flags = MessageFlags.from_mbox(headers['Status'], headers['X-Status'])
+        return date, name or address, HeaderParser.decode(headers['Subject']), flags
+
+    @staticmethod
+    def header_end(buffer, start: int, end: int) -> int:
+        '''
+            Offset of the blank line that ends the headers in buffer[start:end].
+        '''
+        candidates = [pos for pos in (buffer.find(b'\n\n', start, end), buffer.find(b'\n\r\n', start, end)) if pos != -1]
+        return min(candidates) + 1 if candidates else end
+
+
+class IndexFormat:
+    '''
+        The on-disk layout of an index file, all offsets in bytes:
+
+            header | records | files | by date | by sender | strings
+
+        Every message is a fixed-size record and every source file a fixed-size
+        file entry. Text (senders, subjects, file names) lives in a shared string
+        table that records point into, repeated senders are stored once. The two
+        sorted views are arrays of record numbers. Index files are a local cache
+        and use the machine's byte order for the view arrays.
+
+        Record numbers are stable: new messages are appended and removed ones are
+        marked REMOVED and left out of the views. generation changes whenever
+        records are renumbered (a compaction or a rebuilt mbox), anything keyed by
+        record number (the search index) checks it.
+    '''
+    MAGIC: bytes = b'COIDX\x00\x02\x00'
+    MAILDIR: int = 0
+    MBOX: int = 1
+    # a folder on an IMAP server: records hold the UID in offset, in ascending UID order
+    IMAP: int = 2
+
+    # magic, kind, records, live records, files, generation, files, by date, by sender, strings
+    HEADER: struct.Struct = struct.Struct('<8sIIIIIQQQQ')
+    # date, offset, length, file id, sender offset, subject offset, sender length, subject length, flags
+    RECORD: struct.Struct = struct.Struct('<qQIIIIHHH')
+    # mtime_ns, size, name offset, name length
+    FILE: struct.Struct = struct.Struct('<qQIH')
+
+    @staticmethod
+    def align(offset: int) -> int:
+        return (offset + 7) & ~7
+
+
+class IndexWriter:
+    def __init__(self) -> None:
+        '''
+            Collects records for a new index file, text is interned into the
+            string table as it is added.
+        '''
+        self.records: list[tuple] = []
+        self.files: list[tuple] = []
+        self.removed: int = 0
+        self._strings: bytearray = bytearray()
+        self._interned: dict[bytes, int] = {}
+        # the sorted views of records copied by from_index(), later records are merged into them
+        self._orders: dict[str, array] = None
+        self._copied: int = 0
+
+    @staticmethod
+    def from_index(index: 'MailIndex', flags: dict[int, int] = None) -> 'IndexWriter':
+        '''
+            A writer holding every record, file and string of index, copied in
+            bulk, with the flags of the record numbers in flags replaced. Writing
+            it merges the records added since into the existing sorted views
+            instead of sorting everything again, so adding a few messages to a
+            large index doesn't cost a full rebuild.
+        '''
+        writer = IndexWriter()
+        start = IndexFormat.HEADER.size
+        records = list(IndexFormat.RECORD.iter_unpack(index._map[start:start + index.count * IndexFormat.RECORD.size]))
+        for number, value in (flags or {}).items():
+            records[number] = records[number][:8] + (value,)
+        writer.records = records
+        writer.removed = sum(1 for record in records if record[8] & MessageFlags.REMOVED)
+        writer.files = list(IndexFormat.FILE.iter_unpack(
+            index._map[index._files_at:index._files_at + index.file_count * IndexFormat.FILE.size]
+        ))
+        writer._strings = bytearray(index._map[index._strings_at:])
+        writer._orders = {name: array('I', index.order(name)) for name in ('date', 'sender')}
+        writer._copied = len(records)
+        return writer
+
+    def intern(self, text: bytes) -> tuple[int, int]:
+        offset = self._interned.get(text)
+        if offset is None:
+            offset = self._interned[text] = len(self._strings)
+            self._strings += text
+        return offset, len(text)
+
+    def add_file(self, name: str, mtime_ns: int, size: int) -> int:
+        offset, length = self.intern(name.encode('utf-8', errors='surrogateescape'))
+        self.files.append((mtime_ns, size, offset, length))
+        return len(self.files) - 1
+
+    def add(self, date: int, offset: int, length: int, file_id: int, sender: str, subject: str, flags: int) -> None:
+        sender_offset, sender_length = self.intern(sender.encode('utf-8', errors='replace'))
+        subject_offset, subject_length = self.intern(subject.encode('utf-8', errors='replace'))
+        self.records.append(
+            (date, offset, length, file_id, sender_offset, subject_offset, sender_length, subject_length, flags)
+        )
+        self.removed += bool(flags & MessageFlags.REMOVED)
+
+    def sender_key(self, number: int) -> tuple[str, int]:
+        '''
+            Sort key of the by-sender view: sender without case, newest first.
+        '''
+        record = self.records[number]
+        sender = self._strings[record[4]:record[4] + record[6]].decode('utf-8', errors='replace')
+        return sender.lower(), -record[0]
+
+    def compact(self) -> None:
+        '''
+            Drops the removed records, which renumbers the rest.
+        '''
+        self.records = [record for record in self.records if not record[8] & MessageFlags.REMOVED]
+        self.removed = 0
+        self._orders, self._copied = None, 0
+
+    @staticmethod
+    def merge(order: array, added: list[int], key: Callable[[int], object]) -> array:
+        '''
+            order with added (sorted by the same key) merged in, in one pass.
+            Each added record is placed with a binary search from where the
+            previous one went, and the runs of order between them are copied
+            whole, so keys are only computed for the searches. When that would
+            take more key computations than order has records, the two are
+            merged linearly instead. Records with equal keys keep their
+            numbering order, as a full sort would leave them.
+        '''
+        if len(added) * len(order).bit_length() > len(order):
+            # so many records that computing every key once beats the searches
+            return array('I', heapq.merge(order, added, key=key))
+        merged, start = array('I'), 0
+        for idx in added:
+            position = bisect_right(order, key(idx), lo=start, key=key)
+            merged.extend(order[start:position])
+            merged.append(idx)
+            start = position
+        merged.extend(order[start:])
+        return merged
+
+    def write(self, path: str, kind: int, generation: int) -> None:
+        '''
+            Writes the index next to path and swaps it in, so readers never
+            see a half-written file.
+        '''
+        records, files = self.records, self.files
+        removed = MessageFlags.REMOVED
+        if self._orders is None:
+            live = [idx for idx, record in enumerate(records) if not record[8] & removed]
+            by_date = array('I', sorted(live, key=lambda idx: records[idx][0], reverse=True))
+            by_sender = array('I', sorted(live, key=self.sender_key))
+        else:
+            added = [idx for idx in range(self._copied, len(records)) if not records[idx][8] & removed]
+            date_key = lambda number: -records[number][0]
+            by_date = IndexWriter.merge(
+                array('I', (idx for idx in self._orders['date'] if not records[idx][8] & removed)),
+                sorted(added, key=date_key), date_key
+            )
+            by_sender = IndexWriter.merge(
+                array('I', (idx for idx in self._orders['sender'] if not records[idx][8] & removed)),
+                sorted(added, key=self.sender_key), self.sender_key
+            )
+
+        header, record, entry = IndexFormat.HEADER, IndexFormat.RECORD, IndexFormat.FILE
+        files_at = IndexFormat.align(header.size + record.size * len(records))
+        by_date_at = IndexFormat.align(files_at + entry.size * len(files))
+        by_sender_at = by_date_at + by_date.itemsize * len(by_date)
+        strings_at = IndexFormat.align(by_sender_at + by_sender.itemsize * len(by_sender))
+
+        out = bytearray(strings_at + len(self._strings))
+        header.pack_into(out, 0, IndexFormat.MAGIC, kind, len(records), len(by_date), len(files), generation, files_at,
+            by_date_at, by_sender_at, strings_at)
+        for idx, fields in enumerate(records):
+            record.pack_into(out, header.size + idx * record.size, *fields)
+        for idx, fields in enumerate(files):
+            entry.pack_into(out, files_at + idx * entry.size, *fields)
+        out[by_date_at:by_sender_at] = by_date.tobytes()
+        out[by_sender_at:by_sender_at + by_sender.itemsize * len(by_sender)] = by_sender.tobytes()
+        out[strings_at:] = self._strings
+
+        temp = f'{path}.tmp'
+        with open(temp, 'wb') as file:
+            file.write(out)
+        os.replace(temp, path)
+
+
+class IndexView:
+    def __init__(self, index: 'MailIndex', order: str, row_factory: Callable[[MessageRecord], object] = None) -> None:
+        '''
+            A sorted list of an index's messages that reads like a sequence, so it
+            can be handed straight to ValuePagedMenu. Rows are built with
+            row_factory (MessageRecord by default) only for the slice asked for.
+            The view follows the index, it stays valid across update(). Reads
+            hold the index lock, so a menu prefetching pages on another thread
+            never sees the index half swapped.
+        '''
+        self.index: 'MailIndex' = index
+        self.order: str = order
+        self.row_factory = row_factory
+
+    def __len__(self) -> int:
+        with self.index.lock:
+            return len(self.index.order(self.order))
+
+    def _row(self, number: int):
+        with self.index.lock:
+            record = self.index.record(self.index.order(self.order)[number])
+        return record if self.row_factory is None else self.row_factory(record)
+
+    def __getitem__(self, key):
+        with self.index.lock:
+            if isinstance(key, slice):
+                return [self._row(number) for number in range(*key.indices(len(self)))]
+            if key < 0:
+                key += len(self)
+            if not 0 <= key < len(self):
+                raise IndexError(key)
+            return self._row(key)
+
+    def __iter__(self):
+        for number in range(len(self)):
+            yield self._row(number)
+
+
+class MailIndex:
+    # Headers past this many bytes are not read when indexing a Maildir message
+    HEADER_READ: int = 1 << 16
+    # Removed records are compacted away once there are this many and they outnumber the live ones
+    COMPACT_AFTER: int = 1024
+
+    def __init__(self, path: str) -> None:
+        '''
+            A message index loaded from an index file by memory-mapping it.
+
+            Opening costs a map and a header read regardless of the number of
+            messages, records and the sorted views are read from the mapped pages
+            as rows are asked for. update() brings the index in line with the
+            mailbox, reparsing only messages that are new or changed.
+
+            Use MailIndex.for_mailbox() to open and update the index of a Maildir
+            directory or an mbox file in one step.
+        '''
+        self.path: str = path
+        self.kind: int = None
+        self.count: int = 0
+        self.live: int = 0
+        self.file_count: int = 0
+        self.generation: int = 0
+        self._file = None
+        self._map = None
+        self._views: dict[str, memoryview] = {}
+        # held while the file is swapped for a new one and while views read rows
+        self.lock = threading.RLock()
+        self._load()
+
+    @staticmethod
+    def default_path(mailbox: str) -> str:
+        if os.path.isdir(mailbox):
+            return os.path.join(mailbox, '.consoleoutlook.idx')
+        return f'{mailbox}.idx'
+
+    @staticmethod
+    def for_mailbox(mailbox: str, index_path: str = None) -> 'MailIndex':
+        index = MailIndex(index_path or MailIndex.default_path(mailbox))
+        index.update(mailbox)
+        return index
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < IndexFormat.HEADER.size:
+            return
+        self._file = open(self.path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, kind, count, live, files, generation, self._files_at, by_date_at, by_sender_at, self._strings_at = \
+            IndexFormat.HEADER.unpack_from(self._map, 0)
+        if magic != IndexFormat.MAGIC:
+            # an index from another version is rebuilt on the next update
+            self.close()
+            return
+
+        self.kind, self.count, self.live, self.file_count, self.generation = kind, count, live, files, generation
+        buffer = memoryview(self._map)
+        self._views = {
+            'date': buffer[by_date_at:by_date_at + 4 * live].cast('I'),
+            'sender': buffer[by_sender_at:by_sender_at + 4 * live].cast('I'),
+        }
+        buffer.release()
+
+    def close(self) -> None:
+        for view in self._views.values():
+            view.release()
+        self._views = {}
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+        self._map, self._file = None, None
+        self.kind, self.count, self.live, self.file_count = None, 0, 0, 0
+
+    def __len__(self) -> int:
+        '''
+            Number of messages in the mailbox, count includes removed records.
+        '''
+        return self.live
+
+    def is_live(self, number: int) -> bool:
+        return not self.raw_record(number)[8] & MessageFlags.REMOVED
+
+    def order(self, name: str) -> memoryview:
+        return self._views.get(name, ())
+
+    def _text(self, offset: int, length: int) -> str:
+        start = self._strings_at + offset
+        return str(self._map[start:start + length], 'utf-8', errors='replace')
+
+    def file_entry(self, file_id: int) -> tuple[str, int, int]:
+        '''
+            (name, mtime_ns, size) of a source file, names are relative to the mailbox.
+        '''
+        mtime_ns, size, offset, length = IndexFormat.FILE.unpack_from(
+            self._map, self._files_at + file_id * IndexFormat.FILE.size
+        )
+        start = self._strings_at + offset
+        return self._map[start:start + length].decode('utf-8', errors='surrogateescape'), mtime_ns, size
+
+    def raw_record(self, number: int) -> tuple:
+        return IndexFormat.RECORD.unpack_from(self._map, IndexFormat.HEADER.size + number * IndexFormat.RECORD.size)
+
+    def record(self, number: int) -> MessageRecord:
+        date, offset, length, file_id, sender_at, subject_at, sender_length, subject_length, flags = \
+            self.raw_record(number)
+        return MessageRecord(number, date, self._text(sender_at, sender_length), self._text(subject_at, subject_length),
+            flags, self.file_entry(file_id)[0], offset, length)
+
+    def by_date(self, row_factory: Callable[[MessageRecord], object] = None) -> IndexView:
+        '''
+            Messages newest first.
+        '''
+        return IndexView(self, 'date', row_factory)
+
+    def by_sender(self, row_factory: Callable[[MessageRecord], object] = None) -> IndexView:
+        '''
+            Messages grouped by sender (case-insensitive), newest first within a sender.
+        '''
+        return IndexView(self, 'sender', row_factory)
+
+    def read_message(self, record: MessageRecord, mailbox: str) -> bytes:
+        with open(os.path.join(mailbox, record.path) if self.kind == IndexFormat.MAILDIR else mailbox, 'rb') as file:
+            file.seek(record.offset)
+            return file.read(record.length)
+
+    def update(self, mailbox: str) -> dict[str, int]:
+        '''
+            Re-indexes what changed in the mailbox since the index was written,
+            returns counts of the messages added, removed and kept. The index file
+            is only rewritten when something changed.
+        '''
+        if os.path.isdir(mailbox):
+            writer, stats = self._update_maildir(mailbox)
+            kind = IndexFormat.MAILDIR
+        else:
+            writer, stats = self._update_mbox(mailbox)
+            kind = IndexFormat.MBOX
+
+        if writer is not None:
+            self._commit(writer, kind, stats.get('renumbered', False))
+        stats.pop('renumbered', None)
+        return stats
+
+    def replace(self, writer: IndexWriter, kind: int) -> None:
+        '''
+            Swaps in an index built elsewhere (a bulk import) for this one.
+        '''
+        self._commit(writer, kind, True)
+
+    def _commit(self, writer: IndexWriter, kind: int, renumbered: bool) -> None:
+        generation = self.generation
+        if self.kind is None or self.kind != kind or renumbered:
+            generation += 1
+        if writer.removed >= MailIndex.COMPACT_AFTER and writer.removed * 2 > len(writer.records):
+            writer.compact()
+            generation += 1
+        with self.lock:
+            self.close()
+            writer.write(self.path, kind, generation)
+            self._load()
+
+    def highest_uid(self) -> int:
+        '''
+            The highest UID indexed for an IMAP folder, 0 when there is none.
+        '''
+        return self.raw_record(self.count - 1)[1] if self.kind == IndexFormat.IMAP and self.count else 0
+
+    def find_uid(self, uid: int) -> int:
+        '''
+            The record number of an IMAP message, -1 when it isn't indexed.
+        '''
+        number = bisect_left(range(self.count), uid, key=lambda idx: self.raw_record(idx)[1])
+        return number if number < self.count and self.raw_record(number)[1] == uid else -1
+
+    def live_uids(self) -> list[int]:
+        return [record[1] for record in IndexFormat.RECORD.iter_unpack(
+            self._map[IndexFormat.HEADER.size:IndexFormat.HEADER.size + self.count * IndexFormat.RECORD.size]
+        ) if not record[8] & MessageFlags.REMOVED] if self.count else []
+
+    def apply_remote(self, folder: str, added: list[MessageRecord], flags: dict[int, int], removed: set[int],
+        reset: bool = False) -> dict[str, int]:
+        '''
+            Brings the index of an IMAP folder up to date with changes fetched
+            from the server, returns counts of the messages added, removed and
+            flagged (flags changed).
+
+            o	added (list[MessageRecord]): new messages in ascending UID order,
+                all above highest_uid(), UID in offset
+
+            o	flags (dict[int, int]): current flags by UID, unchanged ones are skipped
+
+            o	removed (set[int]): UIDs gone from the folder
+
+            o	reset (bool, optional): drop what is indexed and start over with
+                added, for a changed UIDVALIDITY
+
+            Flag changes alone are written into the mapped records in place and
+            views stay as they are. New or removed messages rewrite the index.
+        '''
+        current = not reset and self.kind == IndexFormat.IMAP
+        changed: dict[int, int] = {}
+        gone: set[int] = set()
+        if current:
+            for uid, value in flags.items():
+                number = self.find_uid(uid)
+                if number != -1 and self.raw_record(number)[8] not in (value, value | MessageFlags.REMOVED):
+                    changed[number] = value
+            gone = {number for number in map(self.find_uid, removed) if number != -1 and self.is_live(number)}
+            changed = {number: value for number, value in changed.items() if number not in gone}
+        stats = {'added': len(added), 'removed': len(gone), 'flagged': len(changed)}
+
+        if current and not added and not gone:
+            if changed:
+                with open(self.path, 'r+b') as file:
+                    for number, value in changed.items():
+                        file.seek(IndexFormat.HEADER.size + (number + 1) * IndexFormat.RECORD.size - 2)
+                        file.write(struct.pack('<H', value))
+            return stats
+
+        if current:
+            changed.update((number, self.raw_record(number)[8] | MessageFlags.REMOVED) for number in gone)
+            writer, file_id = IndexWriter.from_index(self, changed), 0
+        else:
+            writer = IndexWriter()
+            file_id = writer.add_file(folder, 0, 0)
+        for record in added:
+            writer.add(record.date, record.offset, record.length, file_id, record.sender, record.subject, record.flags)
+        self._commit(writer, IndexFormat.IMAP, reset and self.kind == IndexFormat.IMAP)
+        return stats
+
+    def _keep(self, writer: IndexWriter, number: int, file_id: int, flags: int = None) -> None:
+        date, offset, length, _, sender_at, subject_at, sender_length, subject_length, old_flags = \
+            self.raw_record(number)
+        writer.add(date, offset, length, file_id, self._text(sender_at, sender_length),
+            self._text(subject_at, subject_length), old_flags if flags is None else flags)
+
+    @staticmethod
+    def unique_name(name: str) -> str:
+        '''
+            The part of a Maildir file name that survives moves and flag changes.
+        '''
+        return os.path.basename(name).partition(':2,')[0]
+
+    @staticmethod
+    def scan_maildir(root: str) -> dict[str, tuple[str, os.stat_result, int]]:
+        '''
+            Name (relative to root), stat and flags of every message file, by
+            unique message name.
+        '''
+        scanned: dict[str, tuple[str, os.stat_result, int]] = {}
+        for folder in ('new', 'cur'):
+            directory = os.path.join(root, folder)
+            if not os.path.isdir(directory):
+                continue
+            for entry in os.scandir(directory):
+                if not entry.name.startswith('.') and entry.is_file():
+                    scanned[MailIndex.unique_name(entry.name)] = (f'{folder}/{entry.name}', entry.stat(),
+                        MessageFlags.from_maildir(entry.name))
+        return scanned
+
+    @staticmethod
+    def read_headers(path: str, fallback_date: int) -> tuple[int, str, str, int]:
+        '''
+            HeaderParser.parse() of a message file, reading at most HEADER_READ bytes.
+        '''
+        with open(path, 'rb') as file:
+            head = file.read(MailIndex.HEADER_READ)
+        return HeaderParser.parse(head[:HeaderParser.header_end(head, 0, len(head))], fallback_date)
+
+    def _update_maildir(self, root: str) -> tuple[IndexWriter, dict[str, int]]:
+        unique = MailIndex.unique_name
+        scanned = MailIndex.scan_maildir(root)
+
+        writer = IndexWriter()
+        stats = {'added': 0, 'removed': 0, 'kept': 0, 'renamed': 0}
+        changed = []
+        if self.kind == IndexFormat.MAILDIR:
+            for number in range(self.count):
+                flags = self.raw_record(number)[8]
+                name, mtime_ns, size = self.file_entry(self.raw_record(number)[3])
+                current = scanned.pop(unique(name), None) if not flags & MessageFlags.REMOVED else None
+
+                if current is None or current[1].st_size != size:
+                    if not flags & MessageFlags.REMOVED:
+                        stats['removed'] += 1
+                    if current is not None:
+                        # rewritten in place, indexed again as a new message
+                        changed.append(current)
+                    self._keep(writer, number, writer.add_file(name, mtime_ns, size), flags | MessageFlags.REMOVED)
+                    continue
+
+                # moving new/ -> cur/ or changing flags renames the file, the headers are the same
+                current_name, stat, current_flags = current
+                self._keep(writer, number, writer.add_file(current_name, stat.st_mtime_ns, stat.st_size),
+                    current_flags)
+                stats['kept'] += 1
+                stats['renamed'] += current_name != name
+
+        for name, stat, flags in (*changed, *scanned.values()):
+            date, sender, subject, _ = MailIndex.read_headers(os.path.join(root, name), int(stat.st_mtime))
+            writer.add(date, 0, stat.st_size, writer.add_file(name, stat.st_mtime_ns, stat.st_size), sender, subject,
+                flags)
+            stats['added'] += 1
+
+        if not (stats['added'] or stats['removed'] or stats['renamed']) and self.kind == IndexFormat.MAILDIR:
+            return None, stats
+        return writer, stats
+
+    def _update_mbox(self, path: str) -> tuple[IndexWriter, dict[str, int]]:
+        stat = os.stat(path)
+        stats = {'added': 0, 'removed': 0, 'kept': 0}
+        writer = None
+        start = 0
+        if self.kind == IndexFormat.MBOX and self.file_count:
+            _, mtime_ns, size = self.file_entry(0)
+            if mtime_ns == stat.st_mtime_ns and size == stat.st_size:
+                stats['kept'] = self.live
+                return None, stats
+
+            appended = False
+            if stat.st_size > size:
+                with open(path, 'rb') as file:
+                    file.seek(size)
+                    appended = file.read(5) == b'From '
+            if appended:
+                # new mail was appended after what was indexed, keep every record
+                writer = IndexWriter.from_index(self)
+                writer.files[0] = (stat.st_mtime_ns, stat.st_size, *writer.files[0][2:])
+                stats['kept'] = self.live
+                start = size
+            else:
+                stats['removed'] = self.live
+                stats['renumbered'] = True
+
+        file_id = 0
+        if writer is None:
+            writer = IndexWriter()
+            writer.add_file(os.path.basename(path), stat.st_mtime_ns, stat.st_size)
+        if stat.st_size > start:
+            with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                stats['added'] = MailIndex._scan_mbox(buffer, start, stat.st_size, writer, file_id,
+                    int(stat.st_mtime))
+        return writer, stats
+
+    @staticmethod
+    def _scan_mbox(buffer, start: int, size: int, writer: IndexWriter, file_id: int, fallback_date: int) -> int:
+        '''
+            Indexes the messages of an mbox from byte start, each one begins
+            with a 'From ' line.
+        '''
+        added = 0
+        for date, offset, length, sender, subject, flags in MailIndex.scan_mbox(buffer, start, size, fallback_date):
+            writer.add(date, offset, length, file_id, sender, subject, flags)
+            added += 1
+        return added
+
+    @staticmethod
+    def scan_mbox(buffer, start: int, end: int, fallback_date: int) -> Iterator[tuple[int, int, int, str, str, int]]:
+        '''
+            (date, offset, length, sender, subject, flags) of the mbox messages
+            in buffer[start:end], end has to be the end of a message. Offsets
+            skip the 'From ' line.
+        '''
+        if buffer[start:start + 5] != b'From ':
+            start = buffer.find(b'\nFrom ', start, end)
+            if start == -1:
+                return
+            start += 1
+
+        while start < end:
+            following = buffer.find(b'\nFrom ', start, end)
+            stop = end if following == -1 else following + 1
+            body_at = buffer.find(b'\n', start, stop) + 1 or stop
+            headers_end = HeaderParser.header_end(buffer, body_at, stop)
+
+            date, sender, subject, flags = HeaderParser.parse(buffer[body_at:headers_end], fallback_date)
+            yield date, body_at, stop - body_at, sender, subject, flags
+            start = stop
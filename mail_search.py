@@ -0,0 +1,567 @@
+import email
+import heapq
+import json
+import mmap
+import os
+import re
+import struct
+from bisect import bisect_left
+from typing import Iterable, Iterator
+
+from mail_index import IndexFormat, MailIndex
+
+
+class Tokenizer:
+    WORD: re.Pattern = re.compile(r'\w+')
+    # longer runs are encoded blobs or ids, not something anyone searches for
+    MAX_LENGTH: int = 40
+    # tokens past this many in one message aren't indexed
+    MAX_TOKENS: int = 20_000
+
+    @staticmethod
+    def tokens(text: str) -> list[str]:
+        return [token for token in Tokenizer.WORD.findall(text.lower()) if len(token) <= Tokenizer.MAX_LENGTH]
+
+
+class MessageText:
+    # only this much of a message is read for indexing
+    READ_LIMIT: int = 1 << 18
+
+    @staticmethod
+    def extract(raw: bytes) -> str:
+        '''
+            The searchable text of a message: sender, recipients, subject and
+            every text/plain part, decoded.
+        '''
+        message = email.message_from_bytes(raw[:MessageText.READ_LIMIT])
+        pieces = [str(message.get(name, '')) for name in ('From', 'To', 'Cc', 'Subject')]
+        for part in message.walk():
+            if part.get_content_type() != 'text/plain':
+                continue
+            payload = part.get_payload(decode=True)
+            if payload:
+                pieces.append(payload.decode(part.get_content_charset() or 'utf-8', errors='replace'))
+        return '\n'.join(pieces)
+
+
+class Varint:
+    @staticmethod
+    def encode(value: int, out: bytearray) -> None:
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+
+    @staticmethod
+    def decode_all(buffer, start: int, end: int) -> list[int]:
+        values, value, shift = [], 0, 0
+        for byte in buffer[start:end]:
+            value |= (byte & 0x7F) << shift
+            if byte & 0x80:
+                shift += 7
+            else:
+                values.append(value)
+                value, shift = 0, 0
+        return values
+
+
+class SegmentFormat:
+    '''
+        One immutable segment of the search index, all offsets in bytes:
+
+            header | term entries | term text | postings
+
+        Term entries are fixed-size and sorted by term, so a term is found by
+        binary search over the mapped file. A term's postings are split into
+        blocks of BLOCK documents, preceded by a skip table holding the last
+        document of each block and where the block ends. Inside a block every
+        document is stored as varints: the gap from the previous document, the
+        number of positions, then the gaps between positions.
+    '''
+    MAGIC: bytes = b'COSEG\x00\x01\x00'
+    BLOCK: int = 128
+
+    # magic, documents, terms, first document, last document, entries, term text, postings
+    HEADER: struct.Struct = struct.Struct('<8sIIIIQQQ')
+    # term offset, term length, document frequency, postings offset
+    ENTRY: struct.Struct = struct.Struct('<IHIQ')
+
+    @staticmethod
+    def encode_postings(postings: list[tuple[int, list[int]]]) -> bytes:
+        skip, data, previous = [], bytearray(), 0
+        for start in range(0, len(postings), SegmentFormat.BLOCK):
+            for doc, positions in postings[start:start + SegmentFormat.BLOCK]:
+                Varint.encode(doc - previous, data)
+                Varint.encode(len(positions), data)
+                last = 0
+                for position in positions:
+                    Varint.encode(position - last, data)
+                    last = position
+                previous = doc
+            skip.extend((previous, len(data)))
+        return struct.pack(f'<I{len(skip)}I', len(skip) // 2, *skip) + data
+
+    @staticmethod
+    def write(path: str, terms: Iterable[tuple[str, list[tuple[int, list[int]]]]], doc_count: int, first_doc: int,
+        last_doc: int) -> None:
+        '''
+            Writes a segment from (term, postings) pairs in term order, postings
+            in ascending document order.
+        '''
+        entries, text, postings = bytearray(), bytearray(), bytearray()
+        count = 0
+        for term, term_postings in terms:
+            encoded = term.encode('utf-8')
+            entries += SegmentFormat.ENTRY.pack(len(text), len(encoded), len(term_postings), len(postings))
+            text += encoded
+            postings += SegmentFormat.encode_postings(term_postings)
+            count += 1
+
+        header = SegmentFormat.HEADER
+        entries_at = header.size
+        text_at = entries_at + len(entries)
+        postings_at = text_at + len(text)
+        temp = f'{path}.tmp'
+        with open(temp, 'wb') as file:
+            file.write(header.pack(SegmentFormat.MAGIC, doc_count, count, first_doc, last_doc, entries_at, text_at,
+                postings_at))
+            file.write(entries)
+            file.write(text)
+            file.write(postings)
+        os.replace(temp, path)
+
+
+class SegmentBuilder:
+    def __init__(self) -> None:
+        '''
+            Collects the postings of a batch of messages in memory until
+            they are written out as a segment.
+        '''
+        self.postings: dict[str, list[tuple[int, list[int]]]] = {}
+        self.doc_count: int = 0
+        self.first_doc: int = None
+        self.last_doc: int = None
+
+    def add(self, doc: int, tokens: list[str]) -> None:
+        '''
+            Documents have to be added in ascending order.
+        '''
+        positions: dict[str, list[int]] = {}
+        for position, token in enumerate(tokens[:Tokenizer.MAX_TOKENS]):
+            found = positions.get(token)
+            if found is None:
+                positions[token] = [position]
+            else:
+                found.append(position)
+
+        postings = self.postings
+        for token, token_positions in positions.items():
+            entry = postings.get(token)
+            if entry is None:
+                postings[token] = [(doc, token_positions)]
+            else:
+                entry.append((doc, token_positions))
+
+        self.doc_count += 1
+        if self.first_doc is None:
+            self.first_doc = doc
+        self.last_doc = doc
+
+    def write(self, path: str) -> None:
+        SegmentFormat.write(path, sorted(self.postings.items()), self.doc_count, self.first_doc, self.last_doc)
+
+
+class PostingsList:
+    def __init__(self, segment: 'Segment', doc_freq: int, offset: int) -> None:
+        '''
+            Reads one term's postings a block at a time from the mapped segment.
+        '''
+        buffer = segment.buffer
+        self.doc_freq: int = doc_freq
+        blocks = struct.unpack_from('<I', buffer, offset)[0]
+        skip = struct.unpack_from(f'<{blocks * 2}I', buffer, offset + 4)
+        self.last_docs: tuple[int] = skip[0::2]
+        self.ends: tuple[int] = skip[1::2]
+        self._buffer = buffer
+        self._data_at: int = offset + 4 + blocks * 8
+        self._cached: tuple = (None, None, None)
+
+    def block(self, number: int) -> tuple[list[int], list[list[int]]]:
+        if self._cached[0] == number:
+            return self._cached[1], self._cached[2]
+
+        start = self._data_at + (self.ends[number - 1] if number else 0)
+        values = Varint.decode_all(self._buffer, start, self._data_at + self.ends[number])
+        docs, positions = [], []
+        doc = self.last_docs[number - 1] if number else 0
+        idx = 0
+        while idx < len(values):
+            doc += values[idx]
+            count = values[idx + 1]
+            idx += 2
+            last, doc_positions = 0, []
+            for gap in values[idx:idx + count]:
+                last += gap
+                doc_positions.append(last)
+            idx += count
+            docs.append(doc)
+            positions.append(doc_positions)
+
+        self._cached = (number, docs, positions)
+        return docs, positions
+
+    def descending(self) -> Iterator[int]:
+        for number in range(len(self.last_docs) - 1, -1, -1):
+            yield from reversed(self.block(number)[0])
+
+    def positions(self, doc: int) -> list[int]:
+        '''
+            Positions of the term in doc, None when doc doesn't contain it.
+        '''
+        number = bisect_left(self.last_docs, doc)
+        if number == len(self.last_docs):
+            return None
+        docs, positions = self.block(number)
+        idx = bisect_left(docs, doc)
+        return positions[idx] if idx < len(docs) and docs[idx] == doc else None
+
+
+class Segment:
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+        self._file = open(path, 'rb')
+        self.buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.doc_count, self.term_count, self.first_doc, self.last_doc, self._entries_at, self._text_at, \
+            self._postings_at = SegmentFormat.HEADER.unpack_from(self.buffer, 0)
+        if magic != SegmentFormat.MAGIC:
+            self.close()
+            raise ValueError(f'{path} is not a search segment')
+
+    def close(self) -> None:
+        self.buffer.close()
+        self._file.close()
+
+    def entry(self, number: int) -> tuple[bytes, int, int]:
+        text_offset, length, doc_freq, postings_offset = SegmentFormat.ENTRY.unpack_from(
+            self.buffer, self._entries_at + number * SegmentFormat.ENTRY.size
+        )
+        start = self._text_at + text_offset
+        return self.buffer[start:start + length], doc_freq, self._postings_at + postings_offset
+
+    def lookup(self, term: str) -> PostingsList:
+        wanted = term.encode('utf-8')
+        low, high = 0, self.term_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.entry(middle)[0] < wanted:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.term_count:
+            found, doc_freq, offset = self.entry(low)
+            if found == wanted:
+                return PostingsList(self, doc_freq, offset)
+        return None
+
+    def terms(self) -> Iterator[tuple[str, list[tuple[int, list[int]]]]]:
+        '''
+            Every term with its full postings, in term order, for merging.
+        '''
+        for number in range(self.term_count):
+            term, doc_freq, offset = self.entry(number)
+            postings = PostingsList(self, doc_freq, offset)
+            pairs = []
+            for block in range(len(postings.last_docs)):
+                docs, positions = postings.block(block)
+                pairs.extend(zip(docs, positions))
+            yield term.decode('utf-8'), pairs
+
+
+class Query:
+    TOKEN: re.Pattern = re.compile(r'(-?)"([^"]*)"|(\S+)')
+
+    def __init__(self, text: str) -> None:
+        '''
+            Parses a search query.
+
+            Words must all appear (AND), "quoted words" must appear next to each
+            other in that order, a leading '-' or NOT excludes a word or phrase and
+            OR separates alternatives:
+
+                invoice "q3 report" -draft OR budget
+
+            clauses holds the alternatives, each a list of (negated, tokens) items,
+            an item with several tokens is a phrase.
+        '''
+        self.text: str = text
+        self.clauses: list[list[tuple[bool, list[str]]]] = [[]]
+        negate_next = False
+        for match in Query.TOKEN.finditer(text):
+            minus, phrase, word = match.groups()
+            if word == 'OR':
+                self.clauses.append([])
+                continue
+            if word == 'AND':
+                continue
+            if word == 'NOT':
+                negate_next = True
+                continue
+
+            negated = negate_next or bool(minus)
+            if word is not None and word.startswith('-') and len(word) > 1:
+                negated, word = True, word[1:]
+            tokens = Tokenizer.tokens(phrase if word is None else word)
+            if tokens:
+                self.clauses[-1].append((negated, tokens))
+            negate_next = False
+
+        self.clauses = [clause for clause in self.clauses if clause]
+        for clause in self.clauses:
+            if all(negated for negated, _ in clause):
+                raise ValueError('Every part of a query needs a word that is not excluded')
+
+
+class SearchIndex:
+    # messages per segment while indexing
+    SEGMENT_DOCS: int = 20_000
+    # segments are merged into one past this many
+    MAX_SEGMENTS: int = 8
+
+    def __init__(self, directory: str) -> None:
+        '''
+            A full-text index over a MailIndex, kept in a directory of segments.
+
+            Documents are MailIndex record numbers. update() indexes the records
+            added since the last update into new segments, so growing mailboxes
+            only pay for their new mail, and segments are merged once there are
+            too many. Segments cover ascending, disjoint ranges of record numbers.
+
+            search() yields matching record numbers from the highest down, one
+            postings block at a time, so the first page of a result arrives after
+            decoding a few blocks regardless of how many messages match. That is
+            the order messages were indexed in, most recent first: arrival order
+            for an mbox, directory order for a Maildir, not the messages' dates.
+        '''
+        self.directory: str = directory
+        self.segments: list[Segment] = []
+        self.manifest: dict = {'generation': None, 'next_doc': 0, 'segments': []}
+        self._load()
+
+    @staticmethod
+    def for_index(index: MailIndex, mailbox: str) -> 'SearchIndex':
+        search = SearchIndex(f'{index.path}.search')
+        search.update(index, mailbox)
+        return search
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.directory, 'manifest.json')
+
+    def _load(self) -> None:
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding='utf-8') as file:
+                self.manifest = json.load(file)
+        self.segments = [Segment(os.path.join(self.directory, name)) for name in self.manifest['segments']]
+
+    def _save(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        temp = f'{self.manifest_path}.tmp'
+        with open(temp, 'w', encoding='utf-8') as file:
+            json.dump(self.manifest, file)
+        os.replace(temp, self.manifest_path)
+
+    def close(self) -> None:
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
+
+    def _segment_name(self) -> str:
+        self.manifest['counter'] = self.manifest.get('counter', 0) + 1
+        return f'segment-{self.manifest["counter"]:06}.seg'
+
+    def _drop_segments(self, names: list[str]) -> None:
+        for name in names:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def update(self, index: MailIndex, mailbox: str) -> int:
+        '''
+            Indexes the records added to index since the last update, returns how
+            many messages were indexed. A renumbered index is indexed from scratch.
+        '''
+        self.close()
+        stale = []
+        if self.manifest['generation'] != index.generation:
+            stale = self.manifest['segments']
+            self.manifest.update(generation=index.generation, next_doc=0, segments=[])
+
+        start = self.manifest['next_doc']
+        indexed = 0
+        if start < index.count:
+            os.makedirs(self.directory, exist_ok=True)
+            builder = SegmentBuilder()
+            for doc, raw in self._messages(index, mailbox, start):
+                builder.add(doc, Tokenizer.tokens(MessageText.extract(raw)))
+                indexed += 1
+                if builder.doc_count >= SearchIndex.SEGMENT_DOCS:
+                    self._flush(builder)
+                    builder = SegmentBuilder()
+            if builder.doc_count:
+                self._flush(builder)
+            self.manifest['next_doc'] = index.count
+
+        if len(self.manifest['segments']) > SearchIndex.MAX_SEGMENTS:
+            stale += self._merge()
+        self._save()
+        self._drop_segments(stale)
+        self._load()
+        return indexed
+
+    def _flush(self, builder: SegmentBuilder) -> None:
+        name = self._segment_name()
+        builder.write(os.path.join(self.directory, name))
+        self.manifest['segments'].append(name)
+
+    @staticmethod
+    def _messages(index: MailIndex, mailbox: str, start: int) -> Iterator[tuple[int, bytes]]:
+        if index.kind == IndexFormat.MBOX and index.count > start:
+            with open(mailbox, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                for doc in range(start, index.count):
+                    if index.is_live(doc):
+                        record = index.record(doc)
+                        yield doc, buffer[record.offset:record.offset + min(record.length, MessageText.READ_LIMIT)]
+            return
+
+        for doc in range(start, index.count):
+            if index.is_live(doc):
+                record = index.record(doc)
+                with open(os.path.join(mailbox, record.path), 'rb') as file:
+                    yield doc, file.read(MessageText.READ_LIMIT)
+
+    def _merge(self) -> list[str]:
+        '''
+            Merges every segment into one, returns the names of the old segments.
+        '''
+        segments = [Segment(os.path.join(self.directory, name)) for name in self.manifest['segments']]
+        try:
+            def merged_terms() -> Iterator[tuple[str, list]]:
+                streams = heapq.merge(*(
+                    ((term, order, postings) for term, postings in segment.terms())
+                    for order, segment in enumerate(segments)
+                ))
+                current, postings = None, []
+                for term, _, segment_postings in streams:
+                    if term != current:
+                        if current is not None:
+                            yield current, postings
+                        current, postings = term, []
+                    postings.extend(segment_postings)
+                if current is not None:
+                    yield current, postings
+
+            name = self._segment_name()
+            SegmentFormat.write(os.path.join(self.directory, name), merged_terms(),
+                sum(segment.doc_count for segment in segments), segments[0].first_doc, segments[-1].last_doc)
+        finally:
+            for segment in segments:
+                segment.close()
+
+        old, self.manifest['segments'] = self.manifest['segments'], [name]
+        return old
+
+    @staticmethod
+    def _contains(lists: list[PostingsList], doc: int) -> bool:
+        if len(lists) == 1:
+            return lists[0].positions(doc) is not None
+        found = [postings.positions(doc) for postings in lists]
+        if any(positions is None for positions in found):
+            return False
+        following = [set(positions) for positions in found[1:]]
+        return any(all(start + offset + 1 in positions for offset, positions in enumerate(following))
+            for start in found[0])
+
+    @staticmethod
+    def _clause_docs(segment: Segment, clause: list[tuple[bool, list[str]]]) -> Iterator[int]:
+        required, excluded = [], []
+        for negated, tokens in clause:
+            lists = [segment.lookup(token) for token in tokens]
+            if negated:
+                if all(lists):
+                    excluded.append(lists)
+            elif not all(lists):
+                return
+            else:
+                required.append(lists)
+
+        # walk the rarest term and check the rest against it
+        driver = min((postings for lists in required for postings in lists), key=lambda postings: postings.doc_freq)
+        contains = SearchIndex._contains
+        for doc in driver.descending():
+            if all(contains(lists, doc) for lists in required) and not any(contains(lists, doc) for lists in excluded):
+                yield doc
+
+    def search(self, query: str, index: MailIndex = None) -> Iterator[int]:
+        '''
+            Record numbers of the matching messages, highest (most recently
+            indexed) first. Pass index to skip messages that have been removed
+            since they were indexed.
+        '''
+        parsed = Query(query)
+        for segment in sorted(self.segments, key=lambda segment: segment.last_doc, reverse=True):
+            streams = [SearchIndex._clause_docs(segment, clause) for clause in parsed.clauses]
+            previous = None
+            for doc in heapq.merge(*streams, reverse=True):
+                if doc == previous:
+                    continue
+                previous = doc
+                if index is None or index.is_live(doc):
+                    yield doc
+
+
+def search_benchmark(documents: int = 200_000, vocabulary: int = 50_000, words: int = 60) -> None:
+    '''
+        Indexes synthetic messages with a Zipf-like vocabulary and times the
+        first page (15 results) of a few query shapes.
+    '''
+    import random
+    import tempfile
+    import time
+
+    rng = random.Random(11)
+    cumulative, total = [], 0.0
+    for rank in range(vocabulary):
+        total += 1 / (rank + 1)
+        cumulative.append(total)
+    vocab = [f'w{rank}' for rank in range(vocabulary)]
+    directory = tempfile.mkdtemp()
+    search = SearchIndex(directory)
+
+    start = time.perf_counter()
+    builder = SegmentBuilder()
+    for doc in range(documents):
+        builder.add(doc, rng.choices(vocab, cum_weights=cumulative, k=words))
+        if builder.doc_count >= SearchIndex.SEGMENT_DOCS:
+            search._flush(builder)
+            builder = SegmentBuilder()
+    if builder.doc_count:
+        search._flush(builder)
+    search._save()
+    search._load()
+    print(f'index build : {time.perf_counter() - start:8.1f} s for {documents} messages '
+        f'in {len(search.segments)} segments')
+
+    for query in ('w0', 'w5 w40', '"w0 w1"', 'w300 OR w301', 'w2 -w3', 'w2000 w3000'):
+        start = time.perf_counter()
+        page = []
+        for doc in search.search(query):
+            page.append(doc)
+            if len(page) == 15:
+                break
+        print(f'{query!r:16}: first page {(time.perf_counter() - start) * 1e3:8.2f} ms ({len(page)} results)')
+    search.close()
+
+
+if __name__ == '__main__':
+    search_benchmark()
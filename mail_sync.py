@@ -0,0 +1,182 @@
+import asyncio
+import json
+import os
+import re
+from typing import Callable
+
+from imap_client import ImapError, ImapPool
+from mail_index import IndexFormat, MailIndex
+
+
+class SyncState:
+    def __init__(self, path: str) -> None:
+        '''
+            What the last sync of a folder saw on the server, kept next to the
+            folder's index. The highest UID isn't stored here, it is read from
+            the index itself so the two can't disagree after a crash.
+        '''
+        self.path: str = path
+        self.uidvalidity: int = 0
+        self.highest_modseq: int = 0
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as file:
+                saved = json.load(file)
+            self.uidvalidity = saved.get('uidvalidity', 0)
+            self.highest_modseq = saved.get('highest_modseq', 0)
+
+    def save(self) -> None:
+        temp = f'{self.path}.tmp'
+        with open(temp, 'w', encoding='utf-8') as file:
+            json.dump({'uidvalidity': self.uidvalidity, 'highest_modseq': self.highest_modseq}, file)
+        os.replace(temp, self.path)
+
+
+class FolderSync:
+    def __init__(self, pool: ImapPool, folder: str, index: MailIndex, batch: int = 256, window: int = 4) -> None:
+        '''
+            Keeps the local index of an IMAP folder in step with the server.
+
+            The first sync fetches every header. Later syncs only fetch:
+
+            o	headers of messages above the highest indexed UID
+
+            o	flags that changed since the stored HIGHESTMODSEQ, when the server
+                has CONDSTORE (every flag otherwise)
+
+            o	the UID list, only when the message count doesn't add up, to find
+                what was expunged
+
+            A changed UIDVALIDITY means the UIDs were reassigned and the folder is
+            fetched again from scratch. Changes are applied to index in place, so
+            IndexViews over it (and menus showing them) stay valid.
+        '''
+        self.pool: ImapPool = pool
+        self.folder: str = folder
+        self.index: MailIndex = index
+        self.batch: int = batch
+        self.window: int = window
+        self.state: SyncState = SyncState(f'{index.path}.sync')
+
+    @staticmethod
+    def default_index_path(host: str, user: str, folder: str) -> str:
+        name = re.sub(r'[^\w.-]', '_', folder)
+        return os.path.join(os.path.expanduser('~'), '.consoleoutlook', f'{user}@{host}', f'{name}.idx')
+
+    @staticmethod
+    def open(pool: ImapPool, folder: str, index_path: str = None, **options) -> 'FolderSync':
+        path = index_path or FolderSync.default_index_path(pool.host, pool.user, folder)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        return FolderSync(pool, folder, MailIndex(path), **options)
+
+    async def sync(self, progress: Callable[[int, int], None] = None) -> dict[str, int]:
+        '''
+            Fetches what changed since the last sync and applies it to the index.
+            Returns counts of the messages added, removed and flagged, and full
+            (1 when everything was fetched again). progress is called with
+            (headers fetched, headers to fetch) as batches arrive.
+        '''
+        index, state = self.index, self.state
+        async with self.pool.folder(self.folder) as connection:
+            # selected again every time for fresh counts, EXISTS and HIGHESTMODSEQ move on
+            status = await connection.select(self.folder)
+            full = index.kind != IndexFormat.IMAP or state.uidvalidity != status.uidvalidity
+            highest = 0 if full else index.highest_uid()
+
+            added = []
+            if full or not status.uidnext or status.uidnext > highest + 1:
+                # 'n:*' always matches the last message, even when it is below n
+                uids = [uid for uid in await connection.uid_search(f'UID {highest + 1}:*') if uid > highest]
+                async for records in connection.fetch_headers(uids, self.batch, self.window):
+                    added.extend(records)
+                    if progress is not None:
+                        progress(len(added), len(uids))
+
+            flags, removed = {}, set()
+            if highest:
+                if 'CONDSTORE' not in connection.capabilities or not status.highest_modseq:
+                    flags = await connection.fetch_flags(f'1:{highest}')
+                elif status.highest_modseq != state.highest_modseq:
+                    flags = await connection.fetch_flags(f'1:{highest}', state.highest_modseq)
+
+                if status.exists != len(index) + len(added):
+                    present = set(await connection.uid_search(f'UID 1:{highest}'))
+                    removed = {uid for uid in index.live_uids() if uid not in present}
+
+        stats = index.apply_remote(self.folder, added, flags, removed, reset=full)
+        stats['full'] = int(full)
+        state.uidvalidity, state.highest_modseq = status.uidvalidity, status.highest_modseq
+        state.save()
+        return stats
+
+    async def watch(self, interval: float, on_change: Callable[[dict[str, int]], None],
+        on_error: Callable[[ImapError], None] = None) -> None:
+        '''
+            Syncs every interval seconds until cancelled, calling on_change
+            with the counts whenever something changed. Failed syncs are passed to
+            on_error and retried on the next round.
+        '''
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                stats = await self.sync()
+            except (ImapError, OSError) as error:
+                if on_error is not None:
+                    on_error(error)
+                continue
+            if stats['added'] or stats['removed'] or stats['flagged']:
+                on_change(stats)
+
+    def close(self) -> None:
+        self.index.close()
+
+
+def sync_benchmark(messages: int = 50_000, latency: float = 0.02, changes: int = 10) -> None:
+    '''
+        Times syncing a folder of a local ImapStandin: the first full sync,
+        a resync with nothing changed and resyncs after a few new messages, a
+        few flag changes and a few expunges.
+    '''
+    import tempfile
+    import time
+    from imap_standin import ImapStandin
+
+    async def bench() -> None:
+        standin = ImapStandin(latency=latency)
+        folder = standin.add_folder('INBOX').populate(messages)
+        host, port = await standin.start()
+        directory = tempfile.mkdtemp()
+        pool = ImapPool(host, port, standin.user, standin.password)
+        sync = FolderSync.open(pool, 'INBOX', os.path.join(directory, 'INBOX.idx'))
+        view = sync.index.by_date()
+
+        async def timed(label: str) -> None:
+            commands = standin.commands
+            start = time.perf_counter()
+            stats = await sync.sync()
+            elapsed = time.perf_counter() - start
+            print(f'{label:22}: {elapsed * 1e3:9.1f} ms  {standin.commands - commands:3} commands  '
+                f'added {stats["added"]} removed {stats["removed"]} flagged {stats["flagged"]}  '
+                f'view {len(view)} rows')
+
+        try:
+            await timed('first sync')
+            await timed('no change')
+            for message in folder.messages[-changes:]:
+                folder.add(message.raw)
+            await timed(f'{changes} new')
+            for message in folder.messages[:changes]:
+                folder.set_flags(message.uid, message.flags ^ {'\\Flagged'})
+            await timed(f'{changes} flag changes')
+            folder.expunge({message.uid for message in folder.messages[1:changes + 1]})
+            await timed(f'{changes} expunged')
+            await timed('no change')
+        finally:
+            sync.close()
+            await pool.close()
+            await standin.stop()
+
+    asyncio.run(bench())
+
+
+if __name__ == '__main__':
+    sync_benchmark()
@@ -0,0 +1,704 @@
+import bisect
+import mmap
+import os
+import re
+from typing import Callable, Iterable, Iterator, NamedTuple
+
+from mail_index import HeaderParser, IndexFormat, MailIndex, MessageRecord
+
+
+class MessageIds:
+    # the threading headers with their folded continuation lines
+    HEADER = re.compile(rb'^(message-id|in-reply-to|references)[ \t]*:(.*(?:\r?\n[ \t].*)*)',
+        re.IGNORECASE | re.MULTILINE)
+    ID = re.compile(rb'<([^<>\s]+)>')
+
+    @staticmethod
+    def parse(head: bytes) -> tuple[str, list[str]]:
+        '''
+            (Message-ID, references oldest first) from a raw header block. The
+            references are the References ids, or the first In-Reply-To id when
+            there are none. A missing Message-ID is ''.
+        '''
+        found = {}
+        for match in MessageIds.HEADER.finditer(head):
+            found.setdefault(match.group(1).lower(), match.group(2))
+
+        ids = MessageIds.ID.findall(found.get(b'message-id', b''))
+        message_id = ids[0].decode('latin-1') if ids else ''
+        references = MessageIds.ID.findall(found.get(b'references', b'')) \
+            or MessageIds.ID.findall(found.get(b'in-reply-to', b''))[:1]
+
+        seen, unique = {message_id}, []
+        for reference in references:
+            reference = reference.decode('latin-1')
+            if reference not in seen:
+                seen.add(reference)
+                unique.append(reference)
+        return message_id, unique
+
+
+class ThreadNode:
+    __slots__ = ('message_id', 'number', 'date', 'parent', 'children', 'count', 'latest', 'earliest', 'thread')
+
+    def __init__(self, message_id: str) -> None:
+        '''
+            A container of the thread forest, one per Message-ID seen either on
+            a message or in a reference. Containers of messages that aren't in
+            the mailbox (number is None) keep their replies together and are
+            skipped when the thread is shown.
+        '''
+        self.message_id: str = message_id
+        self.number: int = None
+        self.date: int = 0
+        self.parent: ThreadNode = None
+        self.children: list[ThreadNode] = []
+        # messages in the subtree and their newest and oldest dates
+        self.count: int = 0
+        self.latest: int = 0
+        self.earliest: int = 0
+        # the Thread, on roots that hold messages
+        self.thread: Thread = None
+
+    def recount(self) -> None:
+        count, latest, earliest = (1, self.date, self.date) if self.number is not None else (0, 0, None)
+        for child in self.children:
+            if child.count:
+                count += child.count
+                latest = max(latest, child.latest)
+                earliest = child.earliest if earliest is None else min(earliest, child.earliest)
+        self.count, self.latest, self.earliest = count, latest, earliest or 0
+
+
+class Thread:
+    __slots__ = ('root', 'serial', 'expanded', 'key', 'rows', 'flat')
+
+    def __init__(self, root: ThreadNode, serial: int, expanded: bool) -> None:
+        self.root: ThreadNode = root
+        self.serial: int = serial
+        self.expanded: bool = expanded
+        # where the thread sits in the ThreadOrder and how many rows it had there
+        self.key: tuple[int, int] = None
+        self.rows: int = 0
+        # (node, depth) of the thread's messages, built when the thread is first shown
+        self.flat: list[tuple[ThreadNode, int]] = None
+
+    @property
+    def size(self) -> int:
+        return self.root.count
+
+    def sort_key(self) -> tuple[int, int]:
+        return -self.root.latest, self.serial
+
+    def visible_rows(self) -> int:
+        return self.root.count if self.expanded else 1
+
+
+class FenwickTree:
+    def __init__(self, values: list[int]) -> None:
+        '''
+            Running totals over a list of counts, with O(log n) updates and
+            lookups of which item holds a position in the total.
+        '''
+        self.size: int = len(values)
+        self._tree: list[int] = [0, *values]
+        for idx in range(1, self.size + 1):
+            parent = idx + (idx & -idx)
+            if parent <= self.size:
+                self._tree[parent] += self._tree[idx]
+
+    def add(self, idx: int, delta: int) -> None:
+        idx += 1
+        while idx <= self.size:
+            self._tree[idx] += delta
+            idx += idx & -idx
+
+    def prefix(self, idx: int) -> int:
+        '''
+            Sum of the first idx counts.
+        '''
+        total = 0
+        while idx:
+            total += self._tree[idx]
+            idx -= idx & -idx
+        return total
+
+    def find(self, rank: int) -> tuple[int, int]:
+        '''
+            (item, rank within the item) of the 0-based position rank in the total.
+        '''
+        position, step = 0, 1 << self.size.bit_length() >> 1
+        while step:
+            following = position + step
+            if following <= self.size and self._tree[following] <= rank:
+                position = following
+                rank -= self._tree[following]
+            step >>= 1
+        return position, rank
+
+
+class ThreadOrder:
+    # threads per block, blocks are split at twice this
+    BLOCK: int = 512
+
+    def __init__(self, threads: list[Thread] = ()) -> None:
+        '''
+            The threads in display order (newest message first), as sorted
+            blocks with a FenwickTree over the rows each block shows.
+
+            A row is found with a tree lookup and a walk through one block, and
+            a thread that grows, moves or is expanded only updates its block and
+            the tree, so nothing is flattened beyond the rows asked for.
+        '''
+        for thread in threads:
+            thread.key, thread.rows = thread.sort_key(), thread.visible_rows()
+        ordered = sorted(threads, key=lambda thread: thread.key)
+        self._blocks: list[list[Thread]] = [
+            ordered[start:start + ThreadOrder.BLOCK] for start in range(0, len(ordered), ThreadOrder.BLOCK)
+        ]
+        self.length: int = len(ordered)
+        self._build()
+
+    def _build(self) -> None:
+        self._maxes: list[tuple[int, int]] = [block[-1].key for block in self._blocks]
+        sums = [sum(thread.rows for thread in block) for block in self._blocks]
+        self._tree: FenwickTree = FenwickTree(sums)
+        self.rows: int = sum(sums)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def _find(self, thread: Thread) -> tuple[int, int]:
+        number = bisect.bisect_left(self._maxes, thread.key)
+        block = self._blocks[number]
+        return number, bisect.bisect_left(block, thread.key, key=lambda other: other.key)
+
+    def insert(self, thread: Thread) -> None:
+        thread.key, thread.rows = thread.sort_key(), thread.visible_rows()
+        self.length += 1
+        if not self._blocks:
+            self._blocks.append([thread])
+            self._build()
+            return
+
+        number = min(bisect.bisect_left(self._maxes, thread.key), len(self._blocks) - 1)
+        block = self._blocks[number]
+        block.insert(bisect.bisect_left(block, thread.key, key=lambda other: other.key), thread)
+        if len(block) > 2 * ThreadOrder.BLOCK:
+            self._blocks[number:number + 1] = [block[:ThreadOrder.BLOCK], block[ThreadOrder.BLOCK:]]
+            self._build()
+            return
+        self._maxes[number] = block[-1].key
+        self._tree.add(number, thread.rows)
+        self.rows += thread.rows
+
+    def remove(self, thread: Thread) -> None:
+        number, position = self._find(thread)
+        block = self._blocks[number]
+        del block[position]
+        self.length -= 1
+        if not block:
+            del self._blocks[number]
+            self._build()
+            return
+        self._maxes[number] = block[-1].key
+        self._tree.add(number, -thread.rows)
+        self.rows -= thread.rows
+
+    def resize(self, thread: Thread) -> None:
+        '''
+            Takes in a change of the thread's visible rows that doesn't move it.
+        '''
+        rows = thread.visible_rows()
+        number, _ = self._find(thread)
+        self._tree.add(number, rows - thread.rows)
+        self.rows += rows - thread.rows
+        thread.rows = rows
+
+    def first_row(self, thread: Thread) -> int:
+        number, position = self._find(thread)
+        return self._tree.prefix(number) + sum(other.rows for other in self._blocks[number][:position])
+
+    def slots(self, start: int, stop: int) -> Iterator[tuple[Thread, int]]:
+        '''
+            (thread, row within the thread) of the rows in [start, stop).
+        '''
+        stop = min(stop, self.rows)
+        if start >= stop:
+            return
+        number, offset = self._tree.find(start)
+        row = start
+        for block in self._blocks[number:]:
+            for thread in block:
+                if offset >= thread.rows:
+                    offset -= thread.rows
+                    continue
+                for within in range(offset, thread.rows):
+                    yield thread, within
+                    row += 1
+                    if row == stop:
+                        return
+                offset = 0
+
+
+class ThreadForest:
+    def __init__(self, expanded: bool = False) -> None:
+        '''
+            Messages threaded by Message-ID, References and In-Reply-To after
+            Jamie Zawinski's algorithm, without grouping by subject.
+
+            build() threads a whole mailbox in one pass, add() and remove()
+            change the forest in place, relinking only the containers the
+            message refers to. Threads are kept in a ThreadOrder, newest message
+            first, and rows() reads the flattened list a slice at a time:
+            collapsed threads show their first message, expanded ones every
+            message indented under the one it replies to.
+
+            o	expanded (bool, optional): whether new threads start expanded
+        '''
+        self.expanded: bool = expanded
+        self.order: ThreadOrder = ThreadOrder()
+        self._nodes: dict[str, ThreadNode] = {}
+        self._by_number: dict[int, ThreadNode] = {}
+        self._serial: int = 0
+
+    def __len__(self) -> int:
+        '''
+            Number of messages threaded.
+        '''
+        return len(self._by_number)
+
+    @property
+    def row_count(self) -> int:
+        return self.order.rows
+
+    def numbers(self) -> list[int]:
+        return list(self._by_number)
+
+    def _node(self, message_id: str) -> ThreadNode:
+        node = self._nodes.get(message_id)
+        if node is None:
+            node = self._nodes[message_id] = ThreadNode(message_id)
+        return node
+
+    @staticmethod
+    def _root(node: ThreadNode) -> ThreadNode:
+        while node.parent is not None:
+            node = node.parent
+        return node
+
+    @staticmethod
+    def _is_ancestor(node: ThreadNode, of: ThreadNode) -> bool:
+        '''
+            Whether node is of or one of its ancestors.
+        '''
+        while of is not None:
+            if of is node:
+                return True
+            of = of.parent
+        return False
+
+    @staticmethod
+    def _detach(node: ThreadNode) -> ThreadNode:
+        parent = node.parent
+        parent.children.remove(node)
+        node.parent = None
+        return parent
+
+    @staticmethod
+    def _attach(parent: ThreadNode, node: ThreadNode) -> None:
+        node.parent = parent
+        parent.children.append(node)
+
+    def _link(self, number: int, date: int, message_id: str, references: list[str]) \
+            -> tuple[ThreadNode, list[ThreadNode], bool]:
+        '''
+            Files the message under its Message-ID and links its references
+            into a chain ending at it. Returns the message's node, the references
+            that were linked under another one and whether the message itself was
+            moved (it already had replies, or a parent from another reference).
+        '''
+        node = self._nodes.get(message_id) if message_id else None
+        if node is None or node.number is not None:
+            # a missing or duplicated Message-ID gets one of its own
+            node = self._node(f'{message_id}\0{number}' if message_id in self._nodes or not message_id else message_id)
+        node.number, node.date = number, date
+        self._by_number[number] = node
+
+        linked, parent = [], None
+        for reference in references:
+            container = self._node(reference)
+            # links the references already made are kept, they may be better informed
+            if parent is not None and container.parent is None and not self._is_ancestor(container, parent):
+                self._attach(parent, container)
+                linked.append(container)
+            parent = container
+
+        if parent is not None and self._is_ancestor(node, parent):
+            parent = None
+        moved = bool(node.children)
+        if node.parent is not parent:
+            if node.parent is not None:
+                linked.append(self._detach(node))
+            if parent is not None:
+                self._attach(parent, node)
+            moved = True
+        return node, linked, moved
+
+    def build(self, messages: Iterable[tuple[int, int, str, list[str]]]) -> None:
+        '''
+            Threads (number, date, Message-ID, references) messages from
+            scratch, in time linear in the messages and their references.
+        '''
+        self.order = ThreadOrder()
+        self._nodes, self._by_number = {}, {}
+        for number, date, message_id, references in messages:
+            self._link(number, date, message_id, references)
+
+        threads = []
+        for root in [node for node in self._nodes.values() if node.parent is None]:
+            # counts bottom-up, children before their parents
+            stack, visited = [root], []
+            while stack:
+                node = stack.pop()
+                visited.append(node)
+                stack.extend(node.children)
+            for node in reversed(visited):
+                node.recount()
+            if root.count:
+                root.thread = self._new_thread(root)
+                threads.append(root.thread)
+        self.order = ThreadOrder(threads)
+
+    def _new_thread(self, root: ThreadNode) -> 'Thread':
+        self._serial += 1
+        return Thread(root, self._serial, self.expanded)
+
+    def add(self, number: int, date: int, message_id: str, references: list[str]) -> None:
+        '''
+            Threads one more message into the forest, only the threads it joins
+            are touched.
+        '''
+        before = [self._root(node) for node in
+            (self._nodes.get(message_id), *(self._nodes.get(reference) for reference in references)) if node is not None]
+        node, linked, moved = self._link(number, date, message_id, references)
+
+        if moved:
+            self._recount_up(node)
+        else:
+            ancestor = node
+            while ancestor is not None:
+                ancestor.count += 1
+                ancestor.earliest = date if ancestor.count == 1 else min(ancestor.earliest, date)
+                ancestor.latest = max(ancestor.latest, date)
+                ancestor = ancestor.parent
+        for container in linked:
+            self._recount_up(container)
+        # a reference seen for the first time can end up as the root above a thread
+        self._settle(before + [self._root(node)] + [self._root(container) for container in linked])
+
+    def remove(self, number: int) -> None:
+        '''
+            Takes a message out of its thread, its replies stay where they are.
+        '''
+        node = self._by_number.pop(number, None)
+        if node is None:
+            return
+        node.number, node.date = None, 0
+        self._recount_up(node)
+        self._settle([self._root(node)])
+
+    @staticmethod
+    def _recount_up(node: ThreadNode) -> None:
+        while node is not None:
+            node.recount()
+            node = node.parent
+
+    def _settle(self, roots: list[ThreadNode]) -> None:
+        '''
+            Brings the ThreadOrder in line with containers that were roots
+            before a change or are now.
+        '''
+        for root in {id(root): root for root in roots}.values():
+            thread = root.thread
+            if thread is not None:
+                self.order.remove(thread)
+            if root.parent is None and root.count:
+                if thread is None:
+                    thread = root.thread = self._new_thread(root)
+                thread.flat = None
+                self.order.insert(thread)
+            else:
+                root.thread = None
+
+    def thread_of(self, number: int) -> Thread:
+        node = self._by_number.get(number)
+        return None if node is None else self._root(node).thread
+
+    def set_expanded(self, thread: Thread, expanded: bool) -> None:
+        '''
+            Expands or collapses one thread, the rows of every other thread stay as they are.
+        '''
+        if thread.expanded != expanded:
+            thread.expanded = expanded
+            self.order.resize(thread)
+
+    def toggle(self, thread: Thread) -> None:
+        self.set_expanded(thread, not thread.expanded)
+
+    def first_row(self, thread: Thread) -> int:
+        return self.order.first_row(thread)
+
+    @staticmethod
+    def flatten(thread: Thread) -> list[tuple[ThreadNode, int]]:
+        '''
+            (node, depth) of the thread's messages in reading order, replies
+            under what they reply to, oldest first.
+        '''
+        if thread.flat is None:
+            flat, stack = [], [(thread.root, 0)]
+            while stack:
+                node, depth = stack.pop()
+                if node.number is not None:
+                    flat.append((node, depth))
+                    depth += 1
+                children = sorted((child for child in node.children if child.count),
+                    key=lambda child: (child.earliest, child.message_id), reverse=True)
+                stack.extend((child, depth) for child in children)
+            thread.flat = flat
+        return thread.flat
+
+    def rows(self, start: int, stop: int) -> list[tuple[int, int, Thread]]:
+        '''
+            (message number, depth, thread) of the rows in [start, stop).
+        '''
+        rows = []
+        for thread, within in self.order.slots(start, stop):
+            node, depth = self.flatten(thread)[within]
+            rows.append((node.number, depth, thread))
+        return rows
+
+
+class ThreadRow(NamedTuple):
+    record: MessageRecord
+    depth: int
+    thread: Thread
+
+
+class ThreadView:
+    def __init__(self, threads: 'MailThreads', index: MailIndex,
+        row_factory: Callable[[ThreadRow], object] = None) -> None:
+        '''
+            The threaded rows of a mailbox as a sequence, the same way IndexView
+            serves the flat lists, so it can be handed to ValuePagedMenu. Rows are
+            built with row_factory (ThreadRow by default) only for the slice asked
+            for. Expanding a thread changes the rows after it, refresh the menu
+            afterwards.
+        '''
+        self.threads: MailThreads = threads
+        self.index: MailIndex = index
+        self.row_factory = row_factory
+
+    def __len__(self) -> int:
+        return self.threads.forest.row_count
+
+    def _rows(self, start: int, stop: int) -> list:
+        rows = [ThreadRow(self.index.record(number), depth, thread)
+            for number, depth, thread in self.threads.forest.rows(start, stop)]
+        return rows if self.row_factory is None else [self.row_factory(row) for row in rows]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                return [self[idx] for idx in range(start, stop, step)]
+            return self._rows(start, stop)
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError(key)
+        return self._rows(key, key + 1)[0]
+
+    def __iter__(self):
+        for start in range(0, len(self), 256):
+            yield from self._rows(start, start + 256)
+
+    def toggle(self, row: ThreadRow) -> None:
+        self.threads.forest.toggle(row.thread)
+
+
+class MailThreads:
+    MAGIC: str = 'CO-THREADS 1'
+
+    def __init__(self, path: str, expanded: bool = False) -> None:
+        '''
+            The thread forest of a MailIndex, with the threading headers of its
+            messages kept in a file next to the index.
+
+            Opening reads the headers from that file instead of the messages, and
+            update() only parses messages added to the index since, adding them
+            to the forest one at a time. A renumbered index (a new generation) is
+            read again from scratch. Only local mailboxes can be threaded, IMAP
+            indexes don't keep the headers it needs.
+        '''
+        self.path: str = path
+        self.forest: ThreadForest = ThreadForest(expanded)
+        self.generation: int = None
+        self.next_number: int = 0
+        self._built: bool = False
+
+    @staticmethod
+    def for_index(index: MailIndex, mailbox: str, expanded: bool = False) -> 'MailThreads':
+        threads = MailThreads(f'{index.path}.threads', expanded)
+        threads.update(index, mailbox)
+        return threads
+
+    def view(self, index: MailIndex, row_factory: Callable[[ThreadRow], object] = None) -> ThreadView:
+        return ThreadView(self, index, row_factory)
+
+    def _load(self, generation: int) -> list[tuple[int, str, list[str]]]:
+        '''
+            The saved (number, Message-ID, references), when they were saved for
+            generation. A line cut short by a crash is dropped.
+        '''
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, 'rb') as file:
+            data = file.read()
+        complete = data.rfind(b'\n') + 1
+        lines = data[:complete].decode('utf-8').split('\n')[:-1]
+        if not lines or lines[0] != f'{MailThreads.MAGIC} {generation}':
+            return []
+        if complete < len(data):
+            os.truncate(self.path, complete)
+
+        entries = []
+        for line in lines[1:]:
+            number, message_id, references = line.split('\t')
+            entries.append((int(number), message_id, references.split()))
+        return entries
+
+    def _save(self, entries: list[tuple[int, str, list[str]]], rewrite: bool) -> None:
+        with open(self.path, 'w' if rewrite else 'a', encoding='utf-8') as file:
+            if rewrite:
+                file.write(f'{MailThreads.MAGIC} {self.generation}\n')
+            file.writelines(f'{number}\t{message_id}\t{" ".join(references)}\n'
+                for number, message_id, references in entries)
+
+    def update(self, index: MailIndex, mailbox: str) -> int:
+        '''
+            Threads the messages added to index since the last update and drops
+            the removed ones, returns how many messages were added.
+        '''
+        if index.kind == IndexFormat.IMAP:
+            raise ValueError('Only local mailboxes can be threaded')
+
+        rewrite = not self._built or self.generation != index.generation
+        saved = []
+        if rewrite:
+            self.generation = index.generation
+            saved = self._load(index.generation)
+            self.next_number = saved[-1][0] + 1 if saved else 0
+
+        added = list(self._headers(index, mailbox, self.next_number))
+        fresh = rewrite and not saved
+        if added or fresh:
+            self._save(added, fresh)
+        self.next_number = max(self.next_number, index.count)
+
+        dates = lambda number: index.raw_record(number)[0]
+        if rewrite:
+            self.forest.build((number, dates(number), message_id, references)
+                for number, message_id, references in saved + added if number < index.count and index.is_live(number))
+            self._built = True
+            return len(added)
+
+        for number, message_id, references in added:
+            self.forest.add(number, dates(number), message_id, references)
+        if len(self.forest) != len(index):
+            for number in self.forest.numbers():
+                if number >= index.count or not index.is_live(number):
+                    self.forest.remove(number)
+        return len(added)
+
+    @staticmethod
+    def _headers(index: MailIndex, mailbox: str, start: int) -> Iterator[tuple[int, str, list[str]]]:
+        '''
+            (number, Message-ID, references) of the live records from start on,
+            read from the header block of each message.
+        '''
+        if index.kind == IndexFormat.MBOX and index.count > start:
+            with open(mailbox, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                for number in range(start, index.count):
+                    if index.is_live(number):
+                        _, offset, length = index.raw_record(number)[:3]
+                        end = HeaderParser.header_end(buffer, offset, offset + min(length, MailIndex.HEADER_READ))
+                        yield number, *MessageIds.parse(buffer[offset:end])
+            return
+
+        for number in range(start, index.count):
+            if index.is_live(number):
+                with open(os.path.join(mailbox, index.record(number).path), 'rb') as file:
+                    head = file.read(MailIndex.HEADER_READ)
+                yield number, *MessageIds.parse(head[:HeaderParser.header_end(head, 0, len(head))])
+
+    def close(self) -> None:
+        self.forest = ThreadForest(self.forest.expanded)
+        self._built = False
+
+
+def threads_benchmark(messages: int = 200_000, changes: int = 1000, page_size: int = 15) -> None:
+    '''
+        Threads a synthetic mailbox of conversations, then times adding
+        messages one at a time against rebuilding, expanding and collapsing
+        threads and reading pages of rows.
+    '''
+    import random
+    import time
+
+    rng = random.Random(25)
+    conversations: list[list[tuple[str, list[str]]]] = []
+    mail = []
+    for number in range(messages + changes):
+        message_id = f'{number}@example.com'
+        if not conversations or rng.random() < 0.3:
+            conversations.append([])
+            conversation, references = conversations[-1], []
+        else:
+            # a reply to any message of a recent conversation
+            conversation = conversations[-rng.randint(1, min(len(conversations), 500))]
+            parent_id, parent_references = rng.choice(conversation)
+            references = [*parent_references, parent_id]
+        conversation.append((message_id, references))
+        mail.append((number, 1_700_000_000 + number * 60, message_id, references))
+
+    forest = ThreadForest()
+    start = time.perf_counter()
+    forest.build(mail[:messages])
+    build = time.perf_counter() - start
+    print(f'{messages} messages in {len(forest.order)} threads')
+    print(f'build             : {build * 1e3:9.1f} ms  {messages / build:10.0f} msg/s')
+
+    start = time.perf_counter()
+    for message in mail[messages:]:
+        forest.add(*message)
+    elapsed = time.perf_counter() - start
+    print(f'add one message   : {elapsed / changes * 1e6:9.1f} us  (rebuild {build * 1e3:.0f} ms)')
+
+    threads = [forest.thread_of(number) for number in rng.sample(range(messages), changes)]
+    start = time.perf_counter()
+    for thread in threads:
+        forest.toggle(thread)
+    elapsed = time.perf_counter() - start
+    print(f'expand / collapse : {elapsed / changes * 1e6:9.1f} us  {forest.row_count} rows')
+
+    start = time.perf_counter()
+    for _ in range(changes):
+        row = rng.randrange(max(1, forest.row_count - page_size))
+        forest.rows(row, row + page_size)
+    elapsed = time.perf_counter() - start
+    print(f'page of {page_size} rows   : {elapsed / changes * 1e6:9.1f} us')
+
+
+if __name__ == '__main__':
+    threads_benchmark()
@@ -1,10 +1,4 @@
-
-
-
-
-
-def main() -> None:
-    pass
+from app import main
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
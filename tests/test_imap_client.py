@@ -0,0 +1,55 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from imap_client import ImapConnection, ImapError
+from imap_standin import ImapStandin
+
+
+async def _session(standin: ImapStandin, body) -> None:
+    host, port = await standin.start()
+    try:
+        connection = await ImapConnection.open(host, port)
+        try:
+            await connection.login(standin.user, standin.password)
+            await connection.select('INBOX')
+            await asyncio.wait_for(body(connection), 5)
+        finally:
+            await connection.close()
+    finally:
+        await standin.stop()
+
+
+def _standin(count: int) -> ImapStandin:
+    standin = ImapStandin()
+    folder = standin.add_folder('INBOX')
+    for number in range(count):
+        folder.add(f'Subject: message {number}\r\n\r\nbody\r\n'.encode())
+    return standin
+
+
+def test_lines_past_the_limit_are_read_whole(monkeypatch):
+    monkeypatch.setattr(ImapConnection, 'LINE_LIMIT', 64)
+
+    async def body(connection: ImapConnection) -> None:
+        assert await connection.uid_search() == list(range(1, 501))
+        # the session is still in step after the long line
+        assert await connection.uid_search('UID 1:3') == [1, 2, 3]
+
+    asyncio.run(_session(_standin(500), body))
+
+
+def test_failing_untagged_callback_fails_the_command():
+    def broken(text: bytes, literals: list[bytes]) -> None:
+        int(b'not a uid')
+
+    async def body(connection: ImapConnection) -> None:
+        with pytest.raises(ImapError):
+            await connection.command('UID SEARCH ALL', broken)
+        assert connection.closed
+
+    asyncio.run(_session(_standin(5), body))
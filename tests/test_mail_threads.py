@@ -0,0 +1,53 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mail_threads import ThreadForest
+
+
+def _threads(forest: ThreadForest) -> list[tuple[int, tuple[tuple[int, int], ...]]]:
+    '''
+        (newest date, (number, depth) rows) of every thread, sorted, which
+        leaves out the order of threads whose newest messages tie.
+    '''
+    threads = []
+    for _, _, thread in forest.rows(0, forest.row_count):
+        if not threads or threads[-1] is not thread:
+            threads.append(thread)
+    return sorted((thread.root.latest, tuple((node.number, depth) for node, depth in ThreadForest.flatten(thread)))
+        for thread in threads)
+
+
+def _mailbox(rng: random.Random, messages: int) -> list[tuple[int, int, str, list[str]]]:
+    ids = [f'm{number}' for number in range(messages * 2)]
+    mail = []
+    for number in range(messages):
+        references = rng.sample(ids, rng.randint(0, 3))
+        mail.append((number, rng.randint(0, 1000), rng.choice(ids), references))
+    return mail
+
+
+def test_add_matches_build():
+    rng = random.Random(25)
+    for _ in range(300):
+        mail = _mailbox(rng, rng.randint(1, 60))
+        built = ThreadForest(expanded=True)
+        built.build(mail)
+        added = ThreadForest(expanded=True)
+        for message in mail:
+            added.add(*message)
+
+        assert added.row_count == built.row_count == len(mail)
+        assert _threads(added) == _threads(built)
+        assert all(added.thread_of(number) is not None for number, *_ in mail)
+
+
+def test_new_reference_above_an_existing_thread():
+    forest = ThreadForest(expanded=True)
+    forest.add(15, 188, 'm40', ['m37'])
+    forest.add(36, 697, 'm76', ['m22', 'm1', 'm60'])
+    forest.add(59, 141, 'm26', ['m75', 'm37', 'm1'])
+    assert forest.row_count == 3
+    assert forest.thread_of(15) is not None
@@ -0,0 +1,81 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+
+HERE: str = os.path.dirname(os.path.abspath(__file__))
+
+# The modules a script imports to print styled output or open a menu
+MODULES: tuple[str] = ('colorify', 'prompts', 'screen', 'menus', 'text_editor')
+
+# Imports that must stay deferred until a UI loop actually runs
+DEFERRED: tuple[str] = ('colorama', 'keyboard', 'asyncio')
+
+
+def import_time(module: str) -> tuple[float, list[str]]:
+    '''
+        Imports module in a fresh interpreter with -X importtime and returns its
+        cumulative import time in milliseconds, along with any DEFERRED modules
+        that were imported by it.
+    '''
+    code = f'import sys, {module}; print(",".join(m for m in {DEFERRED!r} if m in sys.modules))'
+    env = {key: value for key, value in os.environ.items() if key != 'PYTHONDONTWRITEBYTECODE'}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=HERE, env=env, capture_output=True, text=True, check=True
+    )
+
+    cumulative = None
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, total, name = line.split('|')
+        if name.strip() == module:
+            cumulative = int(total) / 1000
+    loaded = [name for name in result.stdout.strip().split(',') if name]
+    return cumulative, loaded
+
+
+def run(budget_ms: float, runs: int) -> dict:
+    '''
+        Takes the best of runs for every module, the first import of each is a
+        warm-up that writes the bytecode cache.
+    '''
+    report = {'budget_ms': budget_ms, 'modules': {}, 'passed': True}
+    for module in MODULES:
+        import_time(module)
+        times, loaded = [], []
+        for _ in range(runs):
+            elapsed, loaded = import_time(module)
+            times.append(elapsed)
+
+        best = min(times)
+        passed = best <= budget_ms and not loaded
+        report['modules'][module] = {'ms': round(best, 2), 'deferred_imported': loaded, 'passed': passed}
+        report['passed'] = report['passed'] and passed
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Import-time budget check for ui_comps.')
+    parser.add_argument('--budget-ms', type=float, default=30.0,
+        help='maximum cumulative import time per module (default 30)')
+    parser.add_argument('--runs', type=int, default=5, help='imports per module, the best is kept (default 5)')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    report = run(args.budget_ms, args.runs)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for module, result in report['modules'].items():
+            note = f'  imported {", ".join(result["deferred_imported"])}' if result['deferred_imported'] else ''
+            print(f'{module:12} {result["ms"]:8.2f} ms  {"ok" if result["passed"] else "OVER"}{note}')
+        print(f'budget       {args.budget_ms:8.2f} ms per module')
+    return 0 if report['passed'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,277 @@
+import argparse
+import io
+import json
+import os
+import platform
+import re
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Callable
+
+from colorify import ConsoleStencil, TextStyle
+from menus import Option, SimpleMenu, ValuePagedMenu
+from prompts import Prompt
+from screen import ScreenBuffer
+from terminal import HeadlessMode, TerminalGeometry
+from text_editor import TextViewer
+
+
+class FakeTerminal:
+    '''
+        A fixed-size terminal that writes into memory, so frames are built and
+        diffed exactly as they would be without touching the real tty. The size
+        is pinned for the whole run, the polls UI loops make between keys get it
+        back instead of the size of the terminal the suite was started from.
+    '''
+    def __init__(self, columns: int = 120, lines: int = 40) -> None:
+        self.size: os.terminal_size = os.terminal_size((columns, lines))
+        self.sink: io.StringIO = io.StringIO()
+
+    def __enter__(self) -> 'FakeTerminal':
+        self._saved = TerminalGeometry._size, TerminalGeometry.__dict__['query']
+        TerminalGeometry._size = self.size
+        TerminalGeometry.query = staticmethod(lambda: self.size)
+        HeadlessMode.force(False)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        TerminalGeometry._size, TerminalGeometry.query = self._saved
+        HeadlessMode.force(None)
+
+    def screen(self) -> ScreenBuffer:
+        return ScreenBuffer(stream=self.sink)
+
+    def drain(self) -> int:
+        '''
+            Empties the sink, returns how many characters were written to it.
+        '''
+        written = self.sink.tell()
+        self.sink.seek(0)
+        self.sink.truncate()
+        return written
+
+
+class ScriptedKeys:
+    '''
+        Plays a fixed sequence of key names into a component the way the UI loop
+        does: apply the key, then draw a frame.
+    '''
+    def __init__(self, names: list[str]) -> None:
+        self.events: list[SimpleNamespace] = [SimpleNamespace(name=name, event_type='down') for name in names]
+
+    def play(self, handle_key: Callable, render: Callable[[], None]) -> int:
+        for event in self.events:
+            handle_key(event)
+            render()
+        return len(self.events)
+
+
+class BenchmarkSuite:
+    def __init__(self, repeat: int = 5, scale: float = 1.0) -> None:
+        '''
+            Runs every case repeat times and keeps the fastest run, which is the
+            least disturbed by whatever else the machine is doing.
+
+            o	scale (float, optional): multiplies iteration counts, lower it
+                for a quick run
+        '''
+        self.repeat: int = repeat
+        self.scale: float = scale
+        self.results: dict[str, dict] = {}
+
+    def iterations(self, count: int) -> int:
+        return max(1, int(count * self.scale))
+
+    def measure(self, name: str, case: Callable[[], int], setup: Callable[[], None] = None) -> None:
+        '''
+            case runs the workload once and returns how many operations it did.
+        '''
+        best, ops = None, 0
+        for _ in range(self.repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            ops = case()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        self.results[name] = {'ops': ops, 'seconds': round(best, 6), 'us_per_op': round(best / ops * 1e6, 3)}
+
+    def styling(self) -> None:
+        count = self.iterations(20_000)
+        text = '   [ Inbox (1,204) ]'
+        settings = {'fg_color': 'white', 'bg_color': 'black', 'ansi': 'italic', 'style': 'bright'}
+        style = TextStyle(**settings)
+
+        def multi_style() -> int:
+            for _ in range(count):
+                ConsoleStencil.multi_style(text, **settings)
+            return count
+
+        def text_style_apply() -> int:
+            for _ in range(count):
+                style.apply(text)
+            return count
+
+        long_text = 'The quick brown fox jumps over the lazy dog. ' * 20
+        rainbow_count = self.iterations(500)
+
+        def rainbow() -> int:
+            for _ in range(rainbow_count):
+                ConsoleStencil.rainbow(long_text)
+            return rainbow_count * len(long_text)
+
+        pattern = re.compile(r'\b(?:fox|dog)\b')
+
+        def color_regex_matches() -> int:
+            for _ in range(rainbow_count):
+                ConsoleStencil.color_regex_matches(long_text, pattern, 'green')
+            return rainbow_count
+
+        self.measure('style.multi_style', multi_style)
+        self.measure('style.text_style_apply', text_style_apply)
+        self.measure('style.rainbow_per_char', rainbow)
+        self.measure('style.color_regex_matches', color_regex_matches)
+
+    def menus(self, terminal: FakeTerminal) -> None:
+        keys = ScriptedKeys(['down'] * self.iterations(200) + ['up'] * self.iterations(50))
+
+        for size in (10, 1_000, 100_000):
+            menu = SimpleMenu([f'Message {idx:06}' for idx in range(size)], 'Inbox', virtualize=True)
+            menu.screen = terminal.screen()
+            menu.render()
+
+            self.measure(f'menu.navigate[{size}]', lambda: keys.play(menu.handle_keys, menu.render),
+                setup=terminal.drain)
+
+        typing = ScriptedKeys(['/'] + list('message 0421'))
+
+        def reset_filter() -> None:
+            menu.clear_filter()
+            terminal.drain()
+
+        self.measure('menu.filter_typing[100000]', lambda: typing.play(menu.handle_keys, menu.render),
+            setup=reset_filter)
+
+        paged = ValuePagedMenu([Option(f'Message {idx:06}', idx) for idx in range(100_000)], 'Inbox', page_size=20)
+        paged.screen = terminal.screen()
+        paged.render()
+        flips = ScriptedKeys(['right'] * self.iterations(200) + ['left'] * self.iterations(50))
+        self.measure('paged.page_flip[100000]', lambda: flips.play(paged.handle_keys, paged.render),
+            setup=terminal.drain)
+
+    def prompts(self, terminal: FakeTerminal) -> None:
+        count = self.iterations(2_000)
+
+        def info() -> int:
+            stdout, sys.stdout = sys.stdout, terminal.sink
+            try:
+                for _ in range(count):
+                    Prompt.info('Synced 1,204 messages')
+            finally:
+                sys.stdout = stdout
+            return count
+
+        self.measure('prompt.info', info, setup=terminal.drain)
+
+    def viewer(self, terminal: FakeTerminal) -> None:
+        line = 'Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt ut labore. '
+        body = '\n'.join(f'{idx:07} {line * (1 + idx % 3)}' for idx in range(200_000))
+        keys = ScriptedKeys(['down'] * self.iterations(500) + ['up'] * self.iterations(100))
+
+        def scroll(viewer: TextViewer) -> Callable[[], int]:
+            return lambda: keys.play(lambda event: viewer.handle_key(event.name), viewer.display)
+
+        viewer = TextViewer(body, header='From: bench\nSubject: scrolling')
+        viewer.screen = terminal.screen()
+        viewer.display()
+        self.measure('viewer.scroll[string]', scroll(viewer), setup=terminal.drain)
+
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False, encoding='utf-8') as file:
+            file.write(body)
+        try:
+            viewer = TextViewer(path=file.name, header='From: bench\nSubject: scrolling')
+            # finish the line scan up front, the background thread would otherwise share the timed runs
+            viewer.source.line_at_offset(viewer.source.size)
+            viewer.screen = terminal.screen()
+            viewer.display()
+            self.measure('viewer.scroll[mapped]', scroll(viewer), setup=terminal.drain)
+            viewer.close()
+        finally:
+            os.unlink(file.name)
+
+    def run(self, only: str = None) -> dict:
+        groups = {'style': self.styling, 'menu': self.menus, 'prompt': self.prompts, 'viewer': self.viewer}
+        with FakeTerminal() as terminal:
+            for name, group in groups.items():
+                if only and only not in name:
+                    continue
+                if group == self.styling:
+                    group()
+                else:
+                    group(terminal)
+
+        return {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': self.repeat,
+            'scale': self.scale,
+            'results': self.results,
+        }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    '''
+        Names of the cases that got slower than the baseline by more than tolerance
+        (1.25 = 25% slower per operation). Cases missing from either side are skipped.
+    '''
+    regressions = []
+    for name, result in report['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if before is None:
+            continue
+        ratio = result['us_per_op'] / before['us_per_op'] if before['us_per_op'] else 1.0
+        result['vs_baseline'] = round(ratio, 3)
+        if ratio > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Rendering benchmarks for ui_comps.')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per case, the fastest is kept (default 5)')
+    parser.add_argument('--scale', type=float, default=1.0, help='iteration multiplier, e.g. 0.1 for a quick run')
+    parser.add_argument('--only', help="run one group: 'style', 'menu', 'prompt' or 'viewer'")
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    parser.add_argument('--save', help='write the report to this path, to use as a baseline later')
+    parser.add_argument('--baseline', help='compare against a report saved with --save, such as bench_baseline.json')
+    parser.add_argument('--tolerance', type=float, default=1.25,
+        help='slowdown per operation that counts as a regression (default 1.25)')
+    args = parser.parse_args()
+
+    report = BenchmarkSuite(args.repeat, args.scale).run(args.only)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            regressions = compare(report, json.load(file), args.tolerance)
+        report['regressions'] = regressions
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for name, result in report['results'].items():
+            ratio = f'  {result["vs_baseline"]:.2f}x baseline' if 'vs_baseline' in result else ''
+            flag = '  REGRESSION' if name in regressions else ''
+            print(f'{name:30} {result["us_per_op"]:12.3f} us/op  ({result["ops"]} ops){ratio}{flag}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,8 +1,10 @@
-from colorama import Fore, Back, Style, init
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import chain, cycle, repeat
+from typing import NamedTuple
+import os
 import re
 
-init(autoreset=True)
-
 
 class StencilData:
     """
@@ -14,11 +16,21 @@ class StencilData:
 
     VALID_ANSI_STYLES: set[str] = {'bold', 'underline', 'italic', 'normal'}
 
-    COLOR_MAP: dict[str] = {color: getattr(Fore, color.upper()) for color in VALID_COLORS}
-    
-    BACKGROUND_MAP: dict[str] = {color: getattr(Back, color.upper()) for color in VALID_COLORS}
-    
-    STYLE_MAP: dict[str] = {style: getattr(Style, style.upper()) for style in VALID_STYLES}
+    # The same escapes colorama's Fore / Back / Style hold, written out so importing
+    # this module doesn't import colorama
+    COLOR_MAP: dict[str] = {
+        'black': '\033[30m', 'red': '\033[31m', 'green': '\033[32m', 'yellow': '\033[33m',
+        'blue': '\033[34m', 'magenta': '\033[35m', 'cyan': '\033[36m', 'white': '\033[37m'
+    }
+
+    BACKGROUND_MAP: dict[str] = {
+        'black': '\033[40m', 'red': '\033[41m', 'green': '\033[42m', 'yellow': '\033[43m',
+        'blue': '\033[44m', 'magenta': '\033[45m', 'cyan': '\033[46m', 'white': '\033[47m'
+    }
+
+    STYLE_MAP: dict[str] = {'bright': '\033[1m', 'dim': '\033[2m', 'normal': '\033[22m', 'reset_all': '\033[0m'}
+
+    RESET: str = '\033[0m'
     
     ANSI_STYLE_MAP = {
         'bold': '\033[1m',
@@ -27,6 +39,9 @@ class StencilData:
         'normal': '\033[0m'
     }
     
+    # A fixed order for anything that cycles through colors, VALID_COLORS is a set
+    RAINBOW_ORDER: tuple[str] = ('red', 'yellow', 'green', 'cyan', 'blue', 'magenta')
+
     SETTINGS = {
         'VALID_COLORS': VALID_COLORS,
         'VALID_STYLES': VALID_STYLES,
@@ -37,7 +52,201 @@ class StencilData:
         'ANSI_STYLE_MAP': ANSI_STYLE_MAP
     }
 
+    @staticmethod
+    def is_color(color: str) -> bool:
+        """
+            True for one of the named colors or a hex color ('#rrggbb' / '#rgb').
+        """
+        return color.lower() in StencilData.VALID_COLORS or ColorSupport.parse_hex(color) is not None
+
+    @staticmethod
+    def fg_code(color: str) -> str:
+        named = StencilData.COLOR_MAP.get(color.lower())
+        return named if named is not None else ColorSupport.escape(ColorSupport.parse_hex(color))
+
+    @staticmethod
+    def bg_code(color: str) -> str:
+        named = StencilData.BACKGROUND_MAP.get(color.lower())
+        return named if named is not None else ColorSupport.escape(ColorSupport.parse_hex(color), background=True)
+
+
+class ColorSupport:
+    """
+        Hex colors and the terminal's color depth.
+
+        The depth is detected once from the environment (COLORTERM / TERM) and hex
+        colors are sent as 24-bit escapes, or quantized to the nearest entry of the
+        256 or 16 color palette. Quantizing goes through a bounded LRU so each
+        distinct color is only matched once, and compiled TextStyles cache the
+        resulting escapes on top of that.
+    """
+    TRUECOLOR: str = 'truecolor'
+    EXTENDED: str = '256'
+    BASIC: str = '16'
+
+    # xterm's default RGB values for the 16 basic colors, indexes follow SGR 30-37 / 90-97
+    BASIC_PALETTE: tuple[tuple[int, int, int]] = (
+        (0, 0, 0), (205, 0, 0), (0, 205, 0), (205, 205, 0), (0, 0, 238), (205, 0, 205), (0, 205, 205), (229, 229, 229),
+        (127, 127, 127), (255, 0, 0), (0, 255, 0), (255, 255, 0), (92, 92, 255), (255, 0, 255), (0, 255, 255), (255, 255, 255),
+    )
+    CUBE_STEPS: tuple[int] = (0, 95, 135, 175, 215, 255)
+
+    _level: str = None
+
+    @staticmethod
+    def detect() -> str:
+        colorterm = os.environ.get('COLORTERM', '').lower()
+        term = os.environ.get('TERM', '').lower()
+        if colorterm in ('truecolor', '24bit') or 'WT_SESSION' in os.environ:
+            return ColorSupport.TRUECOLOR
+        if '256' in term:
+            return ColorSupport.EXTENDED
+        return ColorSupport.BASIC
+
+    @staticmethod
+    def level() -> str:
+        if ColorSupport._level is None:
+            ColorSupport._level = ColorSupport.detect()
+        return ColorSupport._level
+
+    @staticmethod
+    def set_level(level: str) -> None:
+        """
+            Overrides the detected color depth ('truecolor', '256' or '16').
+        """
+        ColorSupport._level = level
+        StyleCache.clear()
+
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def parse_hex(color: str) -> tuple[int, int, int]:
+        """
+            Returns the (r, g, b) of a '#rrggbb' or '#rgb' color, None for anything else.
+        """
+        if not color.startswith('#') or len(color) not in (4, 7):
+            return None
+        digits = color[1:] if len(color) == 7 else ''.join(char * 2 for char in color[1:])
+        try:
+            value = int(digits, 16)
+        except ValueError:
+            return None
+        return (value >> 16) & 0xFF, (value >> 8) & 0xFF, value & 0xFF
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def quantize_256(rgb: tuple[int, int, int]) -> int:
+        """
+            The nearest xterm-256 color index, either from the 6x6x6 cube or the gray ramp.
+        """
+        steps = ColorSupport.CUBE_STEPS
+        cube = [min(range(6), key=lambda idx: abs(steps[idx] - channel)) for channel in rgb]
+        cube_rgb = tuple(steps[idx] for idx in cube)
+
+        gray_level = max(0, min(23, round((sum(rgb) / 3 - 8) / 10)))
+        gray = 8 + gray_level * 10
+
+        def distance(other: tuple[int, int, int]) -> int:
+            return sum((a - b) ** 2 for a, b in zip(rgb, other))
+
+        if distance((gray, gray, gray)) < distance(cube_rgb):
+            return 232 + gray_level
+        return 16 + 36 * cube[0] + 6 * cube[1] + cube[2]
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def quantize_16(rgb: tuple[int, int, int]) -> int:
+        """
+            The index (0-15) of the nearest basic color.
+        """
+        return min(range(16), key=lambda idx: sum((a - b) ** 2 for a, b in zip(rgb, ColorSupport.BASIC_PALETTE[idx])))
+
+    @staticmethod
+    def escape(rgb: tuple[int, int, int], background: bool = False) -> str:
+        level = ColorSupport.level()
+        if level == ColorSupport.TRUECOLOR:
+            return f'\033[{48 if background else 38};2;{rgb[0]};{rgb[1]};{rgb[2]}m'
+        if level == ColorSupport.EXTENDED:
+            return f'\033[{48 if background else 38};5;{ColorSupport.quantize_256(rgb)}m'
+
+        idx = ColorSupport.quantize_16(rgb)
+        base = (40 if background else 30) if idx < 8 else (100 if background else 90)
+        return f'\033[{base + idx % 8}m'
+
+
+class CompiledStyle(NamedTuple):
+    """
+        An immutable, pre-rendered escape sequence pair for a TextStyle.
+
+        Applying a compiled style is a single concatenation of prefix + text + suffix,
+        the output is identical to ConsoleStencil.multi_style for the same settings.
+    """
+    prefix: str
+    suffix: str
+
+    def apply(self, text: str) -> str:
+        return self.prefix + text + self.suffix
+
+
+class StyleCache:
+    """
+        Interns CompiledStyle objects keyed by (fg_color, bg_color, ansi, style) so
+        equivalent TextStyle objects share a single compiled escape pair.
+    """
+    _compiled: dict[tuple, CompiledStyle] = {}
+    # bumped by clear(), styles compiled under an older generation are stale
+    generation: int = 0
+
+    # An invalid style leaves the text untouched, same as TextStyle.apply always did
+    PASSTHROUGH = CompiledStyle('', '')
+
+    @staticmethod
+    def get(fg_color: str = None, bg_color: str = None, ansi: str = None, style: str = None,
+    padded: bool = True) -> CompiledStyle:
+        key = (fg_color, bg_color, ansi, style, padded)
+        compiled = StyleCache._compiled.get(key)
+        if compiled is None:
+            compiled = StyleCache._compiled[key] = StyleCache.compile(*key)
+        return compiled
+
+    @staticmethod
+    def compile(fg_color: str = None, bg_color: str = None, ansi: str = None, style: str = None,
+    padded: bool = True) -> CompiledStyle:
+        """
+            Builds the prefix/suffix pair multi_style would wrap the text with,
+            applying the settings in the same order (fg, bg, ansi, style).
+
+            padded=False leaves out the spaces multi_style puts around the text,
+            for styling part of a line in place.
+        """
+        if not TextStyle.is_valid(fg_color, bg_color, ansi, style):
+            return StyleCache.PASSTHROUGH
+
+        gap = ' ' if padded else ''
+        prefix, suffix = '', ''
+        if fg_color is not None:
+            prefix = f"{StencilData.fg_code(fg_color)}{gap}{prefix}"
+
+        if bg_color is not None:
+            prefix = f"{StencilData.bg_code(bg_color)}{gap}{prefix}"
+
+        if ansi is not None:
+            prefix = f"{StencilData.ANSI_STYLE_MAP[ansi.lower()]}{gap}{prefix}"
+            suffix = f"{suffix}{gap}{StencilData.ANSI_STYLE_MAP['normal']}"
+
+        if style is not None:
+            prefix = f"{StencilData.STYLE_MAP[style.lower()]}{gap}{prefix}"
+
+        return CompiledStyle(prefix, f'{suffix}{gap}{StencilData.RESET}')
+
+    @staticmethod
+    def clear() -> None:
+        StyleCache._compiled.clear()
+        StyleCache.generation += 1
+
+
 class TextStyle:
+    FIELDS: tuple[str] = ('fg_color', 'bg_color', 'ansi', 'style')
+
     def __init__(self, fg_color: str = None, bg_color: str = None, ansi: str = None, style: str = None) -> None:
         '''
             A class to store the settings for a multi text style if you prefer to use an object.
@@ -45,14 +254,18 @@ class TextStyle:
             All values supplied must be valid or the object will not be valid and won't work 
             with the multi_style method.
             
+            The style is compiled to a CompiledStyle on first use and reused by every 
+            apply() call after that, changing any of the settings (or the color depth
+            through ColorSupport.set_level) recompiles it.
+            
             o	ansi (str, optional): The text style such as 'bold', 'underline', etc. 
                 [Accepts 'bold', 'underline', 'italic', 'normal']
                 
             o	fg_color (str, optional): The foreground color. 
-                [Accepts 'red', 'green', 'blue', 'yellow', 'magenta', 'cyan',  'white', 'black' as valid colors]
+                [Accepts 'red', 'green', 'blue', 'yellow', 'magenta', 'cyan',  'white', 'black' or a hex color like '#ff8800']
 
             o	bg_color (str, optional): The background color 
-                [Accepts 'red', 'green', 'blue', 'yellow', 'magenta', 'cyan',  'white', 'black' as valid colors]
+                [Accepts 'red', 'green', 'blue', 'yellow', 'magenta', 'cyan',  'white', 'black' or a hex color like '#ff8800']
 
             o	style (str, optional): A Colorama style 
                 [Accepts 'bright', 'dim', 'normal', 'reset_all']
@@ -61,32 +274,82 @@ class TextStyle:
         self.bg_color: str = bg_color
         self.ansi: str = ansi
         self.style: str = style
+
+    def __setattr__(self, name: str, value) -> None:
+        object.__setattr__(self, name, value)
+        if name in TextStyle.FIELDS:
+            object.__setattr__(self, '_compiled', None)
     
     def unpack(self) -> dict[str, str]:
-        return {k: v for k, v in vars(self).items() if v is not None}
-    
-    def validate(self) -> bool:
-        if self.fg_color is not None and self.fg_color.lower() not in StencilData.VALID_COLORS:
+        return {k: getattr(self, k) for k in TextStyle.FIELDS if getattr(self, k) is not None}
+
+    @staticmethod
+    def is_valid(fg_color: str = None, bg_color: str = None, ansi: str = None, style: str = None) -> bool:
+        if fg_color is not None and not StencilData.is_color(fg_color):
             return False
 
-        if self.bg_color is not None and self.bg_color.lower() not in StencilData.VALID_COLORS:
+        if bg_color is not None and not StencilData.is_color(bg_color):
             return False
 
-        if self.ansi is not None and self.ansi.lower() not in StencilData.VALID_ANSI_STYLES:
+        if ansi is not None and ansi.lower() not in StencilData.VALID_ANSI_STYLES:
             return False
 
-        if self.style is not None and self.style.lower() not in StencilData.VALID_STYLES:
+        if style is not None and style.lower() not in StencilData.VALID_STYLES:
             return False
         
         return True
     
-    def apply(self, text: str) -> str:
-        if not self.validate():
-            return text
-        return ConsoleStencil.custom_style(text, self)
+    def validate(self) -> bool:
+        return self.compiled is not StyleCache.PASSTHROUGH
+
+    @property
+    def compiled(self) -> CompiledStyle:
+        if self._compiled is None or self._generation != StyleCache.generation:
+            self._compiled = StyleCache.get(self.fg_color, self.bg_color, self.ansi, self.style)
+            self._generation = StyleCache.generation
+        return self._compiled
 
+    @property
+    def inline(self) -> CompiledStyle:
+        """
+            The escape pair without padding spaces, for styling part of a line.
+        """
+        return StyleCache.get(self.fg_color, self.bg_color, self.ansi, self.style, padded=False)
     
-        
+    def apply(self, text: str) -> str:
+        compiled = self._compiled
+        if compiled is None or self._generation != StyleCache.generation:
+            compiled = self.compiled
+        return compiled.prefix + text + compiled.suffix
+
+
+class GlyphTables:
+    """
+        Pre-rendered escape and glyph tables for per-character styling.
+
+        Every entry is built once, painting a string then only interleaves table
+        entries with characters inside a single join, without running any Python
+        code per character.
+    """
+    # colorize() pads each character with spaces, rainbow() keeps that look
+    RAINBOW_PADDED: tuple[str] = tuple(f'{StencilData.COLOR_MAP[color]} ' for color in StencilData.RAINBOW_ORDER)
+    PADDED_RESET: str = f' {StencilData.RESET}'
+
+    BLOCKS: str = ' ▏▎▍▌▋▊▉█'
+    SPARKS: str = '▁▂▃▄▅▆▇█'
+
+    @staticmethod
+    def color_code(color: str) -> str:
+        '''
+            The foreground escape of a color name or hex color, '' for anything
+            else so unknown colors leave the glyphs unstyled.
+        '''
+        return StencilData.fg_code(color) if StencilData.is_color(color) else ''
+
+    @staticmethod
+    def color_table(colors: tuple[str]) -> tuple[str]:
+        return tuple(GlyphTables.color_code(color) for color in colors)
+
 
 class ConsoleStencil:
     '''
@@ -141,25 +404,25 @@ class ConsoleStencil:
 
             If the color is not valid, the text is returned as is.
             
-            Accepts 'red', 'green', 'blue', 'yellow', 'magenta', 'cyan', 
-            'white', 'black' as valid colors.
+            Accepts 'red', 'green', 'blue', 'yellow', 'magenta', 'cyan',
+            'white', 'black' or a hex color ('#ff8800'), hex colors are
+            quantized to what the terminal supports.
 
             Args:
                 text (str): text to colorize
                 color (str): color to apply
 
         """
-        color = color.lower()
-        if not color in StencilData.VALID_COLORS:
+        if not StencilData.is_color(color):
             return text
-        return f"{StencilData.COLOR_MAP[color]} {text} {Style.RESET_ALL}"
+        return f"{StencilData.fg_code(color)} {text} {StencilData.RESET}"
 
     def bg_colorize(text: str, color: str) -> str:
         """
         Applies color to the background of the text
 
         Accepts 'red', 'green', 'blue', 'yellow', 'magenta', 'cyan',
-        'white', 'black' as valid colors.
+        'white', 'black' or a hex color ('#ff8800').
 
         If the color is not valid, the text is returned as is.
         
@@ -167,10 +430,9 @@ class ConsoleStencil:
             text (str): text to colorize
             color (str): color to apply
         """
-        color = color.lower()
-        if not color in StencilData.VALID_COLORS:
+        if not StencilData.is_color(color):
             return text
-        return f"{StencilData.BACKGROUND_MAP[color]} {text} {Style.RESET_ALL}"
+        return f"{StencilData.bg_code(color)} {text} {StencilData.RESET}"
 
     @staticmethod
     def font_variant(text: str, style: str) -> str:
@@ -190,7 +452,7 @@ class ConsoleStencil:
         if not style in StencilData.VALID_STYLES:
             return text
 
-        return f"{StencilData.STYLE_MAP[style]}{text}{Style.RESET_ALL}"
+        return f"{StencilData.STYLE_MAP[style]}{text}{StencilData.RESET}"
 
     @staticmethod
     def rainbow(text: str) -> str:
@@ -203,9 +465,66 @@ class ConsoleStencil:
             Returns:
                 str: The rainbow-colored text.
         """
-        colors = list(StencilData.VALID_COLORS)
-        colored_chars = [ConsoleStencil.colorize(char, colors[i % len(colors)]) for i, char in enumerate(text)]
-        return ''.join(colored_chars)
+        pieces = zip(cycle(GlyphTables.RAINBOW_PADDED), text, repeat(GlyphTables.PADDED_RESET))
+        return ''.join(chain.from_iterable(pieces))
+
+    @staticmethod
+    def gradient(text: str, colors: tuple[str] = StencilData.RAINBOW_ORDER, run: int = 1) -> str:
+        """
+            Colors each character of the text, cycling through colors every 
+            'run' characters. Unlike rainbow() no spaces are added.
+
+            Args:
+                text (str): The text to color.
+                colors (tuple[str]): Valid color names in the order to cycle through.
+                run (int): How many characters share a color before moving to the next.
+
+            Returns:
+                str: The colored text.
+        """
+        table = GlyphTables.color_table(colors)
+        if run > 1:
+            table = tuple(prefix for prefix in table for _ in range(run))
+        return ''.join(chain.from_iterable(zip(cycle(table), text))) + StencilData.RESET
+
+    @staticmethod
+    def progress_bar(fraction: float, width: int = 20, color: str = 'green', track_color: str = 'white') -> str:
+        """
+            A horizontal bar filled to 'fraction' (0.0 - 1.0) with eighth-block precision.
+
+            Args:
+                fraction (float): How full the bar is.
+                width (int): Width of the bar in characters.
+                color (str): Color of the filled part.
+                track_color (str): Color of the empty part.
+        """
+        eighths = round(max(0.0, min(1.0, fraction)) * width * 8)
+        full, partial = divmod(eighths, 8)
+        bar = GlyphTables.BLOCKS[-1] * full + (GlyphTables.BLOCKS[partial] if partial else '')
+        return (f'{GlyphTables.color_code(color)}{bar}'
+            f'{GlyphTables.color_code(track_color)}{"░" * (width - len(bar))}{StencilData.RESET}')
+
+    @staticmethod
+    def sparkline(values: list[float], colors: tuple[str] = None) -> str:
+        """
+            Draws the values as a row of block glyphs scaled between their minimum and
+            maximum, optionally coloring each level from a ramp of colors (low to high).
+
+            Args:
+                values (list[float]): The data points.
+                colors (tuple[str], optional): Color ramp, spread over the eight levels.
+        """
+        if not values:
+            return ''
+        glyphs = GlyphTables.SPARKS
+        if colors:
+            ramp = GlyphTables.color_table(colors)
+            glyphs = tuple(ramp[level * len(ramp) // len(glyphs)] + glyph for level, glyph in enumerate(glyphs))
+
+        low, high = min(values), max(values)
+        scale = (len(glyphs) - 1) / (high - low) if high > low else 0
+        line = ''.join([glyphs[int((value - low) * scale)] for value in values])
+        return line + StencilData.RESET if colors else line
 
     @staticmethod
     def multi_style(text: str, **kwargs) -> str:
@@ -229,11 +548,11 @@ class ConsoleStencil:
         styled_text = text
         for key, value in kwargs.items():
             value = value.lower()
-            if key == 'fg_color' and value in StencilData.VALID_COLORS:
-                styled_text = f"{StencilData.COLOR_MAP[value]} {styled_text}"
+            if key == 'fg_color' and StencilData.is_color(value):
+                styled_text = f"{StencilData.fg_code(value)} {styled_text}"
 
-            elif key == 'bg_color' and value in StencilData.VALID_COLORS:
-                styled_text = f"{StencilData.BACKGROUND_MAP[value]} {styled_text}"
+            elif key == 'bg_color' and StencilData.is_color(value):
+                styled_text = f"{StencilData.bg_code(value)} {styled_text}"
 
             elif key == 'ansi' and value in StencilData.VALID_ANSI_STYLES:
                 styled_text = f"{StencilData.ANSI_STYLE_MAP[value]} {styled_text} {StencilData.ANSI_STYLE_MAP['normal']}"
@@ -242,7 +561,7 @@ class ConsoleStencil:
                 styled_text = f"{StencilData.STYLE_MAP[value]} {styled_text}"
 
 
-        return f'{styled_text} {Style.RESET_ALL}'
+        return f'{styled_text} {StencilData.RESET}'
     
     @staticmethod
     def custom_style(text: str, style: TextStyle) -> str:
@@ -259,10 +578,7 @@ class ConsoleStencil:
             Returns:
                 str: The text with the style applied.
         """
-        if not style.validate():
-            return text
-
-        return ConsoleStencil.multi_style(text, **style.unpack())
+        return style.apply(text)
 
     @staticmethod
     def highlight_phrase(text: str, phrase: str, ansi: str) -> str:
@@ -281,10 +597,10 @@ class ConsoleStencil:
             Returns:
                 str: The text with the phrase highlighted.
         """
-        if not phrase in text or not ansi in ConsoleStencil.VALID_ANSI_STYLES:
+        ansi = ansi.lower()
+        if not phrase or not ansi in StencilData.VALID_ANSI_STYLES:
             return text
 
-        ansi = ansi.lower()
         ansi_style = StencilData.ANSI_STYLE_MAP[ansi]
         return text.replace(phrase, 
                 f"{ansi_style}{phrase}{StencilData.ANSI_STYLE_MAP['normal']}")
@@ -334,13 +650,13 @@ class ConsoleStencil:
             Returns:
                 str: The text with the phrase colorized.
         """
-        if not phrase in text or not color in StencilData.VALID_COLORS:
+        color = color.lower()
+        if not phrase or not color in StencilData.VALID_COLORS:
             return text
 
-        color = color.lower()
         color_map = StencilData.BACKGROUND_MAP if is_background else StencilData.COLOR_MAP
         color_code = color_map[color]
-        return text.replace(phrase, f'{color_code}{phrase}{Style.RESET_ALL}')
+        return text.replace(phrase, f'{color_code}{phrase}{StencilData.RESET}')
 
     @staticmethod
     def brighten(text: str) -> str:
@@ -375,17 +691,199 @@ class ConsoleStencil:
         Returns:
             str: The text with the regex matches colored.
         """
-        if not isinstance(regex, re.Pattern) or not re.search(regex, text):
+        color = color.lower()
+        if not isinstance(regex, re.Pattern) or color not in StencilData.VALID_COLORS:
             return text
 
-        color = color.lower()
+        # one pass, a text without matches comes back unchanged
+        return regex.sub(f"{StencilData.COLOR_MAP[color]}\\g<0>{StencilData.RESET}", text)
 
-        if color not in StencilData.VALID_COLORS:
-            return text
 
-        return regex.sub(lambda match:
-            f"{StencilData.COLOR_MAP[color]}{match.group()}{Style.RESET_ALL}", text
-        )
+class Highlighter:
+    SCOPED_FLAGS: dict[int, str] = {re.ASCII: 'a', re.IGNORECASE: 'i', re.MULTILINE: 'm', re.DOTALL: 's', re.VERBOSE: 'x'}
+    # inline global flags, allowed only at the start of a pattern
+    GLOBAL_FLAGS: re.Pattern = re.compile(r'(?:\(\?[aiLmsux]+\))+')
+
+    def __init__(self, rules: list[tuple] = None, cache_size: int = 4096) -> None:
+        """
+            Highlights several (pattern, style) rules in a single pass per line.
+
+            The rules are combined into one compiled alternation of named groups,
+            so each line is scanned once whatever the number of rules. Where rules
+            overlap the one added first wins. Escape sequences are built once per
+            rule, and highlighted lines are cached keyed by the line and the version
+            of the rule set, so redrawing the same screen costs dictionary lookups.
+
+            o	rules (list, optional): (pattern, style) pairs, see add_rule
+
+            o	cache_size (int, optional): how many highlighted lines to keep
+        """
+        self.cache_size: int = cache_size
+        self.version: int = 0
+        self._rules: list[tuple[re.Pattern, object]] = []
+        self._generation: int = StyleCache.generation
+        self._regex: re.Pattern = None
+        self._styles: dict[str, CompiledStyle] = {}
+        self._cache: OrderedDict[tuple[int, str], str] = OrderedDict()
+        self._span_cache: OrderedDict[tuple[int, str], list[tuple[int, int, str]]] = OrderedDict()
+        for pattern, style in rules or []:
+            self.add_rule(pattern, style)
+
+    def add_rule(self, pattern, style) -> None:
+        """
+            Adds a rule, the pattern may be a string or a compiled pattern (its
+            a / i / m / s / x flags, given as arguments or as a leading '(?i)', only
+            apply to the rule). Numbered backreferences and conditionals refer to
+            the rule's own groups. Patterns must not use named groups, and at most
+            99 groups can be used across all rules. The style is a TextStyle or a
+            foreground color name.
+        """
+        if isinstance(pattern, str):
+            pattern = re.compile(pattern)
+        if pattern.groupindex:
+            raise ValueError(f'Highlighter rules must not use named groups: {pattern.pattern!r}')
+        self._rules.append((pattern, style))
+        self._compile()
+
+    def clear(self) -> None:
+        self._rules.clear()
+        self._compile()
+
+    def _compile(self) -> None:
+        self.version += 1
+        self._cache.clear()
+        self._span_cache.clear()
+        self._styles = {}
+        self._generation = StyleCache.generation
+        groups, offset = [], 0
+        for idx, (pattern, style) in enumerate(self._rules):
+            compiled = style.inline if isinstance(style, TextStyle) else StyleCache.get(fg_color=style, padded=False)
+            flags = ''.join(char for flag, char in Highlighter.SCOPED_FLAGS.items() if pattern.flags & flag)
+            # the rule's own groups come after the group wrapping it
+            text = Highlighter.renumber(Highlighter.GLOBAL_FLAGS.sub('', pattern.pattern, count=1), offset + 1)
+            body = f'(?{flags}:{text})' if flags else text
+            groups.append(f'(?P<r{idx}>{body})')
+            self._styles[f'r{idx}'] = compiled
+            offset += 1 + pattern.groups
+        self._regex = re.compile('|'.join(groups)) if groups else None
+
+    @staticmethod
+    def renumber(text: str, offset: int) -> str:
+        '''
+            Shifts the numbered backreferences ('\\1') and conditionals ('(?(1)')
+            of a pattern by offset groups. Escapes inside character classes and
+            octal escapes are left alone.
+        '''
+        out, idx, class_start = [], 0, None
+        while idx < len(text):
+            char = text[idx]
+            if char == '\\':
+                following = text[idx + 1:idx + 4]
+                if class_start is None and following[:1] in '123456789' and following[:1] \
+                        and not re.fullmatch(r'[0-7]{3}', following):
+                    digits = re.match(r'\d{1,2}', following).group()
+                    out.append(f'(?:\\{Highlighter._shift(int(digits), offset)})')
+                    idx += 1 + len(digits)
+                else:
+                    out.append(text[idx:idx + 2])
+                    idx += 2
+                continue
+
+            if class_start is None:
+                condition = re.match(r'\(\?\((\d+)\)', text[idx:])
+                if condition:
+                    out.append(f'(?({Highlighter._shift(int(condition.group(1)), offset)})')
+                    idx += condition.end()
+                    continue
+                if char == '[':
+                    class_start = idx
+            elif char == ']' and idx > class_start + 1 and not (idx == class_start + 2 and text[idx - 1] == '^'):
+                class_start = None
+            out.append(char)
+            idx += 1
+        return ''.join(out)
+
+    @staticmethod
+    def _shift(number: int, offset: int) -> int:
+        if number + offset > 99:
+            raise ValueError('Highlighter rules can use at most 99 groups between them')
+        return number + offset
+
+    def _replace(self, match: re.Match) -> str:
+        compiled = self._styles[match.lastgroup]
+        return compiled.prefix + match.group() + compiled.suffix
+
+    def highlight(self, line: str) -> str:
+        if self._regex is None:
+            return line
+        if self._generation != StyleCache.generation:
+            # the color depth changed, the rule styles are built again
+            self._compile()
+
+        key = (self.version, line)
+        cache = self._cache
+        styled = cache.get(key)
+        if styled is not None:
+            cache.move_to_end(key)
+            return styled
+
+        styled = self._regex.sub(self._replace, line)
+        cache[key] = styled
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return styled
+
+    def highlight_lines(self, lines: list[str]) -> list[str]:
+        return [self.highlight(line) for line in lines]
+
+    def spans(self, line: str) -> list[tuple[int, int, str]]:
+        '''
+            (start, end, rule) of the matches in a whole line, cached like
+            highlighted lines.
+        '''
+        key = (self.version, line)
+        cache = self._span_cache
+        spans = cache.get(key)
+        if spans is not None:
+            cache.move_to_end(key)
+            return spans
+
+        spans = [(match.start(), match.end(), match.lastgroup) for match in self._regex.finditer(line)
+            if match.end() > match.start()]
+        cache[key] = spans
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return spans
+
+    def highlight_row(self, line: str, row_start: int, width: int, restore: str = '') -> str:
+        '''
+            Highlights the row of a soft-wrapped line that starts at column
+            row_start. The rules are matched against the whole line, so anchors
+            and matches that run across the wrap point work as they do unwrapped.
+
+            o	restore (str, optional): escapes written after each highlighted
+                part, to bring back a style the row is drawn in
+        '''
+        row = line[row_start:row_start + width]
+        if self._regex is None:
+            return row
+        if self._generation != StyleCache.generation:
+            self._compile()
+
+        row_end = row_start + len(row)
+        pieces, cursor = [], 0
+        for start, end, rule in self.spans(line):
+            if end <= row_start or start >= row_end:
+                continue
+            start, end = max(start, row_start) - row_start, min(end, row_end) - row_start
+            compiled = self._styles[rule]
+            pieces.append(row[cursor:start])
+            pieces.append(compiled.prefix + row[start:end] + compiled.suffix + restore)
+            cursor = end
+        if not pieces:
+            return row
+        pieces.append(row[cursor:])
+        return ''.join(pieces)
 
 
 def test_color_phrase():
@@ -453,12 +951,64 @@ def regex_test() -> None:
     colored_text = ConsoleStencil.color_regex_matches(text, pattern, 'green')
     print(colored_text)
 
+def glyph_benchmark(lengths: tuple[int] = (1_000, 10_000, 100_000, 1_000_000)) -> None:
+    '''
+        Times rainbow() against the previous colorize-per-character version. Time
+        per character should stay flat as the text grows (linear scaling).
+    '''
+    def per_char_rainbow(text: str) -> str:
+        colors = StencilData.RAINBOW_ORDER
+        return ''.join([ConsoleStencil.colorize(char, colors[i % len(colors)]) for i, char in enumerate(text)])
+
+    import timeit
+    for length in lengths:
+        text = 'x' * length
+        number = max(1, 1_000_000 // length)
+        assert ConsoleStencil.rainbow(text) == per_char_rainbow(text)
+        old = timeit.timeit(lambda: per_char_rainbow(text), number=number) / number
+        new = timeit.timeit(lambda: ConsoleStencil.rainbow(text), number=number) / number
+        print(f'{length:>9} chars  colorize loop {old / length * 1e9:7.1f} ns/char  '
+            f'tables {new / length * 1e9:7.1f} ns/char ({old / new:.1f}x)')
+
+
+def highlighter_demo() -> None:
+    highlighter = Highlighter([
+        (r'^(From|To|Subject|Date):', TextStyle(fg_color='cyan', ansi='bold')),
+        (r'^>.*$', 'green'),
+        (r'https?://\S+', TextStyle(fg_color='blue', ansi='underline')),
+    ])
+    body = [
+        'From: someone@example.com',
+        'Subject: Q3 report',
+        '> quoted reply line',
+        'see https://example.com/report for details',
+    ]
+    print('\n'.join(highlighter.highlight_lines(body)))
+
+
 def text_style() -> None:
     style = TextStyle(ansi='bold', fg_color='red') 
     print(style.apply('Hello, World!'))
 
 
 
+def style_benchmark(iterations: int = 100_000) -> None:
+    '''
+        Compares the kwargs multi_style path against a compiled TextStyle
+        for the same settings.
+    '''
+    import timeit
+    settings = { 'fg_color' : 'white', 'bg_color' : 'black', 'ansi' : 'italic', 'style' : 'bright' }
+    style = TextStyle(**settings)
+    text = '   [ Inbox (1,204) ]'
+    assert style.apply(text) == ConsoleStencil.multi_style(text, **settings)
+
+    multi = timeit.timeit(lambda: ConsoleStencil.multi_style(text, **settings), number=iterations)
+    compiled = timeit.timeit(lambda: style.apply(text), number=iterations)
+    print(f'multi_style     : {multi / iterations * 1e9:8.1f} ns/call')
+    print(f'TextStyle.apply : {compiled / iterations * 1e9:8.1f} ns/call ({multi / compiled:.1f}x)')
+
+
 def main() -> None:
     text_style()
     # regex_test()
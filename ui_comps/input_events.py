@@ -0,0 +1,239 @@
+import queue
+import time
+from typing import TYPE_CHECKING, Callable
+from profiler import FrameProfiler
+
+# keyboard starts its OS hook machinery on import and asyncio is large, both are
+# imported when a loop first needs them so importing the UI modules stays cheap
+if TYPE_CHECKING:
+    import asyncio
+    import keyboard
+
+
+class FrameClock:
+    def __init__(self, max_fps: int = 60) -> None:
+        '''
+            Caps how often a UI redraws. Input that arrives before the next frame
+            is due is applied to the state and drawn with that frame, so held keys
+            never queue up more frames than the display can show.
+        '''
+        self.interval: float = 1 / max_fps if max_fps else 0.0
+        self.last_frame: float = 0.0
+
+    def tick(self) -> None:
+        self.last_frame = time.perf_counter()
+
+    @property
+    def next_frame(self) -> float:
+        return self.last_frame + self.interval
+
+    def remaining(self) -> float:
+        return max(0.0, self.next_frame - time.perf_counter())
+
+
+class KeyQueue:
+    def __init__(self) -> None:
+        '''
+            Collects key-down events from the keyboard hook so a UI loop can take
+            everything that is pending at once instead of one event per frame.
+
+                with KeyQueue() as keys:
+                    for event in keys.drain(clock):
+                        ...
+        '''
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._hook = None
+
+    def start(self) -> None:
+        import keyboard
+
+        def on_event(event: 'keyboard.KeyboardEvent') -> None:
+            if event.event_type == keyboard.KEY_DOWN:
+                self._queue.put(event)
+
+        self._hook = keyboard.hook(on_event)
+
+    def stop(self) -> None:
+        if self._hook is not None:
+            import keyboard
+            keyboard.unhook(self._hook)
+            self._hook = None
+
+    def __enter__(self) -> 'KeyQueue':
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def put(self, event: 'keyboard.KeyboardEvent') -> None:
+        self._queue.put(event)
+
+    def drain(self, clock: FrameClock = None) -> list['keyboard.KeyboardEvent']:
+        '''
+            Blocks for the next event, then keeps collecting until the clock's next
+            frame is due and returns everything that arrived, in order.
+        '''
+        events = [self._queue.get()]
+        if clock is not None:
+            remaining = clock.remaining()
+            while remaining > 0:
+                try:
+                    events.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+                remaining = clock.remaining()
+
+        while True:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                return events
+
+
+class KeyStream:
+    def __init__(self) -> None:
+        '''
+            Key-down events as an async stream.
+
+            The keyboard hook runs on its own thread, events are handed to the
+            running event loop with call_soon_threadsafe so waiting for a key never
+            blocks other coroutines.
+
+                async with KeyStream() as keys:
+                    async for event in keys:
+                        ...
+        '''
+        self._queue: 'asyncio.Queue' = None
+        self._hook = None
+
+    def start(self) -> None:
+        import asyncio
+        import keyboard
+
+        loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+
+        def on_event(event: 'keyboard.KeyboardEvent') -> None:
+            if event.event_type == keyboard.KEY_DOWN:
+                loop.call_soon_threadsafe(self._queue.put_nowait, event)
+
+        self._hook = keyboard.hook(on_event)
+
+    def stop(self) -> None:
+        if self._hook is not None:
+            import keyboard
+            keyboard.unhook(self._hook)
+            self._hook = None
+
+    async def __aenter__(self) -> 'KeyStream':
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.stop()
+
+    def __aiter__(self) -> 'KeyStream':
+        return self
+
+    async def __anext__(self) -> 'keyboard.KeyboardEvent':
+        return await self._queue.get()
+
+
+class RedrawScheduler:
+    def __init__(self, render: Callable[[], None], max_fps: int = 60) -> None:
+        '''
+            Coalesces redraw requests into one render per pass of the event loop,
+            any number of request() calls before the loop gets to it cost a
+            single frame. Frames are spaced at least 1 / max_fps seconds apart.
+        '''
+        self.render = render
+        self.clock: FrameClock = FrameClock(max_fps)
+        self._handle: 'asyncio.Handle' = None
+
+    def request(self) -> None:
+        if self._handle is not None:
+            return
+        import asyncio
+        loop = asyncio.get_running_loop()
+        delay = self.clock.remaining()
+        if delay:
+            self._handle = loop.call_later(delay, self._flush)
+        else:
+            self._handle = loop.call_soon(self._flush)
+
+    def cancel(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _flush(self) -> None:
+        self._handle = None
+        self.clock.tick()
+        self.render()
+
+
+def run_ui_sync(render: Callable[[], None], handle_key: Callable[['keyboard.KeyboardEvent'], None],
+    is_running: Callable[[], bool], max_fps: int = 60,
+    bind_wakeup: Callable[[Callable[[], None]], None] = None) -> None:
+    '''
+        Drives a UI component on the calling thread: draws a frame, then applies
+        every key that arrives before the next frame is due and draws once.
+
+        bind_wakeup, if given, receives a thread-safe function that makes the loop
+        redraw without a key press (None is passed once the loop stops).
+    '''
+    clock = FrameClock(max_fps)
+    with KeyQueue() as keys:
+        if bind_wakeup is not None:
+            bind_wakeup(lambda: keys.put(None))
+        try:
+            while is_running():
+                render()
+                clock.tick()
+                for event in keys.drain(clock):
+                    if event is None:
+                        continue
+                    if FrameProfiler.enabled:
+                        FrameProfiler.input_received(event)
+                    handle_key(event)
+                    if not is_running():
+                        return
+        finally:
+            if FrameProfiler.enabled:
+                FrameProfiler.discard_input()
+            if bind_wakeup is not None:
+                bind_wakeup(None)
+
+
+async def run_ui(render: Callable[[], None], handle_key: Callable[['keyboard.KeyboardEvent'], None],
+    is_running: Callable[[], bool], max_fps: int = 60,
+    bind_wakeup: Callable[[Callable[[], None]], None] = None) -> None:
+    '''
+        Drives a UI component from the event loop: draws it, then applies each key
+        as it arrives and schedules a redraw. Keys that arrive before the redraw
+        runs are all applied first, so they cost one frame.
+
+        bind_wakeup works the same as for run_ui_sync.
+    '''
+    redraw = RedrawScheduler(render, max_fps)
+    redraw.request()
+    if bind_wakeup is not None:
+        import asyncio
+        loop = asyncio.get_running_loop()
+        bind_wakeup(lambda: loop.call_soon_threadsafe(redraw.request))
+    try:
+        async with KeyStream() as keys:
+            async for event in keys:
+                if FrameProfiler.enabled:
+                    FrameProfiler.input_received(event)
+                handle_key(event)
+                if not is_running():
+                    break
+                redraw.request()
+    finally:
+        redraw.cancel()
+        if FrameProfiler.enabled:
+            FrameProfiler.discard_input()
+        if bind_wakeup is not None:
+            bind_wakeup(None)
@@ -1,15 +1,59 @@
 import os
-import keyboard
+import sys
 from colorify import ConsoleStencil, TextStyle
-import time
-from typing import Callable
+from typing import TYPE_CHECKING, Callable
 from prompts import Prompt
+from screen import Frame, ScreenBuffer
+from terminal import HeadlessMode, TerminalGeometry
+from sources import OptionSource, PagedOptions, as_source
+from search_index import IncrementalFilter, TrigramIndex
+from input_events import run_ui, run_ui_sync
+from profiler import FrameProfiler
+
+if TYPE_CHECKING:
+    import keyboard
 
 class MenuUtils:
+    # options are looked through this many at a time when matching a title
+    SCAN_BATCH: int = 1024
+
     @staticmethod
     def clear() -> None:
         os.system('cls' if os.name == 'nt' else 'clear')
 
+    @staticmethod
+    def read_choice() -> str:
+        '''
+            Reads a headless menu's selection from the next line of stdin.
+        '''
+        line = sys.stdin.readline()
+        if not line:
+            raise EOFError('No menu selection on stdin')
+        return line.strip()
+
+    @staticmethod
+    def locate(source: OptionSource, answer: str, title: Callable[[object], str]) -> int:
+        '''
+            The index of the option answer names, either a 1-based number or a
+            title (case-insensitive). Raises ValueError when nothing matches.
+        '''
+        answer = str(answer).strip()
+        if answer.isdigit():
+            idx = int(answer) - 1
+            if idx >= 0 and source.fetch(idx, idx + 1):
+                return idx
+            raise ValueError(f'No option number {answer}')
+
+        wanted, start = answer.lower(), 0
+        while True:
+            batch = source.fetch(start, start + MenuUtils.SCAN_BATCH)
+            for offset, option in enumerate(batch):
+                if title(option).lower() == wanted:
+                    return start + offset
+            if len(batch) < MenuUtils.SCAN_BATCH:
+                raise ValueError(f'No option titled {answer!r}')
+            start += len(batch)
+
 
 class MenuDefaults:
     UNSELECTED = TextStyle(fg_color='black', bg_color='white', ansi='bold', style='bright')
@@ -51,17 +95,38 @@ class Option:
 
     
 class SimpleMenu:
-    def __init__(self, options: list[str], prompt: str, menu_style: MenuStyle = None, should_divide: bool = True) -> None:
+    # Pressing '/' starts type-to-filter, paged menus turn this off
+    SEARCHABLE: bool = True
+
+    def __init__(self, options: list[str], prompt: str, menu_style: MenuStyle = None, should_divide: bool = True,
+    virtualize: bool = False) -> None:
+        '''
+            o	virtualize (bool, optional): only render the window of options that fits the
+                terminal around the highlighted option, keeps each keypress the same cost
+                regardless of how many options there are. Use it for very large lists.
+
+            Pressing '/' filters the options to the ones whose title contains what is
+            typed next, backspace edits the filter and esc clears it.
+        '''
         self.style = menu_style if menu_style else MenuDefaults.create_default()
         self.options: list = options
         self.prompt: str = self.style.prompt.apply(prompt)
-        self.__set_menu_options(should_divide)
+        self.screen: ScreenBuffer = ScreenBuffer()
+        self.__set_menu_options(should_divide, virtualize)
         
-    def __set_menu_options(self, should_divide: bool) -> None:
+    def __set_menu_options(self, should_divide: bool, virtualize: bool) -> None:
         self.highlight: int = 0
         self.running: bool = False
         self._should_divide: bool = should_divide
+        self._virtualize: bool = virtualize
+        self._top: int = 0
+        self.max_fps: int = 60
+        self._filter: IncrementalFilter = None
+        self._query: str = None
+        self._matches: list[int] = None
         self._divider: str = '*'
+        self._wakeup: Callable[[], None] = None
+        self._bindings: dict[str, Callable[[object], None]] = {}
         self.option_formatter = lambda option: f'   [ {option} ]'
 
         
@@ -84,179 +149,422 @@ class SimpleMenu:
     def set_divider(self, divider: str) -> None:
         if len(divider) == 1:
             self._divider = divider
+
+    def set_frame_rate(self, max_fps: int) -> None:
+        '''
+            Caps how many frames per second the menu draws, keys that arrive
+            between frames (a held arrow key) are applied together.
+        '''
+        if max_fps > 0:
+            self.max_fps = max_fps
     
     
-    def render_routine(self, idx: int, item) -> None:
-        print(self.style.option_stylize(idx == self.highlight, 
-            self.option_formatter(item)
-            )
-        )
+    def render_routine(self, idx: int, item, frame: Frame) -> None:
+        started = FrameProfiler.clock() if FrameProfiler.enabled else None
+        frame.append(self.style.option_stylize(idx == self.highlight, self.option_formatter(item)))
+        if started is not None:
+            FrameProfiler.add_phase('style', started)
 
         if self._should_divide:
-            Prompt.print_line(self._divider)
+            frame.append(Prompt.divider(self._divider))
 
+    def viewport_rows(self) -> int:
+        '''
+            Number of options that fit below the prompt row.
+        '''
+        rows = TerminalGeometry.lines() - 2
+        return max(1, rows // 2 if self._should_divide else rows)
+
+    def visible_window(self) -> range:
+        '''
+            The indexes of the options to render. In virtualized mode the window
+            only scrolls as far as needed to keep the highlight on screen.
+        '''
+        count = self.displayed_count()
+        if not self._virtualize:
+            return range(count)
+
+        size = min(self.viewport_rows(), count)
+        if self.highlight < self._top:
+            self._top = self.highlight
+        elif self.highlight >= self._top + size:
+            self._top = self.highlight - size + 1
+        self._top = max(0, min(self._top, count - size))
+        return range(self._top, self._top + size)
+
+    def compose(self) -> Frame:
+        frame = Frame()
+        if self._query is None:
+            frame.append(self.prompt)
+        else:
+            frame.append(f'{self.prompt} /{self._query} ({len(self._matches)} matches)')
+        for idx in self.visible_window():
+            self.render_routine(idx, self.displayed_option(idx), frame)
+        return frame
     
     def render(self) -> None:
-        Prompt.clear()
-        print(self.prompt)
-        for idx, item in enumerate(self.options):
-            self.render_routine(idx, item)
+        '''
+            Draws the menu through the screen buffer, only the rows
+            that changed since the last frame are repainted.
+        '''
+        if FrameProfiler.enabled:
+            FrameProfiler.profile_frame(type(self).__name__, self.compose, self.screen)
+            return
+        self.screen.draw(self.compose())
             
     
-    def handle_keys(self, key: keyboard.KeyboardEvent) -> None:
-        if key.name == 'up' or key.name == 'w':
-            self.highlight = (self.highlight - 1) % len(self.options)
+    def displayed_count(self) -> int:
+        '''
+            Number of options the highlight can move between.
+        '''
+        if self._matches is not None:
+            return len(self._matches)
+        return len(self.options)
+
+    def displayed_option(self, row: int):
+        '''
+            The option shown on the row, rows follow the filter when one is active.
+        '''
+        if self._matches is not None:
+            return self.options[self._matches[row]]
+        return self.options[row]
+
+    def option_title(self, option) -> str:
+        return str(option)
+
+    def set_filter(self, query: str) -> None:
+        '''
+            Shows only the options whose title contains query (case-insensitive).
+            The title index is built on first use, each following call only
+            refines the previous results.
+        '''
+        if self._filter is None:
+            self._filter = IncrementalFilter(TrigramIndex(self.option_title(option) for option in self.options))
+        self._query = query
+        self._matches = self._filter.update(query)
+        self.highlight = 0
+        self._top = 0
+
+    def clear_filter(self) -> None:
+        self._query = None
+        self._matches = None
+        self.highlight = 0
+        self._top = 0
+
+    def handle_filter_keys(self, key: 'keyboard.KeyboardEvent') -> bool:
+        '''
+            Edits the filter while it is active, returns True if the key was used.
+        '''
+        if key.name == 'esc':
+            self.clear_filter()
+        elif key.name == 'backspace':
+            self.set_filter(self._query[:-1])
+        elif key.name == 'space':
+            self.set_filter(self._query + ' ')
+        elif len(key.name) == 1:
+            self.set_filter(self._query + key.name)
+        else:
+            return False
+        return True
+    
+    def handle_keys(self, key: 'keyboard.KeyboardEvent') -> None:
+        if self._query is not None and self.handle_filter_keys(key):
+            return
+
+        if key.name in self._bindings:
+            if self.displayed_count():
+                self._bindings[key.name](self.displayed_option(self.highlight))
+
+        elif key.name == '/' and self.SEARCHABLE:
+            self.set_filter('')
+
+        elif key.name == 'up' or key.name == 'w':
+            self.highlight = (self.highlight - 1) % max(1, self.displayed_count())
 
         elif key.name == 'down' or key.name == 's':
-            self.highlight = (self.highlight + 1) % len(self.options)
+            self.highlight = (self.highlight + 1) % max(1, self.displayed_count())
+
+        elif key.name == 'page up' and self._virtualize:
+            self.highlight = max(0, self.highlight - self.viewport_rows())
+
+        elif key.name == 'page down' and self._virtualize:
+            self.highlight = max(0, min(self.displayed_count() - 1, self.highlight + self.viewport_rows()))
 
-        elif key.name == 'enter':
+        elif key.name == 'enter' and self.displayed_count():
             self.running = False
     
-    def run(self) -> str:
+    def option_source(self) -> OptionSource:
+        return as_source(self.options)
+
+    def show_index(self, idx: int) -> None:
+        '''
+            Highlights the option at idx in the full (unfiltered) options.
+        '''
+        self.clear_filter()
+        self.highlight = idx
+
+    def select(self, answer) -> None:
+        '''
+            Highlights the option answer names, a 1-based number or a title,
+            without drawing anything. Raises ValueError when nothing matches.
+        '''
+        self.show_index(MenuUtils.locate(self.option_source(), answer, self.option_title))
+
+    def run(self, choice: str = None) -> str:
         '''
             Simple Menu returns the string of 
             the selected option once the menu
             stops.
+
+            Pass choice (a 1-based number or a title) to select without the
+            keyboard, headless menus read it from stdin when it isn't given.
         '''
-        self.ui_loop()
-        return self.options[self.highlight]
+        self.ui_loop(choice)
+        return self.displayed_option(self.highlight)
+
+    async def arun(self, choice: str = None) -> str:
+        '''
+            The asyncio version of run(), other coroutines keep
+            running while the menu waits for keys.
+        '''
+        await self.async_ui_loop(choice)
+        return self.displayed_option(self.highlight)
     
-    def ui_loop(self) -> None:
+    def resolve_headless(self, choice: str = None) -> bool:
+        '''
+            Selects choice, or the next line of stdin when headless. Returns
+            False when the menu should be run interactively instead.
+        '''
+        if choice is None:
+            if not HeadlessMode.active():
+                return False
+            choice = MenuUtils.read_choice()
+        self.select(choice)
+        return True
+
+    def ui_loop(self, choice: str = None) -> None:
+        if self.resolve_headless(choice):
+            return
         self.running = True
-        while self.running:
-            self.render()
-            key = keyboard.read_event()
-            if key.event_type != keyboard.KEY_DOWN:
-                continue    
-            self.handle_keys(key)
-            time.sleep(0.01)
+        run_ui_sync(self.render, self.on_key, lambda: self.running, self.max_fps, self.bind_wakeup)
+
+    async def async_ui_loop(self, choice: str = None) -> None:
+        if self.resolve_headless(choice):
+            return
+        self.running = True
+        await run_ui(self.render, self.on_key, lambda: self.running, self.max_fps, self.bind_wakeup)
+
+    def bind_key(self, name: str, action: Callable[[object], None]) -> None:
+        '''
+            Calls action with the highlighted option when the key name is
+            pressed, instead of what the key does by default. Actions that change
+            the options should call refresh_options() on paged menus.
+        '''
+        self._bindings[name] = action
+
+    def bind_wakeup(self, wakeup: Callable[[], None]) -> None:
+        self._wakeup = wakeup
+
+    def request_redraw(self) -> None:
+        '''
+            Makes a running menu draw a frame without waiting for a key, safe
+            to call from any thread. Does nothing when the menu isn't running.
+        '''
+        if self._wakeup is not None:
+            self._wakeup()
+
+    def on_key(self, key: 'keyboard.KeyboardEvent') -> None:
+        TerminalGeometry.refresh()
+        self.handle_keys(key)
 
 class ValueMenu(SimpleMenu):
-    def __init__(self, options: list[Option], prompt: str, menu_style: MenuStyle = None, should_divide: bool = True) -> None:
-        super().__init__(options, prompt, menu_style)
+    def __init__(self, options: list[Option], prompt: str, menu_style: MenuStyle = None, should_divide: bool = True,
+    virtualize: bool = False) -> None:
+        super().__init__(options, prompt, menu_style, should_divide, virtualize)
         self.option_formatter = lambda option: f'   [ {option.title} ]'
     
        
+    def option_title(self, option: Option) -> str:
+        return option.title
+
+    def selected_option(self) -> Option:
+        return self.displayed_option(self.highlight)
+    
     def get_choice(self):
-        return self.options[self.highlight].value
+        return self.selected_option().value
     
     def choice_title(self):
-        return self.options[self.highlight].title
+        return self.selected_option().title
     
     def __detr_option_style(self, is_selected: bool, option: str) -> str:
         return super().__detr_option_style(is_selected, self.option_formatter(option))
 
-    def run(self) -> None:
+    def run(self, choice: str = None) -> None:
         '''
             Only performs UI Loop for the menu
             to get the select choice call 'get_choice_value'
             after the menu has stopped.
         '''
-        self.ui_loop()
+        self.ui_loop(choice)
+
+    async def arun(self, choice: str = None) -> None:
+        await self.async_ui_loop(choice)
     
     def add_option(self, option: Option) -> None:
-        self.options.append(option)    
+        if not hasattr(self.options, 'append'):
+            raise TypeError('add_option() needs a menu built from a list, add to its option source instead')
+        self.options.append(option)
+        # the title index is rebuilt, with the new option, the next time the filter changes
+        self._filter = None
     
 
-class SimplePagedMenu(SimpleMenu):
-    def __init__(self, options: list[str], prompt: str, page_size: int = 5, menu_style: MenuStyle = None) -> None:
-        super().__init__(options, prompt, menu_style)
-        self.nav_txt = self.style.nav.apply("[ < i > Move ↑ / ↓  | Page ← / → | Select -> Enter  < i > ]")
-        self.__setup_menu(page_size)
+class PageUtils:
+    NAV_TEXT: str = "[ < i > Move ↑ / ↓  | Page ← / → | Select -> Enter  < i > ]"
 
-    def __setup_menu(self, page_size: int) -> None:
-        self.page_size = page_size
-        self.total_pages = (len(self.options) + page_size - 1) // page_size
-        self._current_page = 1
+    @staticmethod
+    def get_page_options(paged_menu):
+        return paged_menu.pages.page(paged_menu._current_page)
 
-    @property
-    def current_page_options(self):
-        start = (self._current_page - 1) * self.page_size
-        end = start + self.page_size
-        return self.options[start : end]
+    @staticmethod
+    def page_label(paged_menu) -> str:
+        total = paged_menu.total_pages
+        return f'Page {paged_menu._current_page}/{"?" if total is None else total}'
+    
+    @staticmethod
+    def handle_paging(paged_menu, key) -> None:
+        '''
+            Flips pages on left / right (a / d), wrapping around at either end.
+            Sources of unknown length can't wrap backwards from the first page
+            since the last page isn't known yet.
+        '''
+        pages: PagedOptions = paged_menu.pages
+        if key.name == 'left' or key.name == 'a':
+            if paged_menu._current_page > 1:
+                paged_menu._current_page -= 1
+            elif pages.total_pages is not None:
+                paged_menu._current_page = pages.total_pages
 
-    def render(self) -> None:
-        Prompt.clear()
-        print(f'{self.prompt} - {self.nav_txt}')
-        for idx, option in enumerate(self.current_page_options):
-            self.render_routine(idx, option)
+        elif key.name == 'right' or key.name == 'd':
+            if pages.has_page(paged_menu._current_page + 1):
+                paged_menu._current_page += 1
+            else:
+                paged_menu._current_page = 1
 
-    def handle_keys(self, key: keyboard.KeyboardEvent) -> None:
-        super().handle_keys(key)
-        if key.name == 'left':
-            self._current_page = (self._current_page - 1) % self.total_pages or self.total_pages
-            
-        elif key.name == 'right':
-            self._current_page = (self._current_page + 1) % self.total_pages or 1 
-            
+        else:
+            return
 
-    def run(self):
-        super().run()
-        return self.current_page_options[self.highlight]
+        paged_menu.highlight = min(paged_menu.highlight, max(0, paged_menu.displayed_count() - 1))
 
-class PageUtils:
     @staticmethod
-    def get_page_options(paged_menu):
-        start = (paged_menu._current_page - 1) * paged_menu.page_size
-        end = start + paged_menu.page_size
-        return paged_menu.options[start:end]
-    
+    def create_pages(options, page_size: int, cache_pages: int) -> PagedOptions:
+        return PagedOptions(as_source(options), page_size, cache_pages)
+
     @staticmethod
-    def handle_paging(paged_menu, key):
-        if key.name == 'left':
-            paged_menu._current_page -= 1 
-            
-        elif key.name == 'right':
-            paged_menu._current_page += 1 
-    
-        
+    def show_index(paged_menu, idx: int) -> None:
+        paged_menu._current_page = idx // paged_menu.page_size + 1
+        paged_menu.highlight = idx % paged_menu.page_size
+
+    @staticmethod
+    def refresh(paged_menu) -> None:
+        '''
+            Re-reads the options after the source changed underneath the menu,
+            keeping the page and highlight where they were when they still exist.
+        '''
+        pages: PagedOptions = paged_menu.pages
+        pages.invalidate()
+        total = pages.total_pages
+        if total is not None and paged_menu._current_page > total:
+            paged_menu._current_page = total
+        paged_menu.highlight = min(paged_menu.highlight, max(0, paged_menu.displayed_count() - 1))
+        paged_menu.request_redraw()
+
     
 class SimplePagedMenu(SimpleMenu):
-    def __init__(self, options: list[str], prompt: str, page_size: int = 5, menu_style: MenuStyle = None) -> None:
+    SEARCHABLE = False
+
+    def __init__(self, options: list[str] | OptionSource, prompt: str, page_size: int = 5, menu_style: MenuStyle = None,
+    cache_pages: int = 8) -> None:
+        '''
+            A menu that shows its options a page at a time.
+
+            options can be a list, a generator or an OptionSource, pages are read
+            from it on demand so the first page shows without materializing the
+            rest. The cache_pages most recently visited pages are kept and the
+            next page is prefetched after each frame.
+        '''
         super().__init__(options, prompt, menu_style)
-        self.nav_txt = self.style.nav.apply("[ < i > Move ↑ / ↓  | Page ← / → | Select -> Enter  < i > ]")
-        self.__setup_menu(page_size)
+        self.nav_txt = self.style.nav.apply(PageUtils.NAV_TEXT)
+        self.__setup_menu(page_size, cache_pages)
 
-    def __setup_menu(self, page_size: int) -> None:
+    def __setup_menu(self, page_size: int, cache_pages: int) -> None:
         self.page_size = page_size
-        self.total_pages = (len(self.options) + page_size - 1 ) // page_size
+        self.pages: PagedOptions = PageUtils.create_pages(self.options, page_size, cache_pages)
         self._current_page = 1
 
+    @property
+    def total_pages(self) -> int:
+        return self.pages.total_pages
+
     @property
     def current_page_options(self):
         return PageUtils.get_page_options(self)
 
-    def render(self) -> None:
-        Prompt.clear()
-        print(f'{ self.prompt } - { self.nav_txt } | Page { self._current_page }/{ self.total_pages }')
+    def displayed_count(self) -> int:
+        return len(self.current_page_options)
+
+    def displayed_option(self, row: int):
+        return self.current_page_options[row]
+
+    def compose(self) -> Frame:
+        frame = Frame()
+        frame.append(f'{ self.prompt } - { self.nav_txt } | { PageUtils.page_label(self) }')
         for idx, option in enumerate(self.current_page_options):
-            self.render_routine(idx, option)
+            self.render_routine(idx, option, frame)
+        return frame
+
+    def render(self) -> None:
+        super().render()
+        self.pages.prefetch(self._current_page + 1)
 
-    def handle_keys(self, key: keyboard.KeyboardEvent) -> None:
+    def handle_keys(self, key: 'keyboard.KeyboardEvent') -> None:
         super().handle_keys(key)
-        if key.name == 'left' or key.name == 'a':
-            self._current_page = (self._current_page - 1) % self.total_pages or self.total_pages
-        elif key.name == 'right' or key.name == 'd':
-            self._current_page = (self._current_page + 1) % self.total_pages or 1
-        
+        PageUtils.handle_paging(self, key)
 
-    def run(self):
-        super().run()
-        return self.current_page_options[self.highlight]
-    
+    def option_source(self) -> OptionSource:
+        return self.pages.source
+
+    def show_index(self, idx: int) -> None:
+        PageUtils.show_index(self, idx)
+
+    def refresh_options(self) -> None:
+        '''
+            Call after the options source changed (new, removed or updated
+            rows), the current page is read again and redrawn.
+        '''
+        PageUtils.refresh(self)
 
 
 class ValuePagedMenu(ValueMenu):
-    def __init__(self, options: list[Option], prompt: str, page_size: int = 5, menu_style: MenuStyle = None) -> None:
+    SEARCHABLE = False
+
+    def __init__(self, options: list[Option] | OptionSource, prompt: str, page_size: int = 5, menu_style: MenuStyle = None,
+    cache_pages: int = 8) -> None:
+        '''
+            The paged version of ValueMenu, options are read the same way as
+            SimplePagedMenu.
+        '''
         super().__init__(options, prompt, menu_style)
-        self.nav_txt = self.style.nav.apply("[ < i > Move ↑ / ↓  | Page ← / → | Select -> Enter  < i > ]")
-        self.__setup_menu(page_size)
+        self.nav_txt = self.style.nav.apply(PageUtils.NAV_TEXT)
+        self.__setup_menu(page_size, cache_pages)
 
-    def __setup_menu(self, page_size: int) -> None:
+    def __setup_menu(self, page_size: int, cache_pages: int) -> None:
         self.page_size = page_size
-        self.total_pages = (len(self.options) + self.page_size - 1) // self.page_size
+        self.pages: PagedOptions = PageUtils.create_pages(self.options, page_size, cache_pages)
         self._current_page = 1
+
+    @property
+    def total_pages(self) -> int:
+        return self.pages.total_pages
     
     @property
     def current_page(self) -> int:
@@ -267,10 +575,11 @@ class ValuePagedMenu(ValueMenu):
         ''''
             Allows the current page to bounce on first and last 
         '''
+        total = self.total_pages
         if value < 1:
-            self._current_page = self.total_pages
+            self._current_page = total or 1
 
-        elif value > self.total_pages:
+        elif not self.pages.has_page(value):
             self._current_page = 1
 
         else:
@@ -282,22 +591,51 @@ class ValuePagedMenu(ValueMenu):
     def current_page_options(self):
         return PageUtils.get_page_options(self)
 
-    def render(self) -> None:
-        Prompt.clear()
-        print(f'{self.prompt} - {self.nav_txt} | Page {self._current_page}/{self.total_pages}')
+    def displayed_count(self) -> int:
+        return len(self.current_page_options)
+
+    def displayed_option(self, row: int) -> Option:
+        return self.current_page_options[row]
+
+    def compose(self) -> Frame:
+        frame = Frame()
+        frame.append(f'{self.prompt} - {self.nav_txt} | {PageUtils.page_label(self)}')
         for idx, option in enumerate(self.current_page_options):
-            self.render_routine(idx, option)
+            self.render_routine(idx, option, frame)
+        return frame
 
-    def handle_keys(self, key: keyboard.KeyboardEvent) -> None:
+    def render(self) -> None:
+        super().render()
+        self.pages.prefetch(self._current_page + 1)
+
+    def handle_keys(self, key: 'keyboard.KeyboardEvent') -> None:
         super().handle_keys(key)
-        if key.name == 'left' or key.name == 'a':
-            self._current_page = (self._current_page - 1) % self.total_pages
-        elif key.name == 'right' or key.name == 'd':
-            self._current_page = (self._current_page + 1) % self.total_pages
+        PageUtils.handle_paging(self, key)
 
-    def run(self):
-        super().run()
-        return self.get_choice
+    def add_option(self, option: Option) -> None:
+        super().add_option(option)
+        self.pages.invalidate()
+
+    def option_source(self) -> OptionSource:
+        return self.pages.source
+
+    def show_index(self, idx: int) -> None:
+        PageUtils.show_index(self, idx)
+
+    def refresh_options(self) -> None:
+        '''
+            Call after the options source changed (new, removed or updated
+            rows), the current page is read again and redrawn.
+        '''
+        PageUtils.refresh(self)
+
+    def run(self, choice: str = None):
+        super().run(choice)
+        return self.get_choice()
+
+    async def arun(self, choice: str = None):
+        await super().arun(choice)
+        return self.get_choice()
 
 
 class Animal:
@@ -351,8 +689,7 @@ def value_paged_menu():
     animals = [Animal('Dog', 'Woof'), Animal('Cat', 'Meow'), Animal('Cow', 'Moo')]
     options = [Option('animal', animal) for animal in animals]
     menu = ValuePagedMenu(options, 'Select an animal', 2)
-    menu.run()
-    animal = menu.get_choice
+    animal = menu.run()
     animal.speak()
 
     
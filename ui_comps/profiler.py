@@ -0,0 +1,280 @@
+import atexit
+import functools
+import os
+import sys
+import time
+from collections import deque
+from typing import Callable, NamedTuple
+
+from terminal import AnsiConsole, encoded_length
+
+
+class FrameRecord(NamedTuple):
+    '''
+        Timings of one drawn frame, durations in seconds.
+    '''
+    component: str
+    start: float
+    compose: float
+    style: float
+    write: float
+    bytes_written: int
+    rows: int
+    latency: float
+
+
+class FrameProfiler:
+    '''
+        Opt-in per-frame timings for the UI components.
+
+        Components check the enabled flag before doing any measuring, so a
+        disabled profiler costs one attribute lookup per frame. When enabled each
+        frame records how long composing, styling and writing took, the bytes
+        written, the rows repainted and the time from the oldest unpainted key
+        press to the end of the frame (input-to-paint latency).
+
+        Compose time excludes the styling done while composing. Records are kept
+        in a bounded ring and can be read back as a summary() or written as a
+        Chrome trace (chrome://tracing, Perfetto) with write_trace().
+
+        Setting UI_COMPS_PROFILE enables the profiler at import. A value ending in
+        '.json' is where the trace is written at exit, any other value prints a
+        summary to stderr at exit.
+    '''
+    ENV_VAR: str = 'UI_COMPS_PROFILE'
+    PHASES: tuple[str] = ('compose', 'style', 'write')
+
+    enabled: bool = False
+    clock: Callable[[], float] = time.perf_counter
+
+    _records: deque = deque(maxlen=10_000)
+    _phases: dict[str, float] = {}
+    _input_at: float = None
+    _pending_bytes: int = 0
+    _summary_every: float = None
+    _last_summary: float = 0.0
+    _sink = None
+
+    @staticmethod
+    def enable(max_frames: int = 10_000, summary_every: float = None, sink=None) -> None:
+        '''
+            o	max_frames (int, optional): how many of the latest frames to keep
+
+            o	summary_every (float, optional): print a summary to sink every
+                this many seconds while frames are drawn
+
+            o	sink (optional): stream for the periodic summary, defaults to stderr
+        '''
+        FrameProfiler._records = deque(FrameProfiler._records, maxlen=max_frames)
+        FrameProfiler._summary_every = summary_every
+        FrameProfiler._sink = sink
+        FrameProfiler._last_summary = FrameProfiler.clock()
+        FrameProfiler.enabled = True
+
+    @staticmethod
+    def disable() -> None:
+        FrameProfiler.enabled = False
+
+    @staticmethod
+    def reset() -> None:
+        FrameProfiler._records.clear()
+        FrameProfiler._phases.clear()
+        FrameProfiler._input_at = None
+        FrameProfiler._pending_bytes = 0
+
+    @staticmethod
+    def input_received(event=None) -> None:
+        '''
+            Notes a key press, latency is measured from the first key that
+            hasn't been painted yet. Uses the event's own timestamp when it has one.
+        '''
+        if FrameProfiler._input_at is None:
+            stamp = getattr(event, 'time', None)
+            now = FrameProfiler.clock()
+            # keyboard stamps events with time.time(), carry that over to the profiler's clock
+            FrameProfiler._input_at = now - max(0.0, time.time() - stamp) if stamp else now
+
+    @staticmethod
+    def discard_input() -> None:
+        '''
+            Forgets unpainted input, called when a UI loop exits on a key.
+        '''
+        FrameProfiler._input_at = None
+
+    @staticmethod
+    def add_phase(phase: str, started: float) -> None:
+        '''
+            Adds the time since started to phase for the frame being drawn.
+        '''
+        phases = FrameProfiler._phases
+        phases[phase] = phases.get(phase, 0.0) + FrameProfiler.clock() - started
+
+    @staticmethod
+    def record(component: str, start: float, compose: float, write: float, bytes_written: int = 0,
+        rows: int = 0, painted: bool = True) -> None:
+        '''
+            Files a finished frame. compose and write are the wall times of those
+            phases, styling added with add_phase('style', ...) is split out of compose.
+            Only painted frames (screen redraws) settle the pending input latency.
+        '''
+        end = FrameProfiler.clock()
+        phases = FrameProfiler._phases
+        style = phases.pop('style', 0.0)
+        write += phases.pop('write', 0.0)
+        phases.clear()
+
+        latency = None
+        if painted and FrameProfiler._input_at is not None:
+            latency = end - FrameProfiler._input_at
+            FrameProfiler._input_at = None
+
+        FrameProfiler._records.append(
+            FrameRecord(component, start, max(0.0, compose - style), style, write, bytes_written, rows, latency)
+        )
+
+        every = FrameProfiler._summary_every
+        if every is not None and end - FrameProfiler._last_summary >= every:
+            FrameProfiler._last_summary = end
+            FrameProfiler.print_summary(FrameProfiler._sink)
+
+    @staticmethod
+    def profile_frame(component: str, compose: Callable[[], object], screen) -> None:
+        '''
+            Composes a frame and draws it through a ScreenBuffer, timing both.
+        '''
+        clock = FrameProfiler.clock
+        start = clock()
+        frame = compose()
+        composed = clock()
+        rows = screen.draw(frame)
+        FrameProfiler.record(component, start, composed - start, clock() - composed, screen.bytes_written, rows)
+
+    @staticmethod
+    def profiled(component: str) -> Callable:
+        '''
+            Decorator for output helpers that style and print in one call (the
+            Prompt helpers). Time spent in write_output() is the write phase and
+            the rest of the call is styling.
+        '''
+        def wrap(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def call(*args, **kwargs):
+                if not FrameProfiler.enabled:
+                    return func(*args, **kwargs)
+                start = FrameProfiler.clock()
+                result = func(*args, **kwargs)
+                total = FrameProfiler.clock() - start
+
+                phases = FrameProfiler._phases
+                written = phases.pop('write', 0.0)
+                phases['style'] = total - written
+                size, FrameProfiler._pending_bytes = FrameProfiler._pending_bytes, 0
+                FrameProfiler.record(component, start, total - written, written, size, painted=False)
+                return result
+            return call
+        return wrap
+
+    @staticmethod
+    def write_output(text: str, stream=None, end: str = '\n') -> None:
+        '''
+            Prints text, timed as the write phase when profiling.
+        '''
+        if stream is None:
+            # colorama's wrapper, on the legacy consoles that need it, is set up by the first write
+            AnsiConsole.enable()
+            stream = sys.stdout
+        if not FrameProfiler.enabled:
+            print(text, file=stream, end=end, flush=not end)
+            return
+        started = FrameProfiler.clock()
+        print(text, file=stream, end=end, flush=not end)
+        FrameProfiler.add_phase('write', started)
+        FrameProfiler._pending_bytes += encoded_length(text + end, stream)
+
+    @staticmethod
+    def records() -> list[FrameRecord]:
+        return list(FrameProfiler._records)
+
+    @staticmethod
+    def summary() -> dict[str, dict]:
+        '''
+            Per component: frame count, p50 / p95 / max of every phase and of the
+            latency in milliseconds, and bytes written per frame.
+        '''
+        def percentiles(values: list[float]) -> dict[str, float]:
+            if not values:
+                return {}
+            values = sorted(values)
+            last = len(values) - 1
+            return {
+                'p50': round(values[last // 2] * 1e3, 3),
+                'p95': round(values[round(last * 0.95)] * 1e3, 3),
+                'max': round(values[last] * 1e3, 3),
+            }
+
+        grouped: dict[str, list[FrameRecord]] = {}
+        for record in FrameProfiler._records:
+            grouped.setdefault(record.component, []).append(record)
+
+        out = {}
+        for component, records in grouped.items():
+            out[component] = {
+                'frames': len(records),
+                **{phase: percentiles([getattr(r, phase) for r in records]) for phase in FrameProfiler.PHASES},
+                'total': percentiles([r.compose + r.style + r.write for r in records]),
+                'latency': percentiles([r.latency for r in records if r.latency is not None]),
+                'bytes_per_frame': round(sum(r.bytes_written for r in records) / len(records), 1),
+            }
+        return out
+
+    @staticmethod
+    def print_summary(stream=None) -> None:
+        stream = stream or sys.stderr
+        for component, stats in FrameProfiler.summary().items():
+            phases = '  '.join(
+                f'{phase} {stats[phase].get("p50", 0):.2f}/{stats[phase].get("p95", 0):.2f}ms'
+                for phase in (*FrameProfiler.PHASES, 'total')
+            )
+            latency = stats['latency']
+            latency = f'  latency {latency["p50"]:.2f}/{latency["p95"]:.2f}ms' if latency else ''
+            stream.write(f'[profile] {component} (p50/p95): {stats["frames"]} frames  {phases}{latency}  '
+                f'{stats["bytes_per_frame"]:.0f} B/frame\n')
+        stream.flush()
+
+    @staticmethod
+    def write_trace(path: str) -> None:
+        '''
+            Writes the recorded frames in the Chrome trace event format, one
+            complete event per phase with the bytes, rows and latency as arguments.
+        '''
+        import json
+        events = []
+        for record in FrameProfiler._records:
+            at = record.start * 1e6
+            args = {'bytes': record.bytes_written, 'rows': record.rows}
+            if record.latency is not None:
+                args['latency_ms'] = round(record.latency * 1e3, 3)
+            events.append({'name': 'frame', 'cat': record.component, 'ph': 'X', 'ts': at, 'pid': 1,
+                'tid': record.component, 'dur': (record.compose + record.style + record.write) * 1e6, 'args': args})
+            for phase in FrameProfiler.PHASES:
+                duration = getattr(record, phase) * 1e6
+                events.append({'name': phase, 'cat': record.component, 'ph': 'X', 'ts': at, 'pid': 1,
+                    'tid': record.component, 'dur': duration})
+                at += duration
+
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
+
+
+def _enable_from_environment() -> None:
+    target = os.environ.get(FrameProfiler.ENV_VAR)
+    if not target or target == '0':
+        return
+    FrameProfiler.enable()
+    if target.endswith('.json'):
+        atexit.register(FrameProfiler.write_trace, target)
+    else:
+        atexit.register(FrameProfiler.print_summary)
+
+
+_enable_from_environment()
@@ -1,6 +1,9 @@
 from colorify import ConsoleStencil
+from terminal import HeadlessMode, TerminalGeometry
+from profiler import FrameProfiler
 import time 
 import os 
+import sys
 
 
 # unicode symbols
@@ -20,8 +23,9 @@ class PromptUtils:
 
     @staticmethod
     def center_str(msg: str) -> None:
-        cols = os.get_terminal_size().columns
-        return msg.center(cols, " ")
+        if HeadlessMode.active():
+            return msg
+        return msg.center(TerminalGeometry.columns(), " ")
     
     @staticmethod
     def detr_center(flag: bool, msg: str) -> str:
@@ -31,27 +35,43 @@ class PromptUtils:
     
     @staticmethod
     def divider(sep: str) -> None:
-        cols = os.get_terminal_size().columns
-        return sep * cols
+        return sep * TerminalGeometry.columns()
     
 class Prompt:
     GEN_SPACER: dict[str, str] = { 'ansi' : 'bold', 'style' : 'bright' }
     GEN_PROMPT: dict[str, str] = { 'ansi' : 'italic', 'style' : 'bright' }
+
+    @staticmethod
+    def plain(tag: str, msg: str) -> None:
+        '''
+            The headless form of every prompt, one unstyled line per message.
+            They go to stderr, so stdout carries only what the job produces.
+        '''
+        FrameProfiler.write_output(f'[ {tag} ] {msg}', sys.stderr)
     
     @staticmethod
+    @FrameProfiler.profiled('prompt.info')
     def info(msg: str, should_center: bool = True) -> None:
+        if HeadlessMode.active():
+            return Prompt.plain('i', msg)
         spacer = ConsoleStencil.multi_style('[ i ]', **Prompt.GEN_SPACER)
         msg = ConsoleStencil.multi_style(msg, **Prompt.GEN_PROMPT)
-        print(PromptUtils.detr_center(should_center, f'\n{spacer} {msg} {spacer}\n'))
+        FrameProfiler.write_output(PromptUtils.detr_center(should_center, f'\n{spacer} {msg} {spacer}\n'))
     
     @staticmethod
+    @FrameProfiler.profiled('prompt.success')
     def success(msg: str, should_center: bool = True) -> None:
+        if HeadlessMode.active():
+            return Prompt.plain('✓', msg)
         spacer = ConsoleStencil.multi_style('[ ✓ ]', fg_color='green', ansi='bold', style='bright')
         msg = ConsoleStencil.multi_style(msg, **Prompt.GEN_PROMPT)
-        print(PromptUtils.detr_center(should_center, f'\n{spacer} {msg} {spacer}\n'))
+        FrameProfiler.write_output(PromptUtils.detr_center(should_center, f'\n{spacer} {msg} {spacer}\n'))
     
     @staticmethod
     def wait():
+        # a batch job has nobody to press enter
+        if HeadlessMode.active():
+            return
         spacer = ConsoleStencil.multi_style('[ * ]', **Prompt.GEN_SPACER)
         styled_msg = ConsoleStencil.multi_style('Press < ENTER > to Continue...', **Prompt.GEN_PROMPT)
         centered_msg = PromptUtils.center_str(f'\n{spacer} { styled_msg } {spacer}\n')
@@ -60,34 +80,69 @@ class Prompt:
         )
 
     @staticmethod
+    @FrameProfiler.profiled('prompt.error')
     def error(msg: str, should_center: bool = True) -> None:
+        if HeadlessMode.active():
+            return Prompt.plain('!', f'ERROR: {msg}')
         spacer = ConsoleStencil.multi_style('[ ! ]', fg_color='red', ansi='bold', style='bright')
         msg = ConsoleStencil.multi_style(msg, **Prompt.GEN_PROMPT)
-        print(PromptUtils.detr_center(should_center, f'\n{ spacer } ERROR: { msg } { spacer }\n'))
+        FrameProfiler.write_output(PromptUtils.detr_center(should_center, f'\n{ spacer } ERROR: { msg } { spacer }\n'))
     
     @staticmethod
+    @FrameProfiler.profiled('prompt.ask')
     def ask(prompt: str, should_center: bool = True):
+        if HeadlessMode.active():
+            return Prompt.plain('?', prompt)
         spacer = ConsoleStencil.multi_style('[ ? ]', fg_color='yellow', ansi='bold', style='bright')
         msg = ConsoleStencil.multi_style(prompt, **Prompt.GEN_PROMPT)
-        print(PromptUtils.detr_center(should_center, f'\n{ spacer } { msg } { spacer }\n'))
+        FrameProfiler.write_output(PromptUtils.detr_center(should_center, f'\n{ spacer } { msg } { spacer }\n'))
     
+    @staticmethod
+    @FrameProfiler.profiled('prompt.progress')
+    def progress(done: int, total: int, label: str = 'Working', unit: str = '') -> None:
+        '''
+            Draws a progress bar on the current line, call again to move it
+            along, the line ends once done reaches total. Headless runs print
+            one plain line per call instead.
+
+            o	unit (str, optional): what done and total count, shown after them
+        '''
+        fraction = min(1.0, done / total) if total else 1.0
+        counts = f'{fraction:4.0%}  {done:,} / {total:,}' + (f' {unit}' if unit else '')
+        if HeadlessMode.active():
+            return Prompt.plain('~', f'{label} {counts}')
+        width = max(10, TerminalGeometry.columns() - len(label) - len(counts) - 16)
+        spacer = ConsoleStencil.multi_style('[ ~ ]', **Prompt.GEN_SPACER)
+        bar = ConsoleStencil.progress_bar(fraction, width)
+        FrameProfiler.write_output(f'\r{spacer} {label} {bar} {counts}', end='\n' if fraction >= 1.0 else '')
+
     @staticmethod
     def promptify(prompt: str) -> str:
+        if HeadlessMode.active():
+            return f'[ ? ] {prompt} [ ? ]'
         spacer = ConsoleStencil.multi_style('[ ? ]', ansi='bold', style='bright')
         return f'{spacer} {prompt} {spacer}'
         
-    @staticmethod 
+    @staticmethod
+    @FrameProfiler.profiled('prompt.print_line')
     def print_line(sep: str = '*') -> None:
-        print(PromptUtils.divider(sep))
+        FrameProfiler.write_output(PromptUtils.divider(sep))
     
     @staticmethod
     def divider(sep: str) -> None:
-        cols = os.get_terminal_size().columns
-        return sep * cols
+        return sep * TerminalGeometry.columns()
     
     @staticmethod
+    @FrameProfiler.profiled('prompt.clear')
     def clear() -> None:
+        if HeadlessMode.active():
+            return
+        if not FrameProfiler.enabled:
+            os.system('cls' if os.name == 'nt' else 'clear')
+            return
+        started = FrameProfiler.clock()
         os.system('cls' if os.name == 'nt' else 'clear')
+        FrameProfiler.add_phase('write', started)
     
 
 def prompt_demo():
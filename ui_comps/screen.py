@@ -0,0 +1,180 @@
+import sys
+from terminal import AnsiConsole, TerminalGeometry, encoded_length
+
+
+class Cursor:
+    """
+        ANSI cursor addressing and erase sequences used by the ScreenBuffer.
+    """
+    HOME: str = '\033[H'
+    CLEAR_SCREEN: str = '\033[2J'
+    CLEAR_LINE: str = '\033[2K'
+
+    @staticmethod
+    def move(row: int, col: int = 1) -> str:
+        '''
+            Moves the cursor to the 1-based row and column.
+        '''
+        return f'\033[{row};{col}H'
+
+
+class Frame:
+    def __init__(self) -> None:
+        '''
+            An in-memory buffer that components append rows into while a frame
+            is being composed, nothing reaches the terminal until the frame is
+            handed to a ScreenBuffer or a TerminalWriter.
+        '''
+        self.rows: list[str] = []
+
+    def append(self, row: str) -> None:
+        self.rows.append(row)
+
+    def extend(self, rows) -> None:
+        self.rows.extend(rows)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def text(self) -> str:
+        return '\n'.join(self.rows)
+
+
+class TerminalWriter:
+    # Terminals that interpret ANSI escapes themselves and don't need colorama's conversion
+    ANSI_NATIVE: bool = AnsiConsole.NATIVE
+
+    def __init__(self, stream=None, raw: bool = None) -> None:
+        '''
+            Collects output pieces and sends them to the terminal with a single
+            write and a single flush.
+
+            o	stream (optional): target stream, defaults to sys.stdout
+
+            o	raw (bool, optional): write to the interpreter's original stdout and
+                skip colorama's wrapper, defaults to True on terminals that handle
+                ANSI natively. Ignored when a stream is given.
+        '''
+        self.stream = stream
+        self.raw: bool = TerminalWriter.ANSI_NATIVE if raw is None else raw
+        self._pieces: list[str] = []
+
+    def target(self):
+        if self.stream is not None:
+            return self.stream
+        if self.raw and sys.__stdout__ is not None:
+            return sys.__stdout__
+        AnsiConsole.enable()
+        return sys.stdout
+
+    def write(self, text: str) -> None:
+        self._pieces.append(text)
+
+    def write_frame(self, frame: Frame) -> int:
+        '''
+            Writes a whole frame below the cursor in one write, for output
+            that isn't redrawn in place.
+        '''
+        self._pieces.append(frame.text() + '\n')
+        return self.flush()
+
+    def flush(self) -> int:
+        '''
+            Writes everything collected since the last flush, returns the
+            number of bytes written.
+        '''
+        if not self._pieces:
+            return 0
+        out = ''.join(self._pieces)
+        self._pieces.clear()
+        stream = self.target()
+        stream.write(out)
+        stream.flush()
+        return encoded_length(out, stream)
+
+
+class ScreenBuffer:
+    def __init__(self, stream=None, raw: bool = None) -> None:
+        '''
+            Keeps the last frame written to the terminal and repaints only
+            the rows that changed since then using cursor addressing, instead
+            of clearing the screen and reprinting everything.
+
+            A frame is a Frame or a list of strings, one per terminal row. Entries
+            that contain new lines are split into several rows. The changed rows are
+            composed in memory and written with one write and one flush per frame.
+
+            o	stream (optional): where frames are written, defaults to sys.stdout
+
+            o	raw (bool, optional): bypass colorama's stdout wrapper, see TerminalWriter
+        '''
+        self.writer: TerminalWriter = TerminalWriter(stream, raw)
+        self._frame: list[str] = []
+        self._full_repaint: bool = True
+        self._generation: int = TerminalGeometry.generation
+        self.bytes_written: int = 0
+
+    @property
+    def stream(self):
+        return self.writer.stream
+
+    @stream.setter
+    def stream(self, stream) -> None:
+        self.writer.stream = stream
+
+    def invalidate(self) -> None:
+        '''
+            Forces the next draw to clear the screen and repaint every row,
+            use when something other than the buffer wrote to the terminal.
+        '''
+        self._full_repaint = True
+
+    @staticmethod
+    def split_rows(lines: list[str]) -> list[str]:
+        rows = []
+        for line in lines:
+            if '\n' in line:
+                rows.extend(line.split('\n'))
+            else:
+                rows.append(line)
+        return rows
+
+    def draw(self, lines) -> int:
+        '''
+            Writes the rows of the frame that differ from the previous one
+            and leaves the cursor on the row below the frame.
+
+            Returns the number of rows that were repainted.
+        '''
+        stream = self.writer
+        rows = ScreenBuffer.split_rows(lines)
+        previous = self._frame
+
+        if self._generation != TerminalGeometry.generation:
+            # rows wrap differently after a resize, the old frame can't be diffed against
+            self._generation = TerminalGeometry.generation
+            self._full_repaint = True
+
+        if self._full_repaint:
+            stream.write(Cursor.CLEAR_SCREEN + Cursor.HOME)
+            previous = []
+            self._full_repaint = False
+
+        changed = 0
+        for idx, row in enumerate(rows):
+            if idx < len(previous) and previous[idx] == row:
+                continue
+            stream.write(f'{Cursor.move(idx + 1)}{Cursor.CLEAR_LINE}{row}')
+            changed += 1
+
+        for idx in range(len(rows), len(previous)):
+            stream.write(f'{Cursor.move(idx + 1)}{Cursor.CLEAR_LINE}')
+            changed += 1
+
+        stream.write(Cursor.move(len(rows) + 1))
+        self.bytes_written = stream.flush()
+        self._frame = rows
+        return changed
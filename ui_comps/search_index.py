@@ -0,0 +1,132 @@
+import time
+from typing import Iterable
+
+
+class TrigramIndex:
+    def __init__(self, titles: Iterable[str]) -> None:
+        '''
+            A case-insensitive substring index over option titles, built once.
+
+            Every title is broken into its three-character substrings (trigrams)
+            and each trigram maps to the ids of the titles containing it. A query
+            of three or more characters only has to check the titles listed under
+            its rarest trigram instead of every title.
+        '''
+        self.titles: list[str] = [title.lower() for title in titles]
+        self._postings: dict[str, list[int]] = {}
+        for idx, title in enumerate(self.titles):
+            for gram in {title[i:i + 3] for i in range(len(title) - 2)}:
+                posting = self._postings.get(gram)
+                if posting is None:
+                    self._postings[gram] = [idx]
+                else:
+                    posting.append(idx)
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def candidates(self, query: str) -> list[int]:
+        '''
+            Ids of the titles that may contain the lowercase query, ascending.
+            Queries shorter than a trigram can't be narrowed and return every id.
+        '''
+        if len(query) < 3:
+            return range(len(self.titles))
+
+        smallest = None
+        for i in range(len(query) - 2):
+            posting = self._postings.get(query[i:i + 3])
+            if posting is None:
+                return []
+            if smallest is None or len(posting) < len(smallest):
+                smallest = posting
+        return smallest
+
+    def search(self, query: str, within: Iterable[int] = None) -> list[int]:
+        '''
+            Ids of the titles containing query, ascending. Pass within to only
+            check a previous result set.
+        '''
+        query = query.lower()
+        titles = self.titles
+        if within is None:
+            within = self.candidates(query)
+        return [idx for idx in within if query in titles[idx]]
+
+
+class IncrementalFilter:
+    def __init__(self, index: TrigramIndex) -> None:
+        '''
+            Type-to-filter state over a TrigramIndex.
+
+            Results are kept for every query typed so far. Typing another
+            character only re-checks the previous results (a title containing
+            'inbo' must already contain 'inb'), and backspacing pops back to a
+            result that was already computed.
+        '''
+        self.index: TrigramIndex = index
+        self._history: list[tuple[str, list[int]]] = []
+
+    @property
+    def query(self) -> str:
+        return self._history[-1][0] if self._history else ''
+
+    def update(self, query: str) -> list[int]:
+        '''
+            Returns the ids of the titles that contain query.
+        '''
+        query = query.lower()
+        while self._history and not query.startswith(self._history[-1][0]):
+            self._history.pop()
+
+        if self._history and self._history[-1][0] == query:
+            return self._history[-1][1]
+
+        if not query:
+            return range(len(self.index))
+
+        previous = self._history[-1][1] if self._history else None
+        candidates = self.index.candidates(query)
+        if previous is None or len(candidates) < len(previous):
+            matches = self.index.search(query, candidates)
+        else:
+            matches = self.index.search(query, previous)
+
+        self._history.append((query, matches))
+        return matches
+
+    def reset(self) -> None:
+        self._history.clear()
+
+
+def filter_benchmark(count: int = 100_000, query: str = 'inbox re: q3') -> None:
+    '''
+        Types query one character at a time against count random titles and
+        reports the worst per-keystroke latency against a 60 fps frame budget.
+    '''
+    import random
+    import string
+    rng = random.Random(7)
+    words = ['inbox', 'archive', 're:', 'fwd:', 'q3', 'report', 'invoice', 'meeting', 'notes', 'team']
+    titles = [
+        ' '.join(rng.choice(words) for _ in range(3)) + ' ' + ''.join(rng.choices(string.ascii_lowercase, k=6))
+        for _ in range(count)
+    ]
+
+    start = time.perf_counter()
+    finder = IncrementalFilter(TrigramIndex(titles))
+    print(f'index build       : {(time.perf_counter() - start) * 1e3:8.1f} ms for {count} titles')
+
+    worst = 0.0
+    for end in range(1, len(query) + 1):
+        start = time.perf_counter()
+        matches = finder.update(query[:end])
+        worst = max(worst, time.perf_counter() - start)
+        print(f'{query[:end]!r:16}  : {len(matches):7} matches')
+
+    budget = 1 / 60
+    print(f'worst keystroke   : {worst * 1e3:8.2f} ms ({"within" if worst < budget else "OVER"} the {budget * 1e3:.1f} ms frame)')
+
+
+if __name__ == '__main__':
+    filter_benchmark()
@@ -0,0 +1,167 @@
+import threading
+from collections import OrderedDict
+from typing import Iterable
+
+
+class OptionSource:
+    '''
+        The protocol the paged menus read their options through.
+
+        A source only has to hand out a slice of options on demand with fetch(),
+        its length may be unknown (None) until it has been read to the end.
+        Sources can be indexed and sliced like a list.
+    '''
+
+    @property
+    def length(self) -> int:
+        return None
+
+    def fetch(self, start: int, stop: int) -> list:
+        '''
+            Returns the options in [start, stop), fewer if the source ends first.
+        '''
+        raise NotImplementedError
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            if key.step not in (None, 1) or key.start is not None and key.start < 0 \
+                    or key.stop is None or key.stop < 0:
+                raise ValueError('Option sources only support forward slices with an explicit stop')
+            return self.fetch(key.start or 0, key.stop)
+
+        items = self.fetch(key, key + 1)
+        if not items:
+            raise IndexError(key)
+        return items[0]
+
+
+class SequenceSource(OptionSource):
+    def __init__(self, options) -> None:
+        '''
+            Wraps a list (or any sized, sliceable sequence) of options, changes
+            to the list are visible through the source.
+        '''
+        self.options = options
+
+    @property
+    def length(self) -> int:
+        return len(self.options)
+
+    def fetch(self, start: int, stop: int) -> list:
+        return list(self.options[start:stop])
+
+
+class IterableSource(OptionSource):
+    def __init__(self, options: Iterable) -> None:
+        '''
+            Wraps a generator or any other iterable of unknown length, options
+            are pulled from it only as far as the furthest page requested.
+        '''
+        self._iterator = iter(options)
+        self._items: list = []
+        self._exhausted: bool = False
+
+    @property
+    def length(self) -> int:
+        return len(self._items) if self._exhausted else None
+
+    def fetch(self, start: int, stop: int) -> list:
+        while not self._exhausted and len(self._items) < stop:
+            try:
+                self._items.append(next(self._iterator))
+            except StopIteration:
+                self._exhausted = True
+        return self._items[start:stop]
+
+
+def as_source(options) -> OptionSource:
+    if isinstance(options, OptionSource):
+        return options
+    if hasattr(options, '__len__') and hasattr(options, '__getitem__'):
+        return SequenceSource(options)
+    return IterableSource(options)
+
+
+class PagedOptions:
+    def __init__(self, source: OptionSource, page_size: int, cache_pages: int = 8) -> None:
+        '''
+            Reads an OptionSource a page at a time for the paged menus.
+
+            Pages are fetched on demand and kept in a bounded LRU of the most
+            recently visited pages. prefetch() loads a page on a background thread
+            so flipping forward doesn't wait on the source.
+
+            o	source (OptionSource): where the options come from, see as_source()
+
+            o	page_size (int): options per page
+
+            o	cache_pages (int, optional): how many pages to keep cached
+        '''
+        self.source: OptionSource = source
+        self.page_size: int = page_size
+        self.cache_pages: int = max(1, cache_pages)
+        self._pages: OrderedDict[int, list] = OrderedDict()
+        self._lock = threading.Lock()
+        self._prefetching: bool = False
+
+    @property
+    def total_pages(self) -> int:
+        '''
+            Number of pages, None while the source length is unknown.
+        '''
+        length = self.source.length
+        if length is None:
+            return None
+        return max(1, (length + self.page_size - 1) // self.page_size)
+
+    def page(self, number: int) -> list:
+        '''
+            Returns the options on the 1-based page number.
+        '''
+        with self._lock:
+            options = self._pages.get(number)
+            if options is not None:
+                self._pages.move_to_end(number)
+                return options
+
+            start = (number - 1) * self.page_size
+            options = self.source.fetch(start, start + self.page_size)
+            self._pages[number] = options
+            if len(self._pages) > self.cache_pages:
+                self._pages.popitem(last=False)
+            return options
+
+    def has_page(self, number: int) -> bool:
+        if number < 1:
+            return False
+        total = self.total_pages
+        if total is not None:
+            return number <= total
+        return len(self.page(number)) > 0
+
+    def prefetch(self, number: int) -> None:
+        # checked first so a frame never waits on the lock a running prefetch holds
+        if self._prefetching:
+            return
+        total = self.total_pages
+        if number < 1 or total is not None and number > total:
+            return
+        with self._lock:
+            if number in self._pages:
+                return
+            self._prefetching = True
+
+        def load() -> None:
+            try:
+                self.page(number)
+            finally:
+                self._prefetching = False
+
+        threading.Thread(target=load, daemon=True).start()
+
+    def invalidate(self) -> None:
+        '''
+            Drops the cached pages, call after the underlying options change.
+        '''
+        with self._lock:
+            self._pages.clear()
@@ -0,0 +1,189 @@
+import os
+import signal
+import sys
+from typing import Callable
+
+
+class TerminalGeometry:
+    '''
+        A shared cache of the terminal size.
+
+        The size is queried once and then refreshed only when the terminal
+        reports a resize (SIGWINCH) or, on platforms without that signal, when
+        poll() is called explicitly. Components read columns() / lines() from here
+        instead of calling os.get_terminal_size() themselves.
+
+        generation is bumped on every size change so callers can tell that
+        anything they derived from the old size is stale.
+    '''
+    FALLBACK: os.terminal_size = os.terminal_size((80, 24))
+
+    _size: os.terminal_size = None
+    _listeners: list[Callable[[os.terminal_size], None]] = []
+    _watching: bool = False
+    generation: int = 0
+
+    @staticmethod
+    def query() -> os.terminal_size:
+        try:
+            return os.get_terminal_size(sys.__stdout__.fileno())
+        except (AttributeError, ValueError, OSError):
+            import shutil
+            return shutil.get_terminal_size(TerminalGeometry.FALLBACK)
+
+    @staticmethod
+    def size() -> os.terminal_size:
+        if TerminalGeometry._size is None:
+            if HeadlessMode.active():
+                # nothing to measure, output goes to a file or a pipe
+                TerminalGeometry._size = TerminalGeometry.FALLBACK
+                return TerminalGeometry._size
+            TerminalGeometry._size = TerminalGeometry.query()
+            TerminalGeometry.watch()
+        return TerminalGeometry._size
+
+    @staticmethod
+    def columns() -> int:
+        return (TerminalGeometry._size or TerminalGeometry.size()).columns
+
+    @staticmethod
+    def lines() -> int:
+        return (TerminalGeometry._size or TerminalGeometry.size()).lines
+
+    @staticmethod
+    def poll() -> bool:
+        '''
+            Re-queries the terminal and notifies listeners if the size changed.
+            Returns True when it did.
+        '''
+        size = TerminalGeometry.query()
+        if size == TerminalGeometry._size:
+            return False
+
+        TerminalGeometry._size = size
+        TerminalGeometry.generation += 1
+        for listener in list(TerminalGeometry._listeners):
+            listener(size)
+        return True
+
+    @staticmethod
+    def refresh() -> None:
+        '''
+            Polls only when resize signals aren't available, call once per
+            input event from UI loops.
+        '''
+        if not TerminalGeometry._watching and not HeadlessMode.active():
+            TerminalGeometry.poll()
+
+    @staticmethod
+    def watch() -> bool:
+        '''
+            Installs the SIGWINCH handler, chaining any handler that was already
+            set. Returns False when the platform or the calling thread can't
+            receive the signal, in which case refresh() falls back to polling.
+        '''
+        if TerminalGeometry._watching:
+            return True
+
+        if not hasattr(signal, 'SIGWINCH'):
+            return False
+
+        try:
+            previous = signal.getsignal(signal.SIGWINCH)
+
+            def on_resize(signum, frame) -> None:
+                TerminalGeometry.poll()
+                if callable(previous):
+                    previous(signum, frame)
+
+            signal.signal(signal.SIGWINCH, on_resize)
+        except ValueError:
+            # signal handlers can only be installed from the main thread
+            return False
+
+        TerminalGeometry._watching = True
+        return True
+
+    @staticmethod
+    def subscribe(listener: Callable[[os.terminal_size], None]) -> None:
+        TerminalGeometry._listeners.append(listener)
+
+    @staticmethod
+    def unsubscribe(listener: Callable[[os.terminal_size], None]) -> None:
+        if listener in TerminalGeometry._listeners:
+            TerminalGeometry._listeners.remove(listener)
+
+
+class AnsiConsole:
+    '''
+        Sets up colorama's stdout wrapper, on the consoles that need it.
+
+        Terminals that interpret ANSI escapes themselves get the escapes as they
+        are and colorama is never imported. On legacy Windows consoles the
+        wrapper is installed the first time enable() is called.
+    '''
+    NATIVE: bool = os.name != 'nt' or any(
+        var in os.environ for var in ('WT_SESSION', 'ANSICON', 'TERM_PROGRAM', 'ConEmuANSI')
+    )
+
+    _enabled: bool = False
+
+    @staticmethod
+    def enable() -> None:
+        if AnsiConsole._enabled:
+            return
+        AnsiConsole._enabled = True
+        if not AnsiConsole.NATIVE:
+            from colorama import init
+            init(autoreset=True)
+
+
+class HeadlessMode:
+    '''
+        Plain-text output for batch jobs that pipe to files.
+
+        When active, prompts print plain lines with no escapes to stderr,
+        nothing queries the terminal size and menus take their selection from
+        an argument or stdin instead of the keyboard. It is decided once:
+        force() wins, then the UI_COMPS_HEADLESS environment variable ('1' /
+        '0'), otherwise it is on whenever stdout isn't a terminal.
+    '''
+    ENV_VAR: str = 'UI_COMPS_HEADLESS'
+
+    _active: bool = None
+
+    @staticmethod
+    def detect() -> bool:
+        setting = os.environ.get(HeadlessMode.ENV_VAR, '').lower()
+        if setting in ('1', 'true', 'yes'):
+            return True
+        if setting in ('0', 'false', 'no'):
+            return False
+        try:
+            return not sys.stdout.isatty()
+        except (AttributeError, ValueError):
+            return True
+
+    @staticmethod
+    def active() -> bool:
+        if HeadlessMode._active is None:
+            HeadlessMode._active = HeadlessMode.detect()
+        return HeadlessMode._active
+
+    @staticmethod
+    def force(active: bool = True) -> None:
+        '''
+            Turns headless output on or off regardless of what was detected,
+            pass None to detect it again.
+        '''
+        HeadlessMode._active = active
+
+
+def encoded_length(text: str, stream=None) -> int:
+    '''
+        How many bytes text takes once stream encodes it (UTF-8 for streams
+        without an encoding), glyphs like ░ are more than one.
+    '''
+    if text.isascii():
+        return len(text)
+    return len(text.encode(getattr(stream, 'encoding', None) or 'utf-8', errors='replace'))
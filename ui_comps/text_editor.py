@@ -1,6 +1,12 @@
 import os
 import sys
-import keyboard
+from screen import Frame, ScreenBuffer
+from terminal import TerminalGeometry
+from input_events import run_ui, run_ui_sync
+from text_source import MappedSource, TextSource, open_source, wrap_line
+from text_search import StreamingSearch, highlight_spans
+from colorify import Highlighter
+from profiler import FrameProfiler
 
 class MenuOption:
     def __init__(self, label, action):
@@ -11,8 +17,6 @@ class MenuOption:
         self.action()
 
 # TODO
-# Add Paging for larger strings of text.
-# - Only included when the size of the header + text + bottom menu exceeds the terminal size.
 # Refactor the Menu displayed at the bottom into a seperate object
 # Optimize Current Design and storing of sizes into variables
 # Refactor 'MenuOption' to include more of the work and add bindings directly from
@@ -20,64 +24,184 @@ class MenuOption:
 # Refactor using the Prompt Class 
 
 class TextViewer:
-    def __init__(self, text: str, header: str = None, options: list[str] = None) -> None:
-        self.text: list[str] = text.split('\n')
+    # the style of the line the view is on
+    CURRENT_LINE: str = '\033[1;32m'
+
+    def __init__(self, text: str = None, header: str = None, options: list[str] = None, path: str = None,
+    stream=None) -> None:
+        '''
+            Shows a body of text a screen at a time with a menu of options below it.
+
+            The body can be passed as text, as a file path or as a stream (binary,
+            or text with an underlying buffer), files given by path are memory-mapped
+            and indexed in the background. Lines are indexed lazily and only the
+            lines in view are decoded and soft-wrapped to the terminal width, so
+            opening a very large message costs about one screen of work.
+
+            '/' starts a search, type the phrase and press enter. The body is searched
+            on a worker thread and the first hit is brought into view as soon as it is
+            found, 'n' / 'N' move to the next / previous matching line.
+        '''
+        self.source: TextSource = open_source(text, path, stream)
         self.header: str = header or ""
         self.options: list[MenuOption] = [MenuOption(option, lambda: print(f"{option} selected")) for option in options] if options else []
         self.current_line: int = 0
-        self.max_lines: int = os.get_terminal_size().lines - len(self.header.split('\n')) - 4  
         self.key_bindings: dict = {}
         self.selected_option: int = 0
         self.active: bool = False
+        self.screen: ScreenBuffer = ScreenBuffer()
+        self.max_fps: int = 60
+        self.search: StreamingSearch = None
+        # the view jumps to the first match once a new search finds one
+        self._jump_pending: bool = False
+        self.highlighter: Highlighter = None
+        self._query: str = None
+        self._wakeup = None
+
+    @property
+    def max_lines(self) -> int:
+        '''
+            Number of text lines that fit between the header and the bottom menu,
+            follows the terminal size when it is resized.
+        '''
+        return TerminalGeometry.lines() - len(self.header.split('\n')) - 4
+
+    def set_highlighter(self, highlighter: Highlighter) -> None:
+        '''
+            Syntax-highlights the rows in view with the highlighter's rules,
+            rows with a search hit show the search highlighting instead.
+        '''
+        self.highlighter = highlighter
+        self.screen.invalidate()
 
     def bind_key(self, key, action) -> None:
         self.key_bindings[key] = action
 
     def run(self) -> None:
+        '''
+            Keys that arrive between frames are applied together and drawn once,
+            at most max_fps times a second.
+        '''
+        self.active = True
+        run_ui_sync(self.display, lambda event: self.handle_key(event.name), lambda: self.active, self.max_fps,
+            self.bind_wakeup)
+
+    async def arun(self) -> None:
+        '''
+            The asyncio version of run(), other coroutines keep
+            running while the viewer waits for keys.
+        '''
         self.active = True
-        while self.active:
-            self.display()
-            self.handle_input()
+        await run_ui(self.display, lambda event: self.handle_key(event.name), lambda: self.active, self.max_fps,
+            self.bind_wakeup)
+
+    def bind_wakeup(self, wakeup) -> None:
+        self._wakeup = wakeup
 
     def display(self) -> None:
-        os.system('cls' if os.name == 'nt' else 'clear')
-        self.show_header()
-        self.show_text()
-        self.show_menu()
-
-    def show_header(self) -> None:
-        header_lines = self.header.split('\n')
-        print('\n'.join(header_lines))
-        print('=' * os.get_terminal_size().columns)  
-
-    def show_text(self) -> None:
-        start_line = max(0, self.current_line - self.max_lines // 2)
-        end_line = min(len(self.text), start_line + self.max_lines)
-        for i, line in enumerate(self.text[start_line:end_line], start=start_line):
-            if i == self.current_line:
-                print(f"\033[1;32m{line}\033[0m")
+        self.follow_search()
+        if FrameProfiler.enabled:
+            FrameProfiler.profile_frame('TextViewer', self.compose, self.screen)
+            return
+        self.screen.draw(self.compose())
+
+    def compose(self) -> Frame:
+        frame = Frame()
+        self.show_header(frame)
+        self.show_text(frame)
+        self.show_menu(frame)
+        return frame
+
+    def show_header(self, frame: Frame) -> None:
+        frame.extend(self.header.split('\n'))
+        frame.append('=' * TerminalGeometry.columns())
+
+    def visible_rows(self, width: int, height: int) -> list[tuple[int, int, str]]:
+        '''
+            The wrapped rows in view as (line number, starting column, row) triples.
+            Lines above the current one fill up to half the viewport, the rest follow it.
+        '''
+        def wrapped(number: int) -> list[tuple[int, int, str]]:
+            rows = wrap_line(source.line(number), width)
+            return [(number, idx * width, row) for idx, row in enumerate(rows)]
+
+        source = self.source
+        rows = wrapped(self.current_line)
+
+        room = (height - len(rows)) // 2
+        number = self.current_line - 1
+        above = []
+        while room > 0 and number >= 0:
+            line_rows = wrapped(number)[-room:]
+            above[:0] = line_rows
+            room -= len(line_rows)
+            number -= 1
+        rows[:0] = above
+
+        number = self.current_line + 1
+        while len(rows) < height and source.has_line(number):
+            rows.extend(wrapped(number))
+            number += 1
+        return rows[:height]
+
+    def show_text(self, frame: Frame) -> None:
+        search = self.search
+        line, line_number, spans = None, None, None
+        profiling = FrameProfiler.enabled
+        width = TerminalGeometry.columns()
+        for number, col, row in self.visible_rows(width, self.max_lines):
+            if profiling:
+                started = FrameProfiler.clock()
+            current = number == self.current_line
+            matched = search is not None and search.has_match(number)
+            if matched or self.highlighter is not None:
+                # rows are styled from their whole line, only the lines in view are matched
+                if line_number != number:
+                    line, line_number = self.source.line(number).expandtabs(4), number
+                    spans = search.spans(line) if matched else None
+                if matched:
+                    row = highlight_spans(row, col, spans)
+                else:
+                    row = self.highlighter.highlight_row(line, col, width, TextViewer.CURRENT_LINE if current else '')
+            if profiling:
+                FrameProfiler.add_phase('style', started)
+
+            if current:
+                frame.append(f"{TextViewer.CURRENT_LINE}{row}\033[0m")
             else:
-                print(line)
+                frame.append(row)
 
-    def show_menu(self):
-        terminal_width = os.get_terminal_size().columns
+    def show_menu(self, frame: Frame) -> None:
+        terminal_width = TerminalGeometry.columns()
         menu_width = sum(len(option.label) for option in self.options) + len(self.options) * 4  
         start_x = (terminal_width - menu_width) // 2
-        print("\n" + "=" * terminal_width)  
-        print(" " * start_x, end="")
+        labels = []
         for i, option in enumerate(self.options):
             if i == self.selected_option:
-                print(f"[ \033[1;34m{option.label}\033[0m ]", end="  ")
+                labels.append(f"[ \033[1;34m{option.label}\033[0m ]  ")
             else:
-                print(f"[ {option.label} ]", end="  ")  
-        print()
+                labels.append(f"[ {option.label} ]  ")
+        if self._query is not None:
+            frame.append(f'/{self._query}')
+        elif self.search is not None:
+            frame.append(self.search.status())
+        else:
+            frame.append('')
+        frame.append('=' * terminal_width)
+        frame.append(' ' * start_x + ''.join(labels))
 
-    def handle_input(self):
-        key = keyboard.read_key()
-        if key == 'up':
-            self.current_line = (self.current_line - 1) % len(self.text)
+    def handle_input(self) -> None:
+        import keyboard
+        self.handle_key(keyboard.read_key())
+
+    def handle_key(self, key: str) -> None:
+        TerminalGeometry.refresh()
+        if self._query is not None:
+            self.handle_search_input(key)
+        elif key == 'up':
+            self.move_line(-1)
         elif key == 'down':
-            self.current_line = (self.current_line + 1) % len(self.text)
+            self.move_line(1)
         elif key == 'right':
             self.selected_option = (
                 self.selected_option + 1) % len(self.options)
@@ -87,18 +211,114 @@ class TextViewer:
         elif key == 'enter':
             if self.selected_option is not None:
                 self.options[self.selected_option].execute()
+                self.screen.invalidate()
                 
         elif key in self.key_bindings:
             self.key_bindings[key]()
+            self.screen.invalidate()
+        elif key == '/':
+            self._query = ''
+        elif key == 'n':
+            self.next_match()
+        elif key == 'N':
+            self.previous_match()
         elif key == 'q':
             self.exit()
 
+    def handle_search_input(self, key: str) -> None:
+        if key == 'enter':
+            query, self._query = self._query, None
+            if query:
+                self.start_search(query)
+        elif key == 'esc':
+            self._query = None
+        elif key == 'backspace':
+            self._query = self._query[:-1]
+        elif key == 'space':
+            self._query += ' '
+        elif len(key) == 1:
+            self._query += key
+
+    def start_search(self, query: str, is_regex: bool = False) -> None:
+        '''
+            Starts searching the body for query in the background, replacing
+            any search that is still running.
+        '''
+        if self.search is not None:
+            self.search.cancel()
+        self._jump_pending = True
+        self.search = StreamingSearch(self.source, query, is_regex, on_update=self._on_search_update)
+        self.search.start()
+
+    def _on_search_update(self, search: StreamingSearch) -> None:
+        # runs on the search thread, only wakes the UI loop, the view moves in follow_search()
+        if search is self.search and self._wakeup is not None:
+            self._wakeup()
+
+    def follow_search(self) -> None:
+        '''
+            Brings the first match of a new search into view once the worker
+            has found one, called on the UI thread before each frame.
+        '''
+        search = self.search
+        if self._jump_pending and search is not None and search.count:
+            self._jump_pending = False
+            target = search.next_match(self.current_line - 1)
+            if target is not None:
+                self.current_line = target
+
+    def next_match(self) -> None:
+        if self.search is not None:
+            target = self.search.next_match(self.current_line)
+            if target is not None:
+                self.current_line = target
+
+    def previous_match(self) -> None:
+        if self.search is not None:
+            target = self.search.previous_match(self.current_line)
+            if target is not None:
+                self.current_line = target
+
+    def move_line(self, delta: int) -> None:
+        '''
+            Moves the current line, wrapping around at either end once the
+            end of the body is known.
+        '''
+        target = self.current_line + delta
+        if target < 0:
+            count = self.source.line_count
+            self.current_line = count - 1 if count is not None else 0
+        elif not self.source.has_line(target):
+            self.current_line = 0
+        else:
+            self.current_line = target
+
+    def goto_line(self, number: int) -> None:
+        if self.source.has_line(number):
+            self.current_line = number
+
+    def goto_offset(self, offset: int) -> None:
+        '''
+            Moves to the line containing a byte offset, only for bodies opened by path.
+        '''
+        if isinstance(self.source, MappedSource):
+            self.current_line = self.source.line_at_offset(offset)
+
     def add_option(self, label, action) -> None:
         self.options.append(MenuOption(label, action))
 
     def exit(self) -> None:
         self.active = False
 
+    def close(self) -> None:
+        '''
+            Releases the file the body was read from, if the viewer opened it.
+        '''
+        if self.search is not None:
+            self.search.cancel()
+            self.search.wait()
+        self.source.close()
+
 
 def main():
     # Example usage
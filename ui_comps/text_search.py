@@ -0,0 +1,228 @@
+import codecs
+import re
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Callable
+from text_source import MappedSource, TextSource
+
+
+class StreamingSearch:
+    BATCH_LINES: int = 4096
+    BATCH_BYTES: int = 1 << 22
+    # the non-ASCII letters an ASCII letter matches when ignoring case ('k' matches the Kelvin sign)
+    UNICODE_FOLDS: dict[str, str] = {'i': '\u0130\u0131', 'k': '\u212a', 's': '\u017f'}
+
+    def __init__(self, source: TextSource, query: str, is_regex: bool = False, ignore_case: bool = True,
+    on_update: Callable[['StreamingSearch'], None] = None) -> None:
+        '''
+            Searches a TextSource on a worker thread a batch of lines at a time.
+
+            The line number of every line with a match is appended to an index as
+            it is found, so the viewer can jump to the first hit while the rest of
+            the body is still being scanned. Match positions within a line aren't
+            stored, the viewer re-matches the few lines it shows.
+
+            Memory-mapped bodies are read from the mapping a few megabytes at a
+            time. Plain ASCII queries are matched on the raw bytes (spelling out the
+            few non-ASCII letters they fold to), and only lines with a hit are
+            located. Other queries are matched against each decoded line, so
+            every kind of source reports the same lines.
+
+            o	on_update (optional): called from the worker thread when the first
+                match is found and when the scan finishes
+        '''
+        flags = re.IGNORECASE if ignore_case else 0
+        self.query: str = query
+        self.pattern: re.Pattern = re.compile(query if is_regex else re.escape(query), flags)
+        self._byte_pattern: re.Pattern = None
+        if not is_regex and query.isascii():
+            self._byte_pattern = re.compile(StreamingSearch.byte_literal(query, ignore_case), flags)
+        self.source: TextSource = source
+        self.on_update = on_update
+        self.lines: array = array('Q')
+        self.scanned: int = 0
+        self.done: bool = False
+        self._cancelled = threading.Event()
+        self._thread: threading.Thread = None
+
+    @staticmethod
+    def byte_literal(query: str, ignore_case: bool) -> bytes:
+        '''
+            A bytes pattern for an ASCII query that matches UTF-8 text exactly
+            where the str pattern matches the decoded text.
+        '''
+        parts = []
+        for char in query:
+            folds = StreamingSearch.UNICODE_FOLDS.get(char.lower()) if ignore_case else None
+            literal = re.escape(char.encode('ascii'))
+            parts.append(b'(?:%s)' % b'|'.join([literal, *(fold.encode() for fold in folds)]) if folds else literal)
+        return b''.join(parts)
+
+    def start(self) -> 'StreamingSearch':
+        self._thread = threading.Thread(target=self._scan, daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def wait(self, timeout: float = None) -> bool:
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.done
+
+    def _notify(self) -> None:
+        if self.on_update is not None:
+            self.on_update(self)
+
+    def _scan(self) -> None:
+        if isinstance(self.source, MappedSource):
+            self._scan_mapped()
+        else:
+            self._scan_lines()
+
+    def _scan_mapped(self) -> None:
+        if self._byte_pattern is None or codecs.lookup(self.source.encoding).name not in ('utf-8', 'ascii'):
+            self._scan_decoded()
+            return
+
+        source, found = self.source, self.lines
+        buffer, size = source.buffer, source.size
+        pos = 0
+        while pos < size and not self._cancelled.is_set():
+            # batches end on a line boundary so a match is never split
+            end = buffer.find(b'\n', min(pos + StreamingSearch.BATCH_BYTES, size)) if size else -1
+            end = size if end == -1 else end + 1
+            had_matches = len(found) > 0
+
+            search = self._byte_pattern.search
+            match = search(buffer, pos, end)
+            while match is not None:
+                number = source.line_at_offset(match.start())
+                if not found or found[-1] != number:
+                    found.append(number)
+                # the rest of a matching line can't add another entry
+                next_line = buffer.find(b'\n', match.start(), end) + 1 or end
+                match = search(buffer, next_line, end) if next_line < end else None
+            pos = end
+            self.scanned = source.line_at_offset(pos) if pos < size else source.line_count
+
+            if not had_matches and found:
+                self._notify()
+
+        if not self._cancelled.is_set():
+            self.done = True
+            self._notify()
+
+    def _scan_decoded(self) -> None:
+        '''
+            Scans a memory-mapped body a batch at a time, decoding each batch and
+            matching its lines the way MappedSource.line() returns them.
+        '''
+        search, source, found = self.pattern.search, self.source, self.lines
+        buffer, size = source.buffer, source.size
+        pos = 0
+        while pos < size and not self._cancelled.is_set():
+            end = buffer.find(b'\n', min(pos + StreamingSearch.BATCH_BYTES, size))
+            end = size if end == -1 else end + 1
+            had_matches = len(found) > 0
+
+            lines = buffer[pos:end].decode(source.encoding, errors='replace').split('\n')
+            if lines[-1] == '':
+                lines.pop()
+            number = source.line_at_offset(pos)
+            for offset, line in enumerate(lines):
+                if search(line[:-1] if line.endswith('\r') else line):
+                    found.append(number + offset)
+            pos = end
+            self.scanned = source.line_at_offset(pos) if pos < size else source.line_count
+
+            if not had_matches and found:
+                self._notify()
+
+        if not self._cancelled.is_set():
+            self.done = True
+            self._notify()
+
+    def _scan_lines(self) -> None:
+        search, source, found = self.pattern.search, self.source, self.lines
+        number = 0
+        while not self._cancelled.is_set():
+            batch = source.lines(number, number + StreamingSearch.BATCH_LINES)
+            had_matches = len(found) > 0
+            for offset, line in enumerate(batch):
+                if search(line):
+                    found.append(number + offset)
+            number += len(batch)
+            self.scanned = number
+
+            if not had_matches and found:
+                self._notify()
+            if len(batch) < StreamingSearch.BATCH_LINES:
+                self.done = True
+                self._notify()
+                return
+
+    @property
+    def count(self) -> int:
+        return len(self.lines)
+
+    def has_match(self, number: int) -> bool:
+        lines = self.lines
+        idx = bisect_left(lines, number)
+        return idx < len(lines) and lines[idx] == number
+
+    def next_match(self, number: int) -> int:
+        '''
+            The first matching line after number, wrapping to the first match
+            once the scan is done. None if there isn't one (yet).
+        '''
+        lines = self.lines
+        idx = bisect_right(lines, number)
+        if idx < len(lines):
+            return lines[idx]
+        if self.done and lines:
+            return lines[0]
+        return None
+
+    def previous_match(self, number: int) -> int:
+        '''
+            The last matching line before number, wrapping to the last match
+            once the scan is done.
+        '''
+        lines = self.lines
+        idx = bisect_left(lines, number)
+        if idx > 0:
+            return lines[idx - 1]
+        if self.done and lines:
+            return lines[-1]
+        return None
+
+    def spans(self, text: str) -> list[tuple[int, int]]:
+        return [match.span() for match in self.pattern.finditer(text) if match.end() > match.start()]
+
+    def status(self) -> str:
+        state = 'done' if self.done else f'searching, line {self.scanned}'
+        return f'/{self.query}  {self.count} matching lines ({state})'
+
+
+def highlight_spans(row: str, row_start: int, spans: list[tuple[int, int]], on: str = '\033[7m',
+    off: str = '\033[27m') -> str:
+    '''
+        Marks the parts of spans (columns in the full line) that fall on a wrapped
+        row starting at column row_start.
+    '''
+    row_end = row_start + len(row)
+    pieces, cursor = [], 0
+    for start, end in spans:
+        if end <= row_start or start >= row_end:
+            continue
+        start, end = max(start, row_start) - row_start, min(end, row_end) - row_start
+        pieces.append(row[cursor:start])
+        pieces.append(on + row[start:end] + off)
+        cursor = end
+    if not pieces:
+        return row
+    pieces.append(row[cursor:])
+    return ''.join(pieces)
@@ -0,0 +1,327 @@
+import io
+import mmap
+import os
+import threading
+from array import array
+from bisect import bisect_right
+
+
+class TextSource:
+    '''
+        The protocol TextViewer reads its body through.
+
+        Lines are addressed by number and only the ones asked for are decoded.
+        line_count is None until the source has been indexed to the end.
+        Sources can be read from several threads, a search can scan the body
+        while the viewer draws it.
+    '''
+    CHUNK_SIZE: int = 1 << 16
+
+    @property
+    def line_count(self) -> int:
+        raise NotImplementedError
+
+    def has_line(self, number: int) -> bool:
+        raise NotImplementedError
+
+    def line(self, number: int) -> str:
+        raise NotImplementedError
+
+    def lines(self, start: int, stop: int) -> list[str]:
+        out = []
+        for number in range(start, stop):
+            if not self.has_line(number):
+                break
+            out.append(self.line(number))
+        return out
+
+    def close(self) -> None:
+        pass
+
+
+class StringSource(TextSource):
+    def __init__(self, text: str) -> None:
+        '''
+            A body already held as a str, line start offsets are found
+            lazily instead of splitting the whole text up front. Lines are split
+            the way the other sources split them: a trailing new line doesn't
+            start another line and '\r\n' endings are dropped.
+        '''
+        self.text: str = text
+        self._starts: array = array('Q', [0])
+        self._complete: bool = False
+        self._lock = threading.Lock()
+
+    @property
+    def line_count(self) -> int:
+        return len(self._starts) if self._complete else None
+
+    def _index_to(self, number: int) -> None:
+        if self._complete or len(self._starts) > number:
+            return
+        text, starts = self.text, self._starts
+        with self._lock:
+            while not self._complete and len(starts) <= number:
+                end = text.find('\n', starts[-1])
+                if end == -1:
+                    self._complete = True
+                    # a trailing new line doesn't start another line
+                    if len(starts) > 1 and starts[-1] == len(text):
+                        starts.pop()
+                else:
+                    starts.append(end + 1)
+
+    def has_line(self, number: int) -> bool:
+        self._index_to(number + 1)
+        return 0 <= number < len(self._starts)
+
+    def line(self, number: int) -> str:
+        self._index_to(number + 1)
+        start = self._starts[number]
+        end = self._starts[number + 1] - 1 if number + 1 < len(self._starts) else len(self.text)
+        return self.text[start:end].rstrip('\r\n')
+
+
+class StreamSource(TextSource):
+    def __init__(self, stream, encoding: str = 'utf-8') -> None:
+        '''
+            A body read from a binary stream or a file path.
+
+            The stream is scanned for new lines a chunk at a time, only as far as
+            the furthest line asked for, and the start offset of every line is kept
+            in a compact array. Lines are read back and decoded one at a time, so
+            memory is bounded by the index and the lines on screen rather than
+            the size of the file.
+
+            Streams that can't seek are spooled to a temporary file as they are
+            read, and so are text streams with no binary buffer underneath
+            (io.StringIO), encoded on the way.
+        '''
+        if isinstance(stream, str):
+            stream = open(stream, 'rb')
+            self._owns_stream = True
+        else:
+            self._owns_stream = False
+
+        if isinstance(stream, io.TextIOBase):
+            stream = getattr(stream, 'buffer', stream)
+
+        if isinstance(stream, io.TextIOBase) or not stream.seekable():
+            import tempfile
+            self._pipe = stream
+            stream = tempfile.TemporaryFile()
+        else:
+            self._pipe = None
+
+        self.stream = stream
+        self.encoding: str = encoding
+        self._starts: array = array('Q', [0])
+        self._scanned: int = 0
+        self._complete: bool = False
+        self._lock = threading.RLock()
+
+    @property
+    def line_count(self) -> int:
+        return len(self._starts) if self._complete else None
+
+    def _read_chunk(self, offset: int) -> bytes:
+        if self._pipe is not None and offset >= self._spooled_size():
+            data = self._pipe.read(TextSource.CHUNK_SIZE)
+            if isinstance(data, str):
+                data = data.encode(self.encoding, errors='replace')
+            if data:
+                self.stream.seek(0, io.SEEK_END)
+                self.stream.write(data)
+            return data
+        self.stream.seek(offset)
+        return self.stream.read(TextSource.CHUNK_SIZE)
+
+    def _spooled_size(self) -> int:
+        return self.stream.seek(0, io.SEEK_END)
+
+    def _index_to(self, number: int) -> None:
+        starts = self._starts
+        with self._lock:
+            while not self._complete and len(starts) <= number:
+                chunk = self._read_chunk(self._scanned)
+                if not chunk:
+                    self._complete = True
+                    # a trailing new line doesn't start another line
+                    if len(starts) > 1 and starts[-1] == self._scanned:
+                        starts.pop()
+                    break
+
+                base = self._scanned
+                pos = chunk.find(b'\n')
+                while pos != -1:
+                    starts.append(base + pos + 1)
+                    pos = chunk.find(b'\n', pos + 1)
+                self._scanned += len(chunk)
+
+    def has_line(self, number: int) -> bool:
+        self._index_to(number + 1)
+        return 0 <= number < len(self._starts)
+
+    def line(self, number: int) -> str:
+        with self._lock:
+            self._index_to(number + 1)
+            start = self._starts[number]
+            if number + 1 < len(self._starts):
+                end = self._starts[number + 1]
+            else:
+                end = self._scanned
+            self.stream.seek(start)
+            raw = self.stream.read(end - start)
+        return raw.rstrip(b'\r\n').decode(self.encoding, errors='replace')
+
+    def close(self) -> None:
+        if self._owns_stream or self._pipe is not None:
+            self.stream.close()
+
+
+class MappedSource(TextSource):
+    SCAN_STEP: int = 1 << 22
+
+    def __init__(self, path: str, encoding: str = 'utf-8', background: bool = True) -> None:
+        '''
+            A body memory-mapped from a file, for exports and logs that run to gigabytes.
+
+            A background thread scans the mapping for new lines a few megabytes at a
+            time and records line start offsets in an array. Lines past the scan are
+            found on demand, so scrolling works before the scan finishes. pause() and
+            resume() stop and continue the scan from where it left off.
+
+            Lines are decoded straight from the mapped pages, only the visible lines
+            are ever copied. Once a line is indexed its offset is an array lookup.
+        '''
+        self.path: str = path
+        self.encoding: str = encoding
+        self._file = open(path, 'rb')
+        self.size: int = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+        self._starts: array = array('Q', [0])
+        self._scanned: int = 0
+        self._complete: bool = self.size == 0
+        self._lock = threading.Lock()
+        self._running = threading.Event()
+        self._thread: threading.Thread = None
+        if background:
+            self.resume()
+
+    @property
+    def line_count(self) -> int:
+        return len(self._starts) if self._complete else None
+
+    @property
+    def buffer(self):
+        '''
+            The mapped file, for scanning the raw bytes without copying them.
+        '''
+        return self._map
+
+    @property
+    def progress(self) -> float:
+        '''
+            Fraction of the file indexed so far.
+        '''
+        return 1.0 if self._complete else self._scanned / self.size
+
+    def _scan(self, limit: int) -> None:
+        '''
+            Indexes new lines from where the scan stopped up to byte limit,
+            the caller holds the lock.
+        '''
+        mapped, starts = self._map, self._starts
+        limit = min(limit, self.size)
+        pos = mapped.find(b'\n', self._scanned, limit)
+        while pos != -1:
+            starts.append(pos + 1)
+            pos = mapped.find(b'\n', pos + 1, limit)
+        self._scanned = limit
+
+        if limit == self.size:
+            self._complete = True
+            # a trailing new line doesn't start another line
+            if len(starts) > 1 and starts[-1] == self.size:
+                starts.pop()
+
+    def _index_to(self, number: int) -> None:
+        if self._complete or len(self._starts) > number:
+            return
+        with self._lock:
+            while not self._complete and len(self._starts) <= number:
+                self._scan(self._scanned + TextSource.CHUNK_SIZE)
+
+    def _background_scan(self) -> None:
+        while not self._complete and self._running.is_set():
+            with self._lock:
+                if not self._complete:
+                    self._scan(self._scanned + MappedSource.SCAN_STEP)
+
+    def resume(self) -> None:
+        if self._complete or self._running.is_set():
+            return
+        self._running.set()
+        self._thread = threading.Thread(target=self._background_scan, daemon=True)
+        self._thread.start()
+
+    def pause(self) -> None:
+        self._running.clear()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def has_line(self, number: int) -> bool:
+        self._index_to(number + 1)
+        return 0 <= number < len(self._starts)
+
+    def line_offset(self, number: int) -> int:
+        self._index_to(number)
+        return self._starts[number]
+
+    def line_at_offset(self, offset: int) -> int:
+        '''
+            The number of the line containing byte offset.
+        '''
+        offset = max(0, min(offset, self.size))
+        with self._lock:
+            while not self._complete and self._scanned <= offset:
+                self._scan(self._scanned + MappedSource.SCAN_STEP)
+        return bisect_right(self._starts, offset) - 1
+
+    def line(self, number: int) -> str:
+        self._index_to(number + 1)
+        start = self._starts[number]
+        end = self._starts[number + 1] if number + 1 < len(self._starts) else self._scanned
+        if end > start and self._map[end - 1] == 10:
+            end -= 1
+        if end > start and self._map[end - 1] == 13:
+            end -= 1
+        return str(memoryview(self._map)[start:end], self.encoding, errors='replace')
+
+    def close(self) -> None:
+        self.pause()
+        if self.size:
+            self._map.close()
+        self._file.close()
+
+
+def open_source(text: str = None, path: str = None, stream=None) -> TextSource:
+    '''
+        Picks the source for a TextViewer body, files given by path are memory-mapped.
+    '''
+    if path is not None:
+        return MappedSource(path)
+    if stream is not None:
+        return StreamSource(stream)
+    return StringSource(text or '')
+
+
+def wrap_line(line: str, width: int) -> list[str]:
+    '''
+        Soft-wraps a line into rows of at most width characters.
+    '''
+    line = line.expandtabs(4)
+    if len(line) <= width:
+        return [line]
+    return [line[i:i + width] for i in range(0, len(line), width)]